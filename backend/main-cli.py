@@ -1,8 +1,45 @@
-from pytodo.tasks import add_task, view_tasks, complete_task, delete_task
+from pytodo.tasks import add_task, view_tasks, complete_task, delete_task, undo, redo, page_tasks, view_page, stream_tasks, PAGE_SIZE
+from pytodo.tasks import view_archived, restore_tasks, archive_tasks, archive_on_start
+from pytodo.tasks import tasks_between, sorted_tasks
+from pytodo.tasks import open_list, view_lists, rename_list, delete_list
+from pytodo.tasks import shard_tasks, search_tasks, count_tasks
+from pytodo.tasks import set_due, watch
+from pytodo.tasks import view_next, set_priority
+from pytodo.tasks import move_task, view_tree
+from pytodo.tasks import view_report
+from pytodo.tasks import tag_task, tasks_tagged, count_tagged, view_tag_cloud
+from pytodo.tasks import import_tasks, view_duplicates
+from pytodo.tasks import view_stats, sample_memory
+from pytodo.tasks import export_list
+from pytodo.tasks import run_daemon, run_tui
+from pytodo import daemon
+from pytodo.storage_processor import TASKS_FILE
+from pytodo.export import FORMATS as EXPORT_FORMATS
+from pytodo import memory
+from pytodo.reminders import parse_due
+from pytodo.storage_processor import SHARD_PARTITIONS
+from pytodo.lists import DEFAULT_LIST
+from pytodo.sortindex import SORT_KEYS
+from pytodo.nextup import PRIORITIES, NEXT_UP, parse_priority
+from pytodo.tags import TagFilter, TAG_CLOUD, parse_tags
+from pytodo.duplicates import DUPLICATE_POLICIES, NEAR_THRESHOLD
+from pytodo.archive import ARCHIVE_AFTER_DAYS
+from pytodo.analytics import REPORT_DAYS, REPORT_WEEKS
+from pytodo.timeindex import parse_date
+import sys
 from time import sleep
 import os
 import argparse
 
+# Commands a running daemon answers from memory
+DAEMON_COMMANDS = {"list", "add", "complete", "delete", "undo", "redo", "due", "stats",
+                   "shard", "archived", "restore", "archive", "next", "priority", "tag", "tags",
+                   "import", "duplicates", "move", "tree", "report"}
+# Commands only a daemon can answer, as only it keeps the undo history between commands
+HISTORY_COMMANDS = {"undo", "redo"}
+# Commands that read list files themselves, after the daemon has saved
+FILE_COMMANDS = {"lists", "search", "count", "export", "watch", "tui"}
+
 # This script is a simple command-line To-Do list application.
 # It allows users to add, view, complete, and delete tasks.
 # The tasks are stored in a JSON file for persistence.
@@ -70,28 +107,32 @@ def menu(): # This function displays the main menu and handles user input.
     while True:
         clear()
         print("Welcome to PyTo-Do!")
-        print("1. Add task\n2. View tasks\n3. Complete task\n4. Delete task\n5. Exit")
+        print("1. Add task\n2. View tasks\n3. Complete task\n4. Delete task\n5. Undo\n6. Redo\n7. Exit")
         choice = input("Choose an option: ")
         if choice == "1": # Add a task
             add_task(input("Enter task: "))
         elif choice == "2": # View tasks
             clear()
             print("Viewing tasks")
-            view_tasks() 
+            page_tasks()
         elif choice == "3": # Complete a task
             clear()
             print("Select which task to complete")
-            view_tasks()
+            page_tasks()
             complete_task(get_task_number())
             sleep(1)
             print("Task completed")
         elif choice == "4": # Delete a task
             clear()
             print("Select which task to delete")
-            view_tasks()
+            page_tasks()
             delete_task(get_task_number())
             print("Task deleted")
-        elif choice == "5":  # Exit the application
+        elif choice in ("5", "undo"): # Undo the last change
+            undo()
+        elif choice in ("6", "redo"): # Redo the last undone change
+            redo()
+        elif choice == "7":  # Exit the application
             print("Thank you for using PyTo-Do!\nExiting...")
             sleep(1)
             break
@@ -99,12 +140,352 @@ def menu(): # This function displays the main menu and handles user input.
             print("Invalid choice")
         input("Press enter to continue")
 
-if __name__ == "__main__": # This is the main entry point of the application.
+def date_filter(args): # This function turns --added-*/--completed-* dates into task positions, both ranges applying.
+    positions = None
+    for field, since, until in (("created_at", args.added_since, args.added_until),
+                                ("completed_at", args.completed_since, args.completed_until)):
+        if since or until:
+            start = parse_date(since) if since else None
+            end = parse_date(until) + 86400 if until else None # until is inclusive
+            found = tasks_between(field, start, end)
+            if positions is None:
+                positions = found
+            else:
+                allowed = set(found)
+                positions = [position for position in positions if position in allowed]
+    return positions
+
+def list_tasks(args): # This function prints tasks without entering the menu.
+    try:
+        positions = date_filter(args)
+    except ValueError:
+        print("Invalid date, use YYYY-MM-DD")
+        return
+    if args.tags:
+        tagged = tasks_tagged(TagFilter(args.tags))
+        if positions is None:
+            positions = tagged
+        else:
+            allowed = set(tagged)
+            positions = [position for position in positions if position in allowed]
+    if args.sort:
+        positions = sorted_tasks(args.sort, args.reverse, positions)
+    if args.offset is not None or args.limit is not None or args.page is not None:
+        limit = PAGE_SIZE if args.limit is None else args.limit
+        if args.offset is not None:
+            view_tasks(args.offset, limit, positions)
+        else:
+            view_page(args.page or 1, limit, positions)
+    elif sys.stdout.isatty():
+        view_page(1, positions=positions)
+    else:
+        stream_tasks(positions=positions) # Fast path for pipes and files
+
+def shard_query(args): # This function turns search/count options into a query for the shard workers.
+    query = {}
+    if getattr(args, "text", None):
+        query["text"] = args.text
+    if args.pending or args.completed:
+        query["completed"] = args.completed
+    return query
+
+def export_query(args): # This function turns export options into a query, status and date ranges included.
+    query = shard_query(args)
+    for field, since, until in (("created_at", args.added_since, args.added_until),
+                                ("completed_at", args.completed_since, args.completed_until)):
+        if since or until:
+            query[field] = (parse_date(since) if since else None,
+                            parse_date(until) + 86400 if until else None) # until is inclusive
+    return query
+
+def count_arg(minimum): # This function makes an argparse type for whole numbers of at least minimum.
+    def parse(text):
+        value = int(text)
+        if value < minimum:
+            raise argparse.ArgumentTypeError(f"must be {minimum} or more, not {value}")
+        return value
+    parse.__name__ = "number"  # named in argparse's "invalid number value" errors
+    return parse
+
+def build_parser(): # This function builds the command-line parser, shared with the daemon.
     parser = argparse.ArgumentParser(description="PyTo-Do Application")
     parser.add_argument("--no-banner", action="store_true", help="Skip the banner display")
-    args = parser.parse_args()
+    parser.add_argument("--no-daemon", action="store_true", help="Work on the files even if a daemon is running")
+    parser.add_argument("--list", default=DEFAULT_LIST, help=f"Task list to use, created if missing (default {DEFAULT_LIST})")
+    commands = parser.add_subparsers(dest="command")
+    list_parser = commands.add_parser("list", help="Print tasks and exit")
+    list_parser.add_argument("--page", type=count_arg(1), help="Page number to show, starting at 1")
+    list_parser.add_argument("--limit", type=count_arg(1), help=f"Tasks per page (default {PAGE_SIZE})")
+    list_parser.add_argument("--offset", type=count_arg(0), help="Number of tasks to skip")
+    list_parser.add_argument("--sort", choices=sorted(SORT_KEYS), help="Sort tasks instead of showing list order")
+    list_parser.add_argument("--reverse", action="store_true", help="Reverse the sort order")
+    for name in ("added-since", "added-until", "completed-since", "completed-until"):
+        list_parser.add_argument(f"--{name}", metavar="YYYY-MM-DD", help=f"Only tasks {name.replace('-', ' ')} this day")
+    list_parser.add_argument("--tags", metavar="FILTER",
+                             help='Only tasks with these tags, e.g. --tags="work,home urgent -someday" for (work or home) and urgent, not someday')
+    lists_parser = commands.add_parser("lists", help="Print task lists and their sizes")
+    lists_changes = lists_parser.add_mutually_exclusive_group()
+    lists_changes.add_argument("--rename", nargs=2, metavar=("NAME", "NEW_NAME"), help="Rename a list instead")
+    lists_changes.add_argument("--delete", metavar="NAME", help="Delete a list and all its tasks instead")
+    add_parser = commands.add_parser("add", help="Add a task")
+    add_parser.add_argument("text", nargs="+", help="Task description")
+    add_parser.add_argument("--priority", type=parse_priority, metavar="|".join(PRIORITIES), help="Task priority (default normal)")
+    add_parser.add_argument("--tag", action="append", default=[], help="Tag the task, repeat or separate with commas for more")
+    add_parser.add_argument("--duplicates", choices=DUPLICATE_POLICIES, default="flag",
+                            help="If the same task is already listed: add it with a note (default), skip it, or just add it")
+    add_parser.add_argument("--under", type=int, metavar="NUMBER", help="Add as a subtask of this task")
+    move_parser = commands.add_parser("move", help="Make a task a subtask of another, or a top-level task again")
+    move_parser.add_argument("number", type=int, help="Task number as shown by list")
+    move_parser.add_argument("--under", type=int, metavar="NUMBER", help="New parent task, leave out for the top level")
+    tree_parser = commands.add_parser("tree", help="Print top-level tasks, or a task's subtasks, with done/total counts")
+    tree_parser.add_argument("number", type=int, nargs="?", help="Task whose subtasks to show")
+    tree_parser.add_argument("--depth", type=int, default=1, help="Levels to open, 0 for all (default 1)")
+    import_parser = commands.add_parser("import", help="Merge tasks from a JSON file, skipping duplicates of listed tasks")
+    import_parser.add_argument("file", help="Task file, e.g. a backup")
+    import_parser.add_argument("--near", action="store_true", help="Also skip tasks worded almost like a listed one")
+    import_parser.add_argument("--keep-duplicates", action="store_true", help="Import duplicates too")
+    duplicates_parser = commands.add_parser("duplicates", help="Print tasks that say the same thing")
+    duplicates_parser.add_argument("--near", action="store_true", help="Include tasks worded almost the same")
+    duplicates_parser.add_argument("--threshold", type=float, default=NEAR_THRESHOLD,
+                                   help=f"How alike near duplicates must be, 0 to 1 (default {NEAR_THRESHOLD})")
+    duplicates_parser.add_argument("--remove", action="store_true", help="Delete all but the first task of each group")
+    tag_parser = commands.add_parser("tag", help="Add or remove a task's tags")
+    tag_parser.add_argument("number", type=int, help="Task number as shown by list")
+    tag_parser.add_argument("tags", nargs="*", help="Tags to add")
+    tag_parser.add_argument("--remove", action="append", default=[], metavar="TAG", help="Tag to remove, may be repeated")
+    tags_parser = commands.add_parser("tags", help="Print the most used tags, or how many tasks pass a tag filter")
+    tags_parser.add_argument("--limit", type=int, default=TAG_CLOUD, help=f"Tags to show (default {TAG_CLOUD})")
+    tags_parser.add_argument("--count", metavar="FILTER", help="Print how many tasks pass this tag filter instead")
+    next_parser = commands.add_parser("next", help="Print the most urgent pending tasks, by priority then due date")
+    next_parser.add_argument("-n", "--count", type=int, default=NEXT_UP, help=f"Tasks to show (default {NEXT_UP})")
+    priority_parser = commands.add_parser("priority", help="Set a task's priority")
+    priority_parser.add_argument("number", type=int, help="Task number as shown by list")
+    priority_parser.add_argument("priority", type=parse_priority, metavar="|".join(PRIORITIES), help="New priority")
+    for name, text in (("complete", "Mark a task as completed"), ("delete", "Delete a task")):
+        number_parser = commands.add_parser(name, help=text)
+        number_parser.add_argument("number", type=int, help="Task number as shown by list")
+    commands.add_parser("tui", help="Full-screen terminal interface")
+    commands.add_parser("undo", help="Undo the last change (needs the daemon)")
+    commands.add_parser("redo", help="Redo the last undone change (needs the daemon)")
+    shard_parser = commands.add_parser("shard", help="Split the list into shard files for parallel search")
+    shard_parser.add_argument("--shards", type=int, help="Number of hash shards (default: one per core)")
+    shard_parser.add_argument("--by", choices=SHARD_PARTITIONS, default="hash", help="Partition by id hash or by month created")
+    for name, text in (("search", "Print tasks containing some text"), ("count", "Print how many tasks match")):
+        scan_parser = commands.add_parser(name, help=text)
+        if name == "search":
+            scan_parser.add_argument("text", help="Text to look for, case-insensitive")
+        scan_parser.add_argument("--workers", type=int, help="Processes scanning shards in parallel (default: one per core)")
+        status = scan_parser.add_mutually_exclusive_group()
+        status.add_argument("--pending", action="store_true", help="Only pending tasks")
+        status.add_argument("--completed", action="store_true", help="Only completed tasks")
+    export_parser = commands.add_parser("export", help="Write tasks to a CSV, NDJSON, Markdown or JSON file")
+    export_parser.add_argument("file", help="File to write, the format is taken from its extension; - for standard output")
+    export_parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), help="Format, overriding the extension")
+    status = export_parser.add_mutually_exclusive_group()
+    status.add_argument("--pending", action="store_true", help="Only pending tasks")
+    status.add_argument("--completed", action="store_true", help="Only completed tasks")
+    for name in ("added-since", "added-until", "completed-since", "completed-until"):
+        export_parser.add_argument(f"--{name}", metavar="YYYY-MM-DD", help=f"Only tasks {name.replace('-', ' ')} this day")
+    due_parser = commands.add_parser("due", help="Set or clear a task's due date")
+    due_parser.add_argument("number", type=int, help="Task number as shown by list")
+    due_parser.add_argument("when", nargs="*", metavar="YYYY-MM-DD [HH:MM]", help="Due date, leave out to clear it")
+    due_parser.add_argument("--remind", type=int, metavar="MINUTES", help="Remind this many minutes before it is due")
+    commands.add_parser("watch", help="Print reminders as tasks come due")
+    report_parser = commands.add_parser("report", help="Print completion throughput, lead time and backlog trend")
+    report_parser.add_argument("--days", type=int, default=REPORT_DAYS, help=f"Days of daily figures (default {REPORT_DAYS})")
+    report_parser.add_argument("--weeks", type=int, default=REPORT_WEEKS, help=f"Weeks of weekly figures (default {REPORT_WEEKS})")
+    stats_parser = commands.add_parser("stats", help="Print task totals and, optionally, memory use")
+    stats_parser.add_argument("--memory", action="store_true", help="Add a memory report with top allocation sites")
+    stats_parser.add_argument("--sample", metavar="FILE", help="Append a memory report to FILE as JSON lines, repeatedly")
+    stats_parser.add_argument("--interval", type=float, default=memory.SAMPLE_INTERVAL,
+                              help=f"Seconds between samples (default {memory.SAMPLE_INTERVAL})")
+    stats_parser.add_argument("--count", type=int, help="Stop after this many samples")
+    archived_parser = commands.add_parser("archived", help="Print archived tasks and exit")
+    archived_parser.add_argument("--limit", type=count_arg(1), default=PAGE_SIZE, help=f"Tasks to show (default {PAGE_SIZE})")
+    archived_parser.add_argument("--offset", type=count_arg(0), default=0, help="Number of archived tasks to skip")
+    restore_parser = commands.add_parser("restore", help="Move archived tasks back to the list")
+    restore_parser.add_argument("ids", nargs="+", help="Ids shown by the archived command")
+    archive_parser = commands.add_parser("archive", help="Archive old completed tasks now")
+    archive_parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                                help=f"Archive tasks completed this many days ago (default {ARCHIVE_AFTER_DAYS})")
+    daemon_parser = commands.add_parser("daemon", help="Keep lists loaded in a background process for fast commands")
+    daemon_parser.add_argument("action", choices=["start", "stop", "status", "run"],
+                               help="Start in the background, stop, show status, or run in the foreground")
+    return parser
 
+def run(args): # This function carries out a parsed command, directly or inside the daemon.
+    if args.command == "lists":
+        if args.rename:
+            rename_list(*args.rename)
+        elif args.delete:
+            delete_list(args.delete)
+        else:
+            view_lists()
+        return
+    if args.command == "search":
+        search_tasks(shard_query(args), args.list, args.workers)
+        return
+    if args.command == "export":
+        try:
+            query = export_query(args)
+        except ValueError:
+            print("Invalid date, use YYYY-MM-DD")
+            return
+        export_list(args.file, query, args.format, args.list)
+        return
+    if args.command == "count":
+        count_tasks(shard_query(args), args.list, args.workers)
+        return
+    if args.command == "stats" and (args.memory or args.sample):
+        memory.start() # before loading, so the list's allocations are traced
+    open_list(args.list)
+    if args.command == "list":
+        list_tasks(args)
+        return
+    if args.command == "add":
+        add_task(" ".join(args.text), args.priority, parse_tags(",".join(args.tag)), args.duplicates, args.under)
+        return
+    if args.command == "move":
+        move_task(args.number, args.under)
+        return
+    if args.command == "tree":
+        view_tree(args.number, args.depth or None)
+        return
+    if args.command == "import":
+        import_tasks(args.file, args.near, args.keep_duplicates)
+        return
+    if args.command == "duplicates":
+        view_duplicates(args.near, args.threshold, args.remove)
+        return
+    if args.command == "tag":
+        tag_task(args.number, parse_tags(" ".join(args.tags)), parse_tags(" ".join(args.remove)))
+        return
+    if args.command == "tags":
+        if args.count is not None:
+            count_tagged(TagFilter(args.count))
+        else:
+            view_tag_cloud(args.limit)
+        return
+    if args.command == "next":
+        view_next(args.count)
+        return
+    if args.command == "priority":
+        set_priority(args.number, args.priority)
+        return
+    if args.command == "complete":
+        complete_task(args.number)
+        return
+    if args.command == "delete":
+        delete_task(args.number)
+        return
+    if args.command == "tui":
+        archive_on_start()
+        run_tui()
+        return
+    if args.command == "undo":
+        undo()
+        return
+    if args.command == "redo":
+        redo()
+        return
+    if args.command == "due":
+        try:
+            due_at = parse_due(" ".join(args.when)) if args.when else None
+        except ValueError:
+            print("Invalid date, use YYYY-MM-DD or YYYY-MM-DD HH:MM")
+            return
+        set_due(args.number, due_at, args.remind)
+        return
+    if args.command == "watch":
+        watch()
+        return
+    if args.command == "report":
+        view_report(args.days, args.weeks)
+        return
+    if args.command == "stats":
+        if args.sample:
+            sample_memory(args.sample, args.interval, args.count)
+        else:
+            view_stats(args.memory)
+        return
+    if args.command == "shard":
+        shard_tasks(args.shards, args.by)
+        return
+    if args.command == "archived":
+        view_archived(args.offset, args.limit)
+        return
+    if args.command == "restore":
+        restore_tasks(args.ids)
+        return
+    if args.command == "archive":
+        archive_tasks(args.days)
+        return
+
+    archive_on_start()
     if not args.no_banner:
         display_banner()
     menu()
     clear()
+
+def manage_daemon(action, parser): # This function starts, stops, runs or describes the daemon.
+    if not daemon.supported():
+        print("The daemon needs Unix sockets, which this platform does not have")
+        return
+    path = daemon.socket_path(TASKS_FILE)
+    if action == "run":
+        run_daemon(lambda argv: run(parser.parse_args(argv)))
+        return
+    reply = daemon.request({"op": "ping"}, path)
+    if action == "status":
+        if reply is None:
+            print("No daemon running")
+        else:
+            print(f"Daemon {reply['pid']} running, lists loaded: {', '.join(reply['lists']) or 'none'}, "
+                  f"unsaved: {reply['unsaved']}")
+    elif action == "stop":
+        if reply is None:
+            print("No daemon running")
+        else:
+            daemon.request({"op": "stop"}, path)
+            print(f"Daemon {reply['pid']} stopped")
+    elif reply is not None:
+        print(f"Daemon {reply['pid']} already running")
+    else:
+        script = [] if getattr(sys, "frozen", False) else [os.path.abspath(sys.argv[0])]
+        reply = daemon.start([sys.executable] + script + ["daemon", "run"], path, daemon.log_path(TASKS_FILE))
+        if reply is None:
+            print(f"Daemon did not start, see {daemon.log_path(TASKS_FILE)}")
+        else:
+            print(f"Daemon {reply['pid']} started")
+
+def main(): # This is the main entry point of the application.
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.command == "daemon":
+        manage_daemon(args.action, parser)
+        return
+    if not args.no_daemon:
+        path = daemon.socket_path(TASKS_FILE)
+        # Memory reports trace this process from before the list is loaded
+        traced = args.command == "stats" and (args.memory or args.sample)
+        # Changes to the lists go through the daemon, which holds them open
+        changes_lists = args.command == "lists" and (args.rename or args.delete)
+        if (args.command in DAEMON_COMMANDS or changes_lists) and not traced:
+            # Let a running daemon answer from memory, else fall back to the files
+            reply = daemon.request({"argv": sys.argv[1:], "tty": sys.stdout.isatty()}, path)
+            if reply is not None:
+                sys.stdout.write(reply["out"])
+                sys.stderr.write(reply["err"])
+                if reply["status"]:
+                    sys.exit(reply["status"])
+                return
+        elif args.command in FILE_COMMANDS or traced:
+            daemon.request({"op": "flush"}, path) # the files must hold the daemon's changes
+    if args.command in HISTORY_COMMANDS:
+        # The history lives in memory, so each run on the files would start without one
+        sys.exit(f"{args.command} needs a running daemon to remember changes between commands, "
+                 f"start one with 'daemon start' or use the menu, tui or a GUI")
+    run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+PyTo-Do Analytics
+Completion throughput, lead time and backlog over days and weeks
+
+DailyBuckets holds counters per local calendar day in arrays indexed by
+day number: tasks added, tasks completed, their total lead time (added
+to completed) and a histogram of those lead times, one row of LEAD_BINS
+per day. CompletionStats keeps buckets for the tasks in the list in step
+with the store, like its other indexes; the archive keeps buckets for
+archived tasks in a small file of its own, so history survives archiving
+without reading the archive again.
+
+A report only reads arrays: the throughput and lead time of a rolling
+window are sums over a slice of days, the histogram gives the median
+lead time, and the backlog on any day is what was added up to it less
+what was completed. Its cost depends on the days covered, not on how many
+tasks there are. Deleted tasks take their history with them.
+"""
+
+import time
+from array import array
+from collections import namedtuple
+from datetime import date
+
+# Days of daily throughput and calendar weeks shown by a report
+REPORT_DAYS = 14
+REPORT_WEEKS = 8
+# Rolling windows summarized by a report, in days, None for all time
+WINDOWS = (7, 30, 365, None)
+# Lead time histogram bins: bin 0 is under a minute, bin b holds lead
+# times of 2**(b-1) to 2**b minutes, the last bin everything longer
+LEAD_BINS = 24
+# Counters kept per day, each in its own array
+COUNTERS = ("added", "completed", "lead_total")
+
+_EPOCH_DAY = date(1970, 1, 1).toordinal()
+# Local UTC offset of each hour seen, DST changes on the hour
+_offsets = {}
+
+
+def day_of(epoch):
+    """Local calendar day of an epoch, as days since 1970-01-01"""
+    epoch = int(epoch)
+    hour = epoch // 3600
+    offset = _offsets.get(hour)
+    if offset is None:
+        offset = _offsets[hour] = time.localtime(hour * 3600).tm_gmtoff
+    return (epoch + offset) // 86400
+
+
+def date_of(day):
+    return date.fromordinal(day + _EPOCH_DAY)
+
+
+def lead_bin(seconds):
+    """Histogram bin of a lead time"""
+    return min(LEAD_BINS - 1, (max(0, seconds) // 60).bit_length())
+
+
+def format_duration(seconds):
+    """Short form of a duration, e.g. "3d 4h", "5h 10m" or "12m" """
+    if seconds is None:
+        return "-"
+    minutes = int(seconds) // 60
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
+class DailyBuckets:
+    """Per-day counters and lead time histograms, grown as days are seen"""
+
+    def __init__(self):
+        # Day number of index 0, None until a day is counted
+        self.first = None
+        self.added = array("q")
+        self.completed = array("q")
+        self.lead_total = array("q")
+        self.leads = array("q")
+
+    def __len__(self):
+        return len(self.added)
+
+    def _slot(self, day):
+        """Index of a day, growing the arrays to take it"""
+        if self.first is None:
+            self.first = day
+        if day < self.first:
+            grow = self.first - day
+            for name in COUNTERS:
+                getattr(self, name)[0:0] = array("q", bytes(8 * grow))
+            self.leads[0:0] = array("q", bytes(8 * grow * LEAD_BINS))
+            self.first = day
+        slot = day - self.first
+        if slot >= len(self.added):
+            grow = slot + 1 - len(self.added)
+            for name in COUNTERS:
+                getattr(self, name).extend(array("q", bytes(8 * grow)))
+            self.leads.extend(array("q", bytes(8 * grow * LEAD_BINS)))
+        return slot
+
+    def count(self, task, sign=1):
+        """Add a task's days to the counters, or take them away with sign -1
+
+        A completed task with no creation time counts as added on the day
+        it was completed, so it never takes the backlog below zero.
+        """
+        created = task.get("created_at")
+        finished = task.get("completed_at")
+        if not task.get("completed"):
+            finished = None
+        if created is not None:
+            self.added[self._slot(day_of(created))] += sign
+        elif finished is not None:
+            self.added[self._slot(day_of(finished))] += sign
+        if finished is not None:
+            slot = self._slot(day_of(finished))
+            self.completed[slot] += sign
+            if created is not None:
+                lead = max(0, int(finished - created))
+                self.lead_total[slot] += sign * lead
+                self.leads[slot * LEAD_BINS + lead_bin(lead)] += sign
+
+    def series(self, name, start, stop):
+        """Values of one counter for days start to stop - 1"""
+        values = [0] * (stop - start)
+        counter = getattr(self, name)
+        if self.first is not None:
+            low, high = max(start, self.first), min(stop, self.first + len(counter))
+            if low < high:
+                values[low - start:high - start] = counter[low - self.first:high - self.first]
+        return values
+
+    def total(self, name, start=None, stop=None):
+        """Sum of one counter over days start to stop - 1, None for no bound"""
+        if self.first is None:
+            return 0
+        low = 0 if start is None else max(0, start - self.first)
+        high = len(self.added) if stop is None else max(0, stop - self.first)
+        return sum(getattr(self, name)[low:high])
+
+    def histogram(self, start=None, stop=None):
+        """Lead time histogram of the tasks completed on days start to stop - 1"""
+        if self.first is None:
+            return [0] * LEAD_BINS
+        low = 0 if start is None else max(0, start - self.first)
+        high = len(self.added) if stop is None else max(0, stop - self.first)
+        if low >= high:
+            return [0] * LEAD_BINS
+        return [sum(self.leads[low * LEAD_BINS + b:high * LEAD_BINS:LEAD_BINS]) for b in range(LEAD_BINS)]
+
+    def to_json(self):
+        data = {name: list(getattr(self, name)) for name in COUNTERS + ("leads",)}
+        data["first"] = self.first
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        buckets = cls()
+        buckets.first = data.get("first")
+        for name in COUNTERS + ("leads",):
+            getattr(buckets, name).extend(data.get(name, ()))
+        return buckets
+
+
+class CompletionStats(DailyBuckets):
+    """Daily buckets of the tasks in the list, kept in step with the store"""
+
+    fields = ("created_at", "completed", "completed_at")
+
+    def __init__(self, tasks=()):
+        super().__init__()
+        self.rebuild(tasks)
+
+    def rebuild(self, tasks):
+        DailyBuckets.__init__(self)
+        for task in tasks:
+            self.count(task)
+
+    def add(self, task):
+        self.count(task, 1)
+
+    def discard(self, task):
+        self.count(task, -1)
+
+
+# One row of a report: a day, or the calendar week starting on it, with
+# tasks added and completed in it and the backlog left at its end
+Period = namedtuple("Period", "start added completed backlog")
+# A rolling window ending today: its days (None for all time), tasks
+# completed, completions per day, and mean and median lead time in seconds
+Window = namedtuple("Window", "days completed per_day lead_mean lead_median")
+Report = namedtuple("Report", "today days weeks windows backlog")
+
+
+def _median(histogram):
+    """Middle of the bin holding the median lead time, None without any"""
+    count = sum(histogram)
+    if not count:
+        return None
+    seen = 0
+    for index, value in enumerate(histogram):
+        seen += value
+        if seen * 2 >= count:
+            # Geometric middle of the bin's 2**(b-1) to 2**b minutes
+            return 30 if index == 0 else int(60 * 2 ** (index - 0.5))
+    return None
+
+
+def completion_report(buckets, today=None, days=REPORT_DAYS, weeks=REPORT_WEEKS):
+    """Report over several DailyBuckets, e.g. the list's and the archive's"""
+    today = day_of(int(time.time())) if today is None else today
+    days, weeks = max(1, days), max(1, weeks)
+    tomorrow = today + 1
+
+    def series(name, start, stop):
+        columns = [bucket.series(name, start, stop) for bucket in buckets]
+        return [sum(values) for values in zip(*columns)]
+
+    def total(name, start=None, stop=None):
+        return sum(bucket.total(name, start, stop) for bucket in buckets)
+
+    # Calendar weeks start on Monday; day 0 was a Thursday
+    monday = today - (today + 3) % 7
+    start = min(today - days + 1, monday - 7 * (weeks - 1))
+    added, completed = series("added", start, tomorrow), series("completed", start, tomorrow)
+    backlog = [total("added", None, start) - total("completed", None, start)]
+    for new, done in zip(added, completed):
+        backlog.append(backlog[-1] + new - done)
+    backlog = backlog[1:]
+
+    daily = [Period(day, added[day - start], completed[day - start], backlog[day - start])
+             for day in range(today - days + 1, tomorrow)]
+    weekly = []
+    for week_start in range(monday - 7 * (weeks - 1), monday + 1, 7):
+        low, high = week_start - start, min(week_start + 7, tomorrow) - start
+        weekly.append(Period(week_start, sum(added[low:high]), sum(completed[low:high]), backlog[high - 1]))
+
+    windows = []
+    for window in WINDOWS:
+        window_start = None if window is None else tomorrow - window
+        done = total("completed", window_start, tomorrow)
+        histogram = [sum(values) for values in zip(*(bucket.histogram(window_start, tomorrow) for bucket in buckets))]
+        timed = sum(histogram)
+        if window is None:
+            first = min((bucket.first for bucket in buckets if bucket.first is not None), default=today)
+            span = tomorrow - first
+        else:
+            span = window
+        windows.append(Window(window, done, done / span if span else 0.0,
+                              total("lead_total", window_start, tomorrow) / timed if timed else None,
+                              _median(histogram)))
+    return Report(today, daily, weekly, windows, backlog[-1])
+
+
+def format_report(report):
+    """Plain-text form of a report, for the CLI and the GUI"""
+    lines = ["Throughput and lead time (added to completed)"]
+    for window in report.windows:
+        label = "All time" if window.days is None else f"Last {window.days} days"
+        lines.append(f"  {label:<13} {window.completed:>8} done  {window.per_day:>7.1f}/day  "
+                     f"lead avg {format_duration(window.lead_mean):>8}  median "
+                     f"{'-' if window.lead_median is None else '~' + format_duration(window.lead_median)}")
+    lines.append("")
+    lines.append(f"{'Week of':<12}{'added':>8}{'done':>8}{'backlog':>10}")
+    for week in report.weeks:
+        lines.append(f"  {date_of(week.start):%Y-%m-%d}{week.added:>8}{week.completed:>8}{week.backlog:>10}")
+    lines.append("")
+    lines.append(f"{'Day':<12}{'added':>8}{'done':>8}{'backlog':>10}")
+    peak = max((day.completed for day in report.days), default=0) or 1
+    for day in report.days:
+        bar = "#" * round(20 * day.completed / peak)
+        lines.append(f"  {date_of(day.start):%a %m-%d} {day.added:>8}{day.completed:>8}{day.backlog:>10}  {bar}")
+    lines.append("")
+    lines.append(f"Backlog now: {report.backlog} open")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,146 @@
+"""
+PyTo-Do Archive
+Cold storage for tasks that were completed a long time ago
+
+Archived tasks live in a directory next to the data file, split into
+append-only segment files of newline-delimited JSON. Nothing here is read
+at startup; segments are only opened when the archive is browsed. Restoring
+a task appends a marker instead of rewriting a segment, so a reader walks
+the segments newest first and the first record it meets for an id wins.
+Per-day completion counts of the archived tasks are kept in a small
+history file beside the segments, for reports over the whole history.
+"""
+
+import json
+import os
+
+from .analytics import DailyBuckets
+
+# Archive completed tasks this many days after they were completed
+ARCHIVE_AFTER_DAYS = 30
+# Start a new segment file once the current one holds this many records
+SEGMENT_RECORDS = 10000
+# Daily completion buckets of the archived tasks
+HISTORY_FILE = "history.json"
+
+
+def archive_dir(path):
+    """Directory holding the archive of the data file at path"""
+    root, _ = os.path.splitext(path)
+    return root + ".archive"
+
+
+class Archive:
+    """Append-only, segmented store of archived tasks"""
+
+    def __init__(self, path):
+        self.directory = archive_dir(path)
+        self._tail_records = None
+        self._history = None
+
+    def segments(self):
+        """Segment file paths, oldest first"""
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(".ndjson"))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _tail(self):
+        """Path of the segment to append to, rolling over when it is full"""
+        segments = self.segments()
+        if segments and self._tail_records is None:
+            with open(segments[-1], "r", encoding="utf-8") as file:
+                self._tail_records = sum(1 for _ in file)
+        if not segments or self._tail_records >= SEGMENT_RECORDS:
+            os.makedirs(self.directory, exist_ok=True)
+            number = len(segments) + 1
+            self._tail_records = 0
+            return os.path.join(self.directory, f"segment-{number:05d}.ndjson")
+        return segments[-1]
+
+    def _append(self, records):
+        records = list(records)
+        while records:
+            segment = self._tail()
+            room = SEGMENT_RECORDS - self._tail_records
+            batch, records = records[:room], records[room:]
+            with open(segment, "a", encoding="utf-8") as file:
+                file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch))
+            self._tail_records += len(batch)
+
+    def history(self):
+        """analytics.DailyBuckets of the archived tasks"""
+        if self._history is None:
+            try:
+                with open(os.path.join(self.directory, HISTORY_FILE), "r", encoding="utf-8") as file:
+                    self._history = DailyBuckets.from_json(json.load(file))
+            except FileNotFoundError:
+                # Archives from before the history file are counted once
+                self._history = DailyBuckets()
+                for task in self:
+                    self._history.count(task)
+                if self.segments():
+                    self._save_history()
+        return self._history
+
+    def _save_history(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, HISTORY_FILE), "w", encoding="utf-8") as file:
+            json.dump(self._history.to_json(), file)
+
+    def add(self, tasks):
+        """Append tasks to the archive"""
+        history = self.history()
+        self._append(tasks)
+        for task in tasks:
+            history.count(task)
+        self._save_history()
+
+    def mark_restored(self, task_ids):
+        """Hide archived tasks that were moved back to the active list"""
+        self._append({"restored": task_id} for task_id in task_ids)
+
+    def __iter__(self):
+        """Archived tasks, most recently archived first"""
+        seen = set()
+        for segment in reversed(self.segments()):
+            with open(segment, "r", encoding="utf-8") as file:
+                lines = file.readlines()
+            for line in reversed(lines):
+                record = json.loads(line)
+                task_id = record.get("restored", record.get("id"))
+                if task_id in seen:
+                    continue
+                seen.add(task_id)
+                if "restored" not in record:
+                    yield record
+
+    def page(self, offset=0, limit=None):
+        """A slice of the archive, reading only as many segments as needed"""
+        tasks = []
+        for position, task in enumerate(self):
+            if position < offset:
+                continue
+            if limit is not None and len(tasks) >= limit:
+                break
+            tasks.append(task)
+        return tasks
+
+    def take(self, task_ids):
+        """Fetch archived tasks by id and mark them restored"""
+        wanted = set(task_ids)
+        found = []
+        for task in self:
+            if task.get("id") in wanted:
+                found.append(task)
+                wanted.discard(task["id"])
+                if not wanted:
+                    break
+        self.mark_restored(task["id"] for task in found)
+        if found:
+            history = self.history()
+            for task in found:
+                history.count(task, -1)
+            self._save_history()
+        return found
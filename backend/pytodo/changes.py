@@ -0,0 +1,96 @@
+"""
+PyTo-Do Change Feed
+Typed notifications of what changed in the task store
+
+The store publishes a list of Change records after every edit, undo or
+transaction. Consumers apply just those changes instead of redrawing the
+whole list. IdleBatcher collects changes between idle cycles of an event
+loop such as Tk's and hands them over once, coalesced per task.
+"""
+
+from collections import namedtuple
+
+INSERTED = "inserted"
+UPDATED = "updated"
+REMOVED = "removed"
+# The whole list was replaced (clear, import, merge), consumers start over
+RESET = "reset"
+
+# kind is one of the constants above, fields is the set of changed fields
+# for UPDATED (None meaning "any field") and None otherwise
+Change = namedtuple("Change", "kind id fields")
+
+
+def coalesce(changes):
+    """Collapse a sequence of changes into at most one per task id"""
+    merged = {}
+    for change in changes:
+        if change.kind == RESET:
+            merged = {None: change}
+            continue
+        previous = merged.get(change.id)
+        if previous is None:
+            merged[change.id] = change
+        elif previous.kind == INSERTED:
+            if change.kind == REMOVED:
+                del merged[change.id]
+        elif previous.kind == UPDATED:
+            if change.kind == UPDATED and previous.fields is not None and change.fields is not None:
+                merged[change.id] = Change(UPDATED, change.id, previous.fields | change.fields)
+            elif change.kind == UPDATED:
+                merged[change.id] = Change(UPDATED, change.id, None)
+            else:
+                merged[change.id] = change
+        elif previous.kind == REMOVED and change.kind == INSERTED:
+            # Removed and put back, e.g. by undo: it may have moved
+            merged[change.id] = Change(UPDATED, change.id, None)
+    return list(merged.values())
+
+
+class ChangeFeed:
+    """Publishes batches of changes to subscribed callbacks"""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        """Call callback(changes) after every change, returns an unsubscribe function"""
+        self.subscribers.append(callback)
+        return lambda: self.subscribers.remove(callback)
+
+    def publish(self, changes):
+        if not changes:
+            return
+        for callback in list(self.subscribers):
+            callback(changes)
+
+
+class IdleBatcher:
+    """Delivers changes once per idle cycle of an event loop
+
+    schedule is a function that runs a callback when the loop is idle,
+    such as a Tk root's after_idle.
+    """
+
+    def __init__(self, schedule, callback):
+        self.schedule = schedule
+        self.callback = callback
+        self.pending = []
+        self.scheduled = False
+
+    def __call__(self, changes):
+        self.pending.extend(changes)
+        if not self.scheduled:
+            self.scheduled = True
+            self.schedule(self.flush)
+
+    def discard(self):
+        """Drop changes not yet delivered"""
+        self.pending = []
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        self.scheduled = False
+        changes = coalesce(pending)
+        if changes:
+            self.callback(changes)
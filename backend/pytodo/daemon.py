@@ -0,0 +1,302 @@
+"""
+PyTo-Do Daemon
+Task lists kept loaded in a background process, answering the CLI
+
+The daemon listens on a Unix socket next to the task file and runs CLI
+commands against lists it keeps in memory, so a command costs a socket
+round trip instead of a full load. The protocol is one JSON object per
+line each way: {"argv": [...], "tty": bool} runs a command and answers
+{"status": int, "out": str, "err": str}; {"op": "ping"}, {"op": "flush"}
+and {"op": "stop"} manage the daemon itself.
+
+Changes are acknowledged once applied in memory and written in group
+commits: lists changed by a burst of commands are saved once, as soon as
+requests pause for COMMIT_DELAY, and never later than COMMIT_MAX_DELAY
+after the first unsaved change. A forked child does the saving, so a
+commit of a huge list does not hold up the commands that follow. A list
+file changed by someone else, a GUI say, is merged back in before the
+next command, and again just before the list is saved so the save does
+not overwrite it. The socket is only open to the user running the daemon.
+"""
+
+import contextlib
+import gc
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import time
+import traceback
+
+from .storage_processor import TASKS_FILE, read_tasks, load_tombstones
+
+# Seconds without requests before unsaved changes are written
+COMMIT_DELAY = 0.05
+# Longest a change stays unsaved while requests keep coming
+COMMIT_MAX_DELAY = 1.0
+# Seconds a client waits for an answer, and for a new daemon to start
+TIMEOUT = 30
+START_TIMEOUT = 10
+# Umask while the socket is created, leaving it 0o600
+SOCKET_UMASK = 0o177
+
+
+def supported():
+    """Whether this platform has Unix sockets"""
+    return hasattr(socket, "AF_UNIX")
+
+
+def socket_path(path=TASKS_FILE):
+    """Socket of the daemon serving the lists of a catalog"""
+    return os.path.splitext(path)[0] + ".sock"
+
+
+def log_path(path=TASKS_FILE):
+    """Where a daemon started in the background writes its errors"""
+    return os.path.splitext(path)[0] + ".daemon.log"
+
+
+def request(message, path=None):
+    """Send one message to the daemon, returns its reply or None if none is running"""
+    if not supported():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(TIMEOUT)
+            client.connect(path or socket_path())
+            client.sendall(json.dumps(message).encode() + b"\n")
+            with client.makefile("rb") as replies:
+                line = replies.readline()
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    return json.loads(line) if line else None
+
+
+def start(command, path=None, log=None, timeout=START_TIMEOUT):
+    """Run command, which serves, in the background; its first ping reply or None"""
+    path = path or socket_path()
+    with open(log or log_path(), "ab") as errors:
+        subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=errors,
+                         start_new_session=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        reply = request({"op": "ping"}, path)
+        if reply is not None:
+            return reply
+        time.sleep(0.05)
+    return None
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class Capture(io.StringIO):
+    """Output of one command, passing for a terminal if the client's is one"""
+
+    def __init__(self, tty=False):
+        super().__init__()
+        self.tty = tty
+
+    def isatty(self):
+        return self.tty
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            reply = self.server.answer(json.loads(line))
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class TaskDaemon(socketserver.UnixStreamServer):
+    """Runs commands from clients on one thread, saving in group commits
+
+    run(argv) carries out a CLI command, printing its output. Whatever
+    saves a list during a command should call defer(store) instead, and
+    the daemon saves it with the next commit; a change that must write
+    straight away, like archiving, goes through save_now.
+    """
+
+    # Wait this long for a request before looking at unsaved changes
+    timeout = COMMIT_DELAY
+
+    def __init__(self, path, catalog, run):
+        self.catalog = catalog
+        self.run = run
+        self.running = True
+        # Unsaved stores, with when each was first changed
+        self.dirty = {}
+        self.last_request = time.monotonic()
+        # File modification times as last loaded or written by the daemon
+        self.seen = {}
+        # (pid, stores) of the child saving a commit, if one is running
+        self.saver = None
+        # Commands read and change the user's tasks, so no one else may connect
+        umask = os.umask(SOCKET_UMASK)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(umask)
+
+    def defer(self, store):
+        self.dirty.setdefault(store, time.monotonic())
+
+    def save_now(self, store, change):
+        """Run change, which writes the store's files itself, between commits
+
+        The commit in progress is finished first so the two never write the
+        same files at once, and the files written count as seen so they are
+        not merged back in as someone else's. Returns what change returns.
+        The store is None for a change to the catalog alone.
+        """
+        self.commit(wait=True)
+        result = change()
+        if store is not None:
+            self._saved([store])
+        return result
+
+    def serve(self):
+        while self.running:
+            self.handle_request()
+            self.service()
+
+    def handle_timeout(self):
+        self.service()
+
+    def service(self):
+        """Commit once requests pause, or when changes have waited too long"""
+        if not self.reap() or not self.dirty:
+            return
+        now = time.monotonic()
+        if now - self.last_request >= COMMIT_DELAY or now - min(self.dirty.values()) >= COMMIT_MAX_DELAY:
+            self.commit()
+
+    def commit(self, wait=False):
+        """Save every list changed since the last commit, once each
+
+        The lists are saved by a forked child, which sees them as they were
+        at the fork while this process carries on answering. With wait, or
+        without fork, they are saved here and now.
+        """
+        if not self.reap(wait):
+            return
+        if not self.dirty:
+            return
+        stores = list(self.dirty)
+        self.dirty.clear()
+        # A write that landed since the last command would be lost otherwise
+        for store in stores:
+            self._catch_up(store)
+        self.catalog.save()
+        if wait or not hasattr(os, "fork"):
+            for store in stores:
+                store.save()
+            self._saved(stores)
+            return
+        pid = os.fork()
+        if pid == 0:
+            gc.disable()  # a collection would touch, and so copy, every page
+            try:
+                for store in stores:
+                    store.save()
+            except BaseException:
+                traceback.print_exc()
+                os._exit(1)
+            os._exit(0)
+        self.saver = (pid, stores)
+
+    def reap(self, wait=False):
+        """Whether no save is running, collecting one that has finished"""
+        if self.saver is None:
+            return True
+        pid, stores = self.saver
+        done, status = os.waitpid(pid, 0 if wait else os.WNOHANG)
+        if not done:
+            return False
+        self.saver = None
+        if status:
+            # Try again with the next commit
+            for store in stores:
+                self.defer(store)
+        else:
+            self._saved(stores)
+        return True
+
+    def _saved(self, stores):
+        for store in stores:
+            self.seen[store.path] = _mtime(store.path)
+
+    def _catch_up(self, store):
+        """Merge in a store's list file if someone else wrote it since last seen"""
+        modified = _mtime(store.path)
+        seen = self.seen.setdefault(store.path, modified)
+        if modified != seen:
+            store.catch_up(read_tasks(store.path), load_tombstones(store.path))
+            self.seen[store.path] = modified
+
+    def refresh(self):
+        """Merge in list files written by someone else since last seen"""
+        if self.saver is not None:
+            return  # changes seen now would be our own commit landing
+        for store in self.catalog.stores.values():
+            self._catch_up(store)
+
+    def answer(self, message):
+        op = message.get("op")
+        if op == "ping":
+            return {"pid": os.getpid(), "lists": sorted(self.catalog.stores), "unsaved": len(self.dirty)}
+        if op == "flush":
+            self.commit(wait=True)
+            return {"saved": True}
+        if op == "stop":
+            # Saved before answering, so the files are complete once stop returns
+            self.commit(wait=True)
+            self.running = False
+            return {"stopping": True}
+
+        self.refresh()
+        out, err = Capture(message.get("tty", False)), Capture()
+        status = 0
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                self.run(message["argv"])
+            except SystemExit as e:
+                status = e.code if isinstance(e.code, int) else int(e.code is not None)
+            except Exception:
+                traceback.print_exc()
+                status = 1
+        # Lists opened by this command count as seen as loaded
+        for store in self.catalog.stores.values():
+            self.seen.setdefault(store.path, _mtime(store.path))
+        self.last_request = time.monotonic()
+        return {"status": status, "out": out.getvalue(), "err": err.getvalue()}
+
+
+def serve(catalog, run, on_start=None, path=None):
+    """Answer commands until stopped, then save and remove the socket"""
+    path = path or socket_path(catalog.path)
+    if request({"op": "ping"}, path) is not None:
+        raise RuntimeError("A daemon is already running")
+    # A socket file without a daemon is left from one that was killed
+    if os.path.exists(path):
+        os.remove(path)
+    server = TaskDaemon(path, catalog, run)
+    signal.signal(signal.SIGTERM, lambda signum, frame: setattr(server, "running", False))
+    if on_start is not None:
+        on_start(server)
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.commit(wait=True)
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
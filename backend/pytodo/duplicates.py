@@ -0,0 +1,244 @@
+"""
+PyTo-Do Duplicates
+Finding tasks that say the same thing, on add, on import and in reports
+
+Task text is normalized (Unicode NFKC, case folded, punctuation dropped,
+whitespace collapsed) and hashed to a fingerprint. FingerprintIndex
+maps fingerprints to task ids and is kept in step with the store, so
+checking a new task costs one hash and one dict lookup, and the duplicate
+report only visits fingerprints that more than one task shares.
+
+Near duplicates, "Renew passport" and "renew pasport", are found with MinHash
+over character shingles: each text gets a short signature, signatures are
+cut into bands, and only texts sharing a band are compared. Signatures
+use one-permutation hashing, each shingle hashed once and the minimum
+kept per bin, with empty bins filled from their neighbours. Candidates
+are confirmed by the Jaccard similarity of their shingles. This index is
+built when asked for rather than kept up to date.
+"""
+
+import re
+import unicodedata
+
+# Characters per shingle for near-duplicate matching
+SHINGLE = 3
+# MinHash bins per signature, a power of two, cut into LSH_BANDS bands
+SIGNATURE = 32
+LSH_BANDS = 8
+# Shingle similarity at which two texts count as near duplicates
+NEAR_THRESHOLD = 0.7
+# What adding a duplicate does: add it with a warning, leave it out, or add it quietly
+DUPLICATE_POLICIES = ("flag", "skip", "allow")
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_HASH_MASK = (1 << 64) - 1
+_ROWS = SIGNATURE // LSH_BANDS
+
+
+def normalize(text):
+    """Text reduced to what makes two tasks the same"""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKC", text)
+    text = text.casefold()
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+def fingerprint(text):
+    """Hash of the normalized text
+
+    Python's own string hash, 64 bits on 64-bit builds. Fingerprints are
+    never saved, so its per-process seed does no harm.
+    """
+    return hash(normalize(text))
+
+
+class FingerprintIndex:
+    """Task ids by text fingerprint
+
+    Most fingerprints belong to one task, so the first id is kept in a
+    plain dict and only the rest go into lists.
+    """
+
+    fields = ("task",)
+
+    def __init__(self, tasks=()):
+        self.first = {}
+        self.others = {}
+        self.rebuild(tasks)
+
+    def __len__(self):
+        return len(self.first)
+
+    def rebuild(self, tasks):
+        self.first, self.others = {}, {}
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task):
+        key = fingerprint(task.get("task", ""))
+        first = self.first.setdefault(key, task["id"])
+        if first != task["id"]:
+            self.others.setdefault(key, []).append(task["id"])
+
+    def discard(self, task):
+        key = fingerprint(task.get("task", ""))
+        others = self.others.get(key)
+        if self.first.get(key) == task["id"]:
+            if others:
+                self.first[key] = others.pop(0)
+            else:
+                del self.first[key]
+        elif others and task["id"] in others:
+            others.remove(task["id"])
+        if others is not None and not others:
+            del self.others[key]
+
+    def find(self, text):
+        """Ids of the tasks with the same normalized text"""
+        key = fingerprint(text)
+        if key not in self.first:
+            return []
+        return [self.first[key]] + self.others.get(key, [])
+
+    def groups(self):
+        """Id lists of every text shared by more than one task"""
+        return [[self.first[key]] + others for key, others in self.others.items()]
+
+
+def shingles(text):
+    """Overlapping character runs of the normalized text"""
+    text = normalize(text)
+    return {text[start:start + SHINGLE] for start in range(max(1, len(text) - SHINGLE + 1))}
+
+
+def similarity(left, right):
+    """Jaccard similarity of two shingle sets"""
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def minhash(shingle_set):
+    """One-permutation MinHash of a shingle set, SIGNATURE values"""
+    bins = [None] * SIGNATURE
+    for shingle in shingle_set:
+        value = hash(shingle) & _HASH_MASK
+        slot = value & (SIGNATURE - 1)
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+    # An empty bin takes the value of the next full one, paired with the
+    # distance so borrowed values only match values borrowed alike; going
+    # round twice lets the last bins borrow from the first
+    signature = list(bins)
+    borrowed, distance = None, 0
+    for slot in reversed(range(2 * SIGNATURE)):
+        slot %= SIGNATURE
+        if bins[slot] is not None:
+            borrowed, distance = bins[slot], 0
+        else:
+            distance += 1
+            if borrowed is not None:
+                signature[slot] = (borrowed, distance)
+    return signature
+
+
+def band_keys(shingle_set):
+    """One LSH bucket key per band of the text's MinHash signature"""
+    signature = minhash(shingle_set)
+    return [hash((band,) + tuple(signature[band * _ROWS:(band + 1) * _ROWS])) for band in range(LSH_BANDS)]
+
+
+class NearDuplicateIndex:
+    """LSH buckets of task texts, for one check or report at a time"""
+
+    def __init__(self, tasks=(), threshold=NEAR_THRESHOLD):
+        self.threshold = threshold
+        # Bucket key -> tasks whose signature has that band
+        self.buckets = {}
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task):
+        for key in band_keys(shingles(task.get("task", ""))):
+            self.buckets.setdefault(key, []).append(task)
+
+    def find(self, text):
+        """Tasks whose text is at least threshold similar to text"""
+        wanted = shingles(text)
+        found, checked = [], set()
+        for key in band_keys(wanted):
+            for task in self.buckets.get(key, ()):
+                if id(task) not in checked:
+                    checked.add(id(task))
+                    if similarity(wanted, shingles(task.get("task", ""))) >= self.threshold:
+                        found.append(task)
+        return found
+
+
+def _root(parents, item):
+    while parents[item] != item:
+        parents[item] = parents[parents[item]]
+        item = parents[item]
+    return item
+
+
+def near_duplicate_groups(tasks, threshold=NEAR_THRESHOLD):
+    """Position lists of tasks with the same or similar text
+
+    Exact copies are grouped by fingerprint first, so LSH only sees one
+    text of each. Each bucket's texts are compared with its first text
+    and joined with a union-find, keeping the work near linear even when
+    a bucket is large.
+    """
+    exact = {}
+    for position, task in enumerate(tasks):
+        exact.setdefault(fingerprint(task.get("task", "")), []).append(position)
+    representatives = [positions[0] for positions in exact.values()]
+
+    parents = {position: position for position in representatives}
+    buckets = {}
+    for position in representatives:
+        for key in band_keys(shingles(tasks[position].get("task", ""))):
+            buckets.setdefault(key, []).append(position)
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        # Shingles are worked out again for the few texts that collide,
+        # rather than kept for every task
+        first = shingles(tasks[members[0]].get("task", ""))
+        for other in members[1:]:
+            if _root(parents, members[0]) != _root(parents, other) and \
+                    similarity(first, shingles(tasks[other].get("task", ""))) >= threshold:
+                parents[_root(parents, other)] = _root(parents, members[0])
+
+    groups = {}
+    for positions in exact.values():
+        groups.setdefault(_root(parents, positions[0]), []).extend(positions)
+    return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=lambda group: group[0])
+
+
+def split_duplicates(tasks, incoming, near=False, threshold=NEAR_THRESHOLD):
+    """(new, duplicates) of incoming records against tasks and each other
+
+    A record with the id of a task already in tasks is the same task and
+    counts as new, for merging to reconcile. Any other record whose text
+    matches a task, or an earlier record, is a duplicate.
+    """
+    ids = {task.get("id") for task in tasks}
+    exact = {fingerprint(task.get("task", "")) for task in tasks}
+    similar = NearDuplicateIndex(tasks, threshold) if near else None
+    new, duplicates = [], []
+    for record in incoming:
+        text = record.get("task", "")
+        if record.get("id") in ids:
+            new.append(record)
+            continue
+        key = fingerprint(text)
+        if key in exact or (similar is not None and similar.find(text)):
+            duplicates.append(record)
+            continue
+        new.append(record)
+        exact.add(key)
+        if similar is not None:
+            similar.add(record)
+    return new, duplicates
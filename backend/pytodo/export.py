@@ -0,0 +1,160 @@
+"""
+PyTo-Do Export
+CSV, newline-delimited JSON and Markdown checklists for other tools
+
+Each writer takes any iterable of tasks and writes one record at a time,
+so the export holds no more than one task in memory on top of its source.
+Tasks can come straight from a store's list or be read one by one from a
+task file with storage_processor.iter_tasks, and are narrowed with the
+same query dicts the shard search uses: status, text and date ranges.
+The file is written next to its destination and moved over it when
+complete, so a failed export never leaves half a file behind. A path of
+"-" writes to standard output instead.
+"""
+
+import csv
+import json
+import os
+import sys
+
+from .storage_processor import iter_tasks, matches
+from .timeindex import ADDED_FORMAT, format_epoch
+from .nextup import PRIORITIES, priority_of
+from .tags import format_tags
+
+# Columns of a CSV export, timestamps as local "YYYY-MM-DD HH:MM"
+CSV_FIELDS = ("id", "task", "completed", "created_at", "completed_at", "due_at", "priority", "tags", "parent")
+# Sync bookkeeping left out of NDJSON records
+INTERNAL_FIELDS = ("clock",)
+# Path that stands for standard output
+STDOUT = "-"
+
+
+def _date(epoch):
+    return "" if epoch is None else format_epoch(epoch, ADDED_FORMAT)
+
+
+def write_csv(tasks, file):
+    """One row per task under a header row"""
+    writer = csv.writer(file)
+    writer.writerow(CSV_FIELDS)
+    count = 0
+    for task in tasks:
+        writer.writerow((task.get("id", ""), task.get("task", ""), "yes" if task.get("completed") else "no",
+                         _date(task.get("created_at")), _date(task.get("completed_at")), _date(task.get("due_at")),
+                         PRIORITIES[priority_of(task)], " ".join(task.get("tags", ())), task.get("parent", "")))
+        count += 1
+    return count
+
+
+def write_ndjson(tasks, file):
+    """One JSON object per line"""
+    count = 0
+    for task in tasks:
+        record = {key: value for key, value in task.items() if key not in INTERNAL_FIELDS}
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def write_markdown(tasks, file, title="Tasks"):
+    """A checklist, one "- [ ]" or "- [x]" item per task"""
+    file.write(f"# {title}\n\n")
+    count = 0
+    for task in tasks:
+        text = " ".join(task.get("task", "").split())
+        due = f" (due {_date(task['due_at'])})" if task.get("due_at") is not None else ""
+        tags = f" {format_tags(task['tags'])}" if task.get("tags") else ""
+        file.write(f"- [{'x' if task.get('completed') else ' '}] {text}{due}{tags}\n")
+        count += 1
+    return count
+
+
+def write_json(tasks, file):
+    """A task list file like storage.json, written a task at a time"""
+    count = 0
+    file.write("[")
+    for task in tasks:
+        file.write(("\n" if not count else ",\n") + json.dumps(task, indent=4, ensure_ascii=False))
+        count += 1
+    file.write("\n]\n" if count else "]\n")
+    return count
+
+
+# Writers by format name
+FORMATS = {
+    "csv": write_csv,
+    "ndjson": write_ndjson,
+    "markdown": write_markdown,
+    "json": write_json,
+}
+
+# Format of each file extension
+EXTENSIONS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".md": "markdown",
+    ".markdown": "markdown",
+    ".json": "json",
+}
+
+# File dialog choices, in the order the GUIs offer them
+FILETYPES = [
+    ("JSON files", "*.json"),
+    ("CSV files", "*.csv"),
+    ("Newline-delimited JSON", "*.ndjson *.jsonl"),
+    ("Markdown checklist", "*.md"),
+    ("All files", "*.*"),
+]
+
+
+def format_for(path):
+    """Format name for a file name, JSON when the extension is unknown"""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), "json")
+
+
+def query_for(status="all", date_filter=None, text=None):
+    """Query dict for a status filter and a (field, start, end) date range"""
+    query = {}
+    if status in ("pending", "completed"):
+        query["completed"] = status == "completed"
+    if date_filter:
+        field, start, end = date_filter
+        query[field] = (start, end)
+    if text:
+        query["text"] = text
+    return query
+
+
+def select(tasks, query=None):
+    """The tasks matching a query, lazily"""
+    if not query:
+        return iter(tasks)
+    return (task for task in tasks if matches(task, query))
+
+
+def export_tasks(tasks, path, fmt=None, query=None):
+    """Write the matching tasks to path, returns how many were written"""
+    fmt = fmt or format_for(path)
+    writer = FORMATS[fmt]
+    if path == STDOUT:
+        count = writer(select(tasks, query), sys.stdout)
+        sys.stdout.flush()
+        return count
+    temp = path + ".tmp"
+    try:
+        # csv wants newline="" to write its own line endings
+        with open(temp, "w", encoding="utf-8", newline="" if fmt == "csv" else None) as file:
+            count = writer(select(tasks, query), file)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    return count
+
+
+def export_file(source, path, fmt=None, query=None):
+    """Export from a task file, reading it one task at a time"""
+    return export_tasks(iter_tasks(source), path, fmt, query)
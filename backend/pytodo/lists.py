@@ -0,0 +1,164 @@
+"""
+PyTo-Do Task Lists
+Named task lists, each kept in its own file
+
+The original data file holds the default list. Every other list gets a
+file of its own in a directory next to it, with its own tombstones and
+archive. A small catalog file records the name, file and task count of
+each list, so the switcher can show every list without opening any of
+them. A list is only read from disk when it is opened, and saving it
+writes its own file and the catalog, never another list. Lists other
+than the default can be renamed, which keeps their file, and deleted
+with every file they have.
+"""
+
+import json
+import os
+import re
+import shutil
+
+from .storage_processor import TASKS_FILE, shards_dir, snapshot_path, tombstones_path, write_atomic
+from .archive import archive_dir
+from .store import TaskStore
+
+# Name of the list stored in the original data file
+DEFAULT_LIST = "Tasks"
+
+
+def catalog_path(path):
+    """Catalog file for the lists of the data file at path"""
+    root, _ = os.path.splitext(path)
+    return root + ".catalog.json"
+
+
+def lists_dir(path):
+    """Directory holding the files of the non-default lists"""
+    root, _ = os.path.splitext(path)
+    return root + ".lists"
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.casefold()).strip("-") or "list"
+
+
+class Catalog:
+    """The named lists of one data file, opened on demand"""
+
+    def __init__(self, path=TASKS_FILE):
+        self.path = path
+        self.file = catalog_path(path)
+        self.base = os.path.dirname(path)
+        self.entries = self._read()
+        # Stores of the lists opened so far, by name
+        self.stores = {}
+        self._dirty = False
+
+    def _read(self):
+        try:
+            with open(self.file, "r", encoding="utf-8") as file:
+                entries = json.load(file)["lists"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            entries = []
+        if not any(entry["name"] == DEFAULT_LIST for entry in entries):
+            entries.insert(0, {"name": DEFAULT_LIST, "file": os.path.basename(self.path), "count": None})
+        return entries
+
+    def save(self):
+        """Write the catalog if a count or list changed"""
+        if not self._dirty:
+            return
+        write_atomic(self.file, json.dumps({"lists": self.entries}, indent=4, ensure_ascii=False).encode("utf-8"))
+        self._dirty = False
+
+    def _entry(self, name):
+        for entry in self.entries:
+            if entry["name"] == name:
+                return entry
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        return any(entry["name"] == name for entry in self.entries)
+
+    def names(self):
+        """List names in the order they were created"""
+        return [entry["name"] for entry in self.entries]
+
+    def count(self, name):
+        """Tasks in a list as of its last save, None if never counted"""
+        return self._entry(name)["count"]
+
+    def path_of(self, name):
+        """Data file of a list"""
+        return os.path.join(self.base, self._entry(name)["file"])
+
+    def open(self, name):
+        """The store of a list, loading it the first time"""
+        store = self.stores.get(name)
+        if store is None:
+            store = TaskStore(self.path_of(name))
+            self.stores[name] = store
+            # By entry rather than name, which may change
+            entry = self._entry(name)
+            self._count(entry, store)
+            store.changes.subscribe(lambda changes: self._count(entry, store))
+        return store
+
+    def _count(self, entry, store):
+        if entry["count"] != len(store):
+            entry["count"] = len(store)
+            self._dirty = True
+
+    def create(self, name):
+        """Add an empty list, its file is written on first save"""
+        name = name.strip()
+        if not name:
+            raise ValueError("List name cannot be empty")
+        if name in self:
+            raise ValueError(f"A list named '{name}' already exists")
+        taken = {entry["file"] for entry in self.entries}
+        slug = _slug(name)
+        file = os.path.join(os.path.basename(lists_dir(self.path)), slug + ".json")
+        number = 2
+        while file in taken:
+            file = os.path.join(os.path.basename(lists_dir(self.path)), f"{slug}-{number}.json")
+            number += 1
+        os.makedirs(lists_dir(self.path), exist_ok=True)
+        self.entries.append({"name": name, "file": file, "count": 0})
+        self._dirty = True
+        self.save()
+
+    def _other(self, name):
+        """Entry of a list that is not the default one"""
+        if name == DEFAULT_LIST:
+            raise ValueError(f"The default list '{DEFAULT_LIST}' cannot be renamed or deleted")
+        if name not in self:
+            raise ValueError(f"No list named '{name}'")
+        return self._entry(name)
+
+    def rename(self, name, new_name):
+        """Give a list another name, its file stays where it is"""
+        entry = self._other(name)
+        new_name = new_name.strip()
+        if not new_name:
+            raise ValueError("List name cannot be empty")
+        if new_name in self:
+            raise ValueError(f"A list named '{new_name}' already exists")
+        entry["name"] = new_name
+        if name in self.stores:
+            self.stores[new_name] = self.stores.pop(name)
+        self._dirty = True
+        self.save()
+
+    def delete(self, name):
+        """Remove a list with its file, tombstones, archive and shards"""
+        entry = self._other(name)
+        path = self.path_of(name)
+        self.entries.remove(entry)
+        self.stores.pop(name, None)
+        self._dirty = True
+        self.save()
+        for file in (path, snapshot_path(path), tombstones_path(path)):
+            if os.path.exists(file):
+                os.remove(file)
+        for directory in (archive_dir(path), shards_dir(path)):
+            shutil.rmtree(directory, ignore_errors=True)
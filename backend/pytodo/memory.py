@@ -0,0 +1,177 @@
+"""
+PyTo-Do Memory Report
+How much memory the task list and the GUIs use
+
+The report combines the size of the task list itself, measured by walking
+the task dicts, with tracemalloc's current and peak totals and its top
+allocation sites, and a count of Tk widgets by class when a window is
+given. Allocation sites are only known for memory allocated after tracing
+started, so start() should be called before the store is loaded.
+MemorySampler appends a report to a file every so often, one JSON object
+per line, to track regressions over time.
+"""
+
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+# Stack frames kept per allocation, more gives better sites but costs more
+FRAMES = 1
+# Allocation sites listed in a report
+TOP_SITES = 10
+# Tasks walked when sizing a list, larger lists are sampled
+SAMPLE_TASKS = 10000
+# Seconds between samples written by MemorySampler
+SAMPLE_INTERVAL = 60
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def start(frames=FRAMES):
+    """Start tracing allocations, if not already"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def _deep_size(value):
+    """Bytes held by a JSON-like value and everything in it"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(key) + _deep_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_size(item) for item in value)
+    return size
+
+
+def task_bytes(tasks, sample=SAMPLE_TASKS):
+    """Estimated bytes held by a task list, sampling big lists
+
+    Strings shared between tasks, like interned dict keys, are counted
+    once per task, so this errs on the high side.
+    """
+    if not tasks:
+        return sys.getsizeof(tasks)
+    picked = tasks if len(tasks) <= sample else random.sample(tasks, sample)
+    per_task = sum(_deep_size(task) for task in picked) / len(picked)
+    return int(sys.getsizeof(tasks) + per_task * len(tasks))
+
+
+def widget_counts(root):
+    """Number of widgets under a Tk window, by widget class"""
+    counts = Counter()
+    pending = [root]
+    while pending:
+        widget = pending.pop()
+        counts[widget.winfo_class()] += 1
+        pending.extend(widget.winfo_children())
+    return dict(counts.most_common())
+
+
+def max_rss():
+    """Peak resident set size in bytes, or None where unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def top_sites(limit=TOP_SITES):
+    """(file:line, bytes, blocks) of the biggest live allocation sites"""
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ))
+    return [(f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size, stat.count)
+            for stat in snapshot.statistics("lineno")[:limit]]
+
+
+def report(tasks=None, root=None, limit=TOP_SITES):
+    """A memory report as a dict that can be written as JSON"""
+    result = {"time": int(time.time()), "max_rss": max_rss(), "tracing": tracemalloc.is_tracing()}
+    if tracemalloc.is_tracing():
+        result["traced"], result["traced_peak"] = tracemalloc.get_traced_memory()
+    if tasks is not None:
+        result["tasks"] = len(tasks)
+        result["task_bytes"] = task_bytes(tasks)
+        result["bytes_per_task"] = result["task_bytes"] // len(tasks) if tasks else 0
+    if root is not None:
+        result["widgets"] = widget_counts(root)
+    result["top_sites"] = top_sites(limit)
+    return result
+
+
+def _size(count):
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+
+def format_report(result):
+    """Readable text of a report"""
+    lines = []
+    if "tasks" in result:
+        lines.append(f"Tasks: {result['tasks']}, about {_size(result['task_bytes'])} "
+                     f"({result['bytes_per_task']} bytes per task)")
+    if result.get("max_rss") is not None:
+        lines.append(f"Peak resident memory: {_size(result['max_rss'])}")
+    if result["tracing"]:
+        lines.append(f"Traced: {_size(result['traced'])} now, {_size(result['traced_peak'])} at peak")
+    else:
+        lines.append("Tracing is off, no allocation sites (set PYTHONTRACEMALLOC=1 to trace from startup)")
+    if "widgets" in result:
+        widgets = result["widgets"]
+        lines.append(f"Tk widgets: {sum(widgets.values())}")
+        lines.extend(f"  {count:>7}  {name}" for name, count in widgets.items())
+    if result["top_sites"]:
+        lines.append("Top allocation sites:")
+        lines.extend(f"  {_size(size):>10}  {blocks:>8} blocks  {site}" for site, size, blocks in result["top_sites"])
+    return "\n".join(lines) + "\n"
+
+
+class MemorySampler:
+    """Appends a memory report to a file at a fixed interval
+
+    collect() returns the report to write. after(delay_ms, callback) and
+    after_cancel(timer) schedule the samples, as Tk's methods of the same
+    name do; without them the owner calls sample() itself.
+    """
+
+    def __init__(self, path, collect, interval=SAMPLE_INTERVAL, after=None, after_cancel=None):
+        self.path = path
+        self.collect = collect
+        self.interval = interval
+        self.after = after
+        self.after_cancel = after_cancel
+        self.timer = None
+
+    def sample(self):
+        """Write one report now"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(self.collect()) + "\n")
+
+    def start(self):
+        """Sample now and then every interval"""
+        self.sample()
+        if self.after is not None:
+            self.timer = self.after(int(self.interval * 1000), self.start)
+
+    def stop(self):
+        if self.timer is not None:
+            self.after_cancel(self.timer)
+        self.timer = None
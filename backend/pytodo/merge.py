@@ -0,0 +1,221 @@
+"""
+PyTo-Do Merge Engine
+Conflict-free merging of task stores edited on different machines
+
+Every task carries an "id" and a "clock" map holding one hybrid logical
+clock stamp per field. Each field is a last-writer-wins register and the
+list itself is an observed-remove set. Adding a task tags it with a stamp,
+its "created" stamp or, once it has been brought back after a removal,
+a fresh "readded" one. Removing it tombstones the tag it had, so the
+tombstone covers that add and any earlier one but not a later re-add:
+undoing a delete or restoring from the archive wins over copies that
+only saw the removal. When two copies were re-added under different
+tags the later one is taken whole, since the other belongs to the
+removed task. Merging is commutative, associative and idempotent, so any two
+copies converge to the same result whatever order they are merged in.
+"""
+
+import hashlib
+import json
+import time
+import uuid
+
+# Fields that describe a record rather than hold user data
+META_FIELDS = ("id", "clock")
+# Width of the counter part of a stamp, keeps stamps comparable as strings
+COUNTER_DIGITS = 6
+
+
+def format_stamp(wall, counter, node):
+    """Encode a clock reading as a string that sorts in clock order"""
+    return f"{wall:013d}:{counter:0{COUNTER_DIGITS}d}:{node}"
+
+
+def parse_stamp(stamp):
+    """Decode a stamp into (wall, counter, node)"""
+    wall, counter, node = stamp.split(":", 2)
+    return int(wall), int(counter), node
+
+
+class HybridLogicalClock:
+    """Issues monotonic stamps that stay close to wall-clock time"""
+
+    def __init__(self, node=None):
+        self.node = node or uuid.uuid4().hex[:8]
+        self.wall = 0
+        self.counter = 0
+
+    def now(self):
+        """Return a stamp greater than every stamp issued or observed so far"""
+        physical = int(time.time() * 1000)
+        if physical > self.wall:
+            self.wall, self.counter = physical, 0
+        else:
+            self.counter += 1
+        return format_stamp(self.wall, self.counter, self.node)
+
+    def observe(self, stamp):
+        """Advance past a stamp received from another copy"""
+        if not stamp:
+            return
+        wall, counter, _ = parse_stamp(stamp)
+        if (wall, counter) > (self.wall, self.counter):
+            self.wall, self.counter = wall, counter
+
+
+# Clock shared by everything running in this process
+clock = HybridLogicalClock()
+
+
+def legacy_stamp(position):
+    """Creation stamp for tasks written before ids existed, keeps their order"""
+    return format_stamp(0, position, "legacy")
+
+
+def content_id(task, occurrence=0):
+    """Derive a stable id from a task's content
+
+    Two untouched copies of the same legacy file get the same ids, so they
+    merge into one list instead of doubling up.
+    """
+    key = f"{task.get('task', '')}\x00{task.get('added', '')}\x00{occurrence}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def ensure_metadata(tasks):
+    """Give every task an id and clock map in place, returns True if any changed"""
+    changed = False
+    seen = {}
+    for position, task in enumerate(tasks):
+        if "id" not in task:
+            key = (task.get("task", ""), task.get("added", ""))
+            occurrence = seen.get(key, 0)
+            seen[key] = occurrence + 1
+            task["id"] = content_id(task, occurrence)
+            changed = True
+        task_clock = task.get("clock")
+        if not isinstance(task_clock, dict):
+            task["clock"] = {"created": legacy_stamp(position)}
+            changed = True
+        elif "created" not in task_clock:
+            task_clock["created"] = legacy_stamp(position)
+            changed = True
+    return changed
+
+
+def new_task_metadata(task):
+    """Stamp a freshly created task with a new id and creation clock"""
+    stamp = clock.now()
+    task["id"] = uuid.uuid4().hex[:16]
+    task["clock"] = {"created": stamp}
+    for field in task:
+        if field not in META_FIELDS:
+            task["clock"][field] = stamp
+    return task
+
+
+def touch(task, *fields):
+    """Record that fields of a task were just changed locally"""
+    task_clock = task.setdefault("clock", {})
+    stamp = clock.now()
+    for field in fields:
+        task_clock[field] = stamp
+
+
+def add_tag(task):
+    """Stamp of the add a task is present under"""
+    task_clock = task.get("clock", {})
+    return task_clock.get("readded") or task_clock.get("created", "")
+
+
+def readd(task):
+    """Tag a removed task being put back with a new add, so no tombstone covers it"""
+    task.setdefault("clock", {})["readded"] = clock.now()
+
+
+def removed(tombstones, task):
+    """Whether a tombstone covers the add a task is present under
+
+    A task never put back is covered by any tombstone of its id, as
+    every tag it was ever added under comes before its first removal.
+    """
+    stamp = tombstones.get(task.get("id"))
+    return stamp is not None and task.get("clock", {}).get("readded", "") <= stamp
+
+
+def remove(tombstones, task):
+    """Tombstone the add a task is present under, so merges do not bring it back"""
+    if "id" in task:
+        tag = add_tag(task)
+        if tag > tombstones.get(task["id"], ""):
+            tombstones[task["id"]] = tag
+
+
+def _field_key(task, field):
+    """Ordering key of one field register, ties broken by presence then value"""
+    stamp = task.get("clock", {}).get(field, "")
+    return stamp, field in task, json.dumps(task.get(field), sort_keys=True)
+
+
+def merge_task(left, right):
+    """Merge two versions of the same task field by field
+
+    A version re-added later replaces the other whole.
+    """
+    left_readded = left.get("clock", {}).get("readded", "")
+    right_readded = right.get("clock", {}).get("readded", "")
+    if left_readded != right_readded:
+        left = right = left if left_readded > right_readded else right
+    left_clock = left.get("clock", {})
+    right_clock = right.get("clock", {})
+    created = [stamp for stamp in (left_clock.get("created"), right_clock.get("created")) if stamp]
+    merged = {"id": left["id"], "clock": {"created": min(created) if created else ""}}
+    if left_clock.get("readded"):
+        merged["clock"]["readded"] = left_clock["readded"]
+    fields = set(left) | set(right)
+    for field in sorted(fields):
+        if field in META_FIELDS:
+            continue
+        winner = left if _field_key(left, field) >= _field_key(right, field) else right
+        if field in winner:
+            merged[field] = winner[field]
+        if field in winner.get("clock", {}):
+            merged["clock"][field] = winner["clock"][field]
+    return merged
+
+
+def _sort_key(task):
+    return task.get("clock", {}).get("created", ""), task["id"]
+
+
+def merge_tasks(local, remote, local_removed=None, remote_removed=None):
+    """Merge two task lists and their tombstones
+
+    Returns (tasks, tombstones). Runs in linear time plus one sort of the
+    result, and the output does not depend on which side is "local".
+    """
+    local_removed = local_removed or {}
+    remote_removed = remote_removed or {}
+    ensure_metadata(local)
+    ensure_metadata(remote)
+
+    tombstones = dict(local_removed)
+    for task_id, stamp in remote_removed.items():
+        if stamp > tombstones.get(task_id, ""):
+            tombstones[task_id] = stamp
+
+    by_id = {}
+    for side in (local, remote):
+        for task in side:
+            task_id = task["id"]
+            if task_id in by_id:
+                by_id[task_id] = merge_task(by_id[task_id], task)
+            else:
+                by_id[task_id] = merge_task(task, task)
+
+    # Decided on the merged copy, which carries the latest add of either side
+    merged = sorted((task for task in by_id.values() if not removed(tombstones, task)), key=_sort_key)
+    for task in merged:
+        for stamp in task["clock"].values():
+            clock.observe(stamp)
+    return merged, tombstones
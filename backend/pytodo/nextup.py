@@ -0,0 +1,102 @@
+"""
+PyTo-Do Next Up
+What to do next: pending tasks ranked by priority, then due date
+
+NextUpQueue is a min-heap over the pending tasks, kept in step with the
+store like its other indexes. An edit pushes a fresh entry and marks the
+old one dead instead of searching the heap for it; dead entries are
+skipped when read, and the heap is rebuilt once they outnumber the live
+ones. top(k) reads the k best tasks without popping anything, walking
+the heap from its root with a second heap of at most k + 1 candidates,
+so it costs O(k log k) however long the list is.
+"""
+
+import heapq
+import itertools
+
+from .sortindex import _tiebreak
+
+# Priority names, most urgent first; a task stores the index as "priority"
+PRIORITIES = ("high", "normal", "low")
+# Priority of tasks that have none
+DEFAULT_PRIORITY = 1
+# Tasks shown by the "Next up" views
+NEXT_UP = 20
+
+
+def priority_of(task):
+    """Priority index of a task, DEFAULT_PRIORITY when unset or unknown"""
+    priority = task.get("priority")
+    return priority if priority in range(len(PRIORITIES)) else DEFAULT_PRIORITY
+
+
+def parse_priority(text):
+    """Priority index of a name or its first letter, e.g. "high" or "h" """
+    text = text.strip().lower()
+    for index, name in enumerate(PRIORITIES):
+        if text and name.startswith(text):
+            return index
+    raise ValueError(f"Unknown priority '{text}', use one of {', '.join(PRIORITIES)}")
+
+
+def rank(task):
+    """Sort key of a pending task: priority, then due date (undated last), then age"""
+    due_at = task.get("due_at")
+    return (priority_of(task), due_at is None, due_at or 0, _tiebreak(task))
+
+
+class NextUpQueue:
+    """Pending tasks by rank, with lazy deletion"""
+
+    fields = ("priority", "due_at", "completed")
+
+    def __init__(self, tasks=()):
+        self.heap = []
+        # Live [rank, count, id] entry of each task id; a dead entry has its id
+        # set to None, the count keeps equal ranks from comparing ids
+        self.entries = {}
+        self.counter = itertools.count()
+        self.dead = 0
+        self.rebuild(tasks)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def rebuild(self, tasks):
+        self.heap = [[rank(task), next(self.counter), task["id"]] for task in tasks if not task.get("completed")]
+        heapq.heapify(self.heap)
+        self.entries = {entry[2]: entry for entry in self.heap}
+        self.dead = 0
+
+    def add(self, task):
+        if task.get("completed"):
+            return
+        entry = [rank(task), next(self.counter), task["id"]]
+        self.entries[task["id"]] = entry
+        heapq.heappush(self.heap, entry)
+
+    def discard(self, task):
+        entry = self.entries.pop(task["id"], None)
+        if entry is None:
+            return
+        entry[2] = None
+        self.dead += 1
+        # Mostly dead entries would only slow every read down
+        if self.dead > len(self.entries):
+            self.heap = [entry for entry in self.heap if entry[2] is not None]
+            heapq.heapify(self.heap)
+            self.dead = 0
+
+    def top(self, count=NEXT_UP):
+        """Ids of the count best-ranked pending tasks, best first"""
+        heap, found = self.heap, []
+        candidates = [(heap[0], 0)] if heap else []
+        while candidates and len(found) < count:
+            entry, index = heapq.heappop(candidates)
+            if entry[2] is not None:
+                found.append(entry[2])
+            # Children rank no better than their parent, dead or alive
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(candidates, (heap[child], child))
+        return found
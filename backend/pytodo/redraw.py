@@ -0,0 +1,120 @@
+"""
+PyTo-Do Redraw Scheduler
+Coalesced, frame-budgeted UI updates for the Tk frontends
+
+Instead of redrawing as soon as something changes, a frontend marks parts
+of its window dirty. Every dirty part is redrawn once, on the next idle
+cycle, however many times it was marked. Long jobs such as building
+thousands of rows run in slices that fit a frame budget, so the window
+keeps responding while they finish. Named timers replace each other
+instead of piling up.
+
+The scheduler is given the event loop's after_idle, after and
+after_cancel, so it works with a Tk root or anything that acts like one.
+"""
+
+import time
+
+# Seconds of work per frame before the rest is left to the next one
+FRAME_BUDGET = 0.012
+# Milliseconds between slices of a long job, lets input events through
+SLICE_DELAY = 1
+
+
+class FrameScheduler:
+    """Redraws dirty parts once per idle cycle and slices long jobs"""
+
+    def __init__(self, after_idle, after, after_cancel, budget=FRAME_BUDGET, clock=time.perf_counter):
+        self.after_idle = after_idle
+        self.after = after
+        self.after_cancel = after_cancel
+        self.budget = budget
+        self.clock = clock
+        # (name, callback) pairs, redrawn in this order
+        self.parts = []
+        self.dirty = set()
+        self.pending = None
+        # Named one-shot timers and sliced jobs, by key
+        self.timers = {}
+        self.jobs = {}
+
+    def register(self, name, callback):
+        """Redraw a part of the window with callback when it is dirty"""
+        self.parts.append((name, callback))
+
+    def mark(self, *names):
+        """Redraw these parts on the next idle cycle"""
+        self.dirty.update(names)
+        if self.pending is None:
+            self.pending = self.after_idle(self._on_pending)
+
+    def is_dirty(self, name):
+        return name in self.dirty
+
+    def _on_pending(self):
+        self.pending = None
+        self.flush()
+
+    def flush(self):
+        """Redraw dirty parts now, then carry on with sliced jobs"""
+        if self.pending is not None:
+            self.after_cancel(self.pending)
+            self.pending = None
+        started = self.clock()
+        dirty, self.dirty = self.dirty, set()
+        for name, callback in self.parts:
+            if name in dirty:
+                callback()
+        for key in list(self.jobs):
+            if self.clock() - started >= self.budget:
+                break
+            self._run(key, started)
+        if self.jobs and self.pending is None:
+            self.pending = self.after(SLICE_DELAY, self._on_pending)
+
+    # Sliced jobs
+
+    def in_slices(self, key, items, work, done=None):
+        """Call work(item) for every item, a frame budget at a time
+
+        Starting a job under a key drops the unfinished one it replaces.
+        done() is called once the last item has been handled.
+        """
+        self.jobs[key] = (iter(items), work, done)
+        if self.pending is None:
+            self.pending = self.after_idle(self._on_pending)
+
+    def busy(self, key):
+        """Whether a job under key is still running"""
+        return key in self.jobs
+
+    def _run(self, key, started):
+        items, work, done = self.jobs[key]
+        for item in items:
+            work(item)
+            if self.clock() - started >= self.budget:
+                return
+        # Only finish the job if it was not replaced while running
+        if self.jobs.get(key, (None,))[0] is items:
+            del self.jobs[key]
+            if done is not None:
+                done()
+
+    # Timers
+
+    def later(self, key, delay_ms, callback):
+        """Run callback after delay_ms, replacing any timer under key"""
+        self.cancel(key)
+
+        def fire():
+            self.timers.pop(key, None)
+            callback()
+
+        self.timers[key] = self.after(delay_ms, fire)
+
+    def cancel(self, key):
+        """Drop the timer and job under key, if any"""
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            self.after_cancel(timer)
+        self.jobs.pop(key, None)
@@ -0,0 +1,223 @@
+"""
+PyTo-Do Reminders
+Due dates and reminders fired from a single timer
+
+A task may carry a "due_at" epoch and an optional earlier "remind_at". The
+reminder time of every pending task sits in a min-heap, so adding or
+moving a reminder is one O(log n) push. Cancelling only marks the entry
+dead, and dead entries are skipped when they reach the top. Whatever the
+number of reminders, the scheduler keeps exactly one timer pending: the
+one for the earliest deadline, re-armed only when that deadline changes.
+
+When a reminder fires the task is stamped with "reminded_at", saved with
+it, so a reminder fires once however often the list is reloaded or the
+app restarted; moving the due date past that time arms it again.
+"""
+
+import heapq
+import itertools
+import time
+from datetime import datetime
+
+from .changes import UPDATED, REMOVED, RESET
+from .timeindex import ADDED_FORMAT, DATE_FORMAT
+
+# Fields that decide whether and when a task's reminder fires
+REMINDER_FIELDS = frozenset(("due_at", "remind_at", "completed", "reminded_at"))
+# Longest single wait; a far-off deadline is reached in several hops so
+# the timer never overflows and clock changes are picked up
+MAX_WAIT = 3600
+# Time of day used when a due date is given without one
+DEFAULT_DUE_TIME = (9, 0)
+
+
+def parse_due(text):
+    """Epoch of a "YYYY-MM-DD" or "YYYY-MM-DD HH:MM" due date"""
+    text = text.strip()
+    try:
+        return int(datetime.strptime(text, ADDED_FORMAT).timestamp())
+    except ValueError:
+        hour, minute = DEFAULT_DUE_TIME
+        return int(datetime.strptime(text, DATE_FORMAT).replace(hour=hour, minute=minute).timestamp())
+
+
+def reminder_time(task):
+    """When a task's reminder fires, or None if it has none or it has fired"""
+    if task.get("completed"):
+        return None
+    remind_at = task.get("remind_at")
+    when = remind_at if remind_at is not None else task.get("due_at")
+    reminded_at = task.get("reminded_at")
+    if when is None or (reminded_at is not None and reminded_at >= when):
+        return None
+    return when
+
+
+def reminder_text(tasks):
+    """Status bar message for reminders firing together"""
+    if len(tasks) == 1:
+        return f"⏰ Due: '{tasks[0]['task']}'"
+    names = ", ".join(f"'{task['task']}'" for task in tasks[:3])
+    more = f" and {len(tasks) - 3} more" if len(tasks) > 3 else ""
+    return f"⏰ {len(tasks)} tasks due: {names}{more}"
+
+
+class ReminderHeap:
+    """Reminder times by task id with O(log n) push and lazy cancel"""
+
+    def __init__(self):
+        self.heap = []
+        # Live entry of each task id; a cancelled entry has its id set to None
+        self.entries = {}
+        self.counter = itertools.count()
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def rebuild(self, reminders):
+        """Start over from (when, task_id) pairs in O(n)"""
+        self.heap = [[when, next(self.counter), task_id] for when, task_id in reminders]
+        heapq.heapify(self.heap)
+        self.entries = {entry[2]: entry for entry in self.heap}
+        self.dead = 0
+
+    def push(self, task_id, when):
+        """Set a task's reminder time, replacing any earlier one"""
+        self.cancel(task_id)
+        entry = [when, next(self.counter), task_id]
+        self.entries[task_id] = entry
+        heapq.heappush(self.heap, entry)
+
+    def cancel(self, task_id):
+        entry = self.entries.pop(task_id, None)
+        if entry is None:
+            return
+        entry[2] = None
+        self.dead += 1
+        # Mostly dead entries would only slow every pop down
+        if self.dead > len(self.entries):
+            self.rebuild((when, task_id) for when, _, task_id in self.heap if task_id is not None)
+
+    def _skip_dead(self):
+        while self.heap and self.heap[0][2] is None:
+            heapq.heappop(self.heap)
+            self.dead -= 1
+
+    def peek(self):
+        """Earliest reminder time, or None"""
+        self._skip_dead()
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        """Ids of tasks whose reminder time has come, earliest first"""
+        due = []
+        self._skip_dead()
+        while self.heap and self.heap[0][0] <= now:
+            _, _, task_id = heapq.heappop(self.heap)
+            del self.entries[task_id]
+            due.append(task_id)
+            self._skip_dead()
+        return due
+
+
+class ReminderScheduler:
+    """Fires reminders for the tasks of a store
+
+    after(delay_ms, callback) and after_cancel(timer) schedule the single
+    timer, as Tk's methods of the same name do. Without them nothing is
+    scheduled and the owner calls fire() itself, using next_delay() to
+    know how long to sleep.
+    """
+
+    def __init__(self, store, notify, after=None, after_cancel=None, clock=time.time):
+        self.store = store
+        self.notify = notify
+        self.after = after
+        self.after_cancel = after_cancel
+        self.clock = clock
+        self.heap = ReminderHeap()
+        self.timer = None
+        self.armed_for = None
+        self.unsubscribe = store.changes.subscribe(self.on_changes)
+        self.rebuild()
+
+    def close(self):
+        """Stop following the store and drop the pending timer"""
+        self.unsubscribe()
+        self._disarm()
+
+    def rebuild(self):
+        self.heap.rebuild((reminder_time(task), task["id"]) for task in self.store.tasks
+                          if reminder_time(task) is not None)
+        self._arm()
+
+    def _task(self, task_id):
+        """The task with an id, or None if it has gone since"""
+        try:
+            return self.store.tasks[self.store.index_of(task_id)]
+        except KeyError:
+            return None
+
+    def track(self, task):
+        when = reminder_time(task)
+        if when is None:
+            self.heap.cancel(task["id"])
+        else:
+            self.heap.push(task["id"], when)
+
+    def on_changes(self, changes):
+        for change in changes:
+            if change.kind == RESET:
+                self.rebuild()
+                return
+            if change.kind == REMOVED:
+                self.heap.cancel(change.id)
+            elif change.kind != UPDATED or change.fields is None or change.fields & REMINDER_FIELDS:
+                task = self._task(change.id)
+                if task is not None:
+                    self.track(task)
+        self._arm()
+
+    def next_delay(self):
+        """Seconds until the next reminder, or None if there is none"""
+        when = self.heap.peek()
+        return None if when is None else max(0, when - self.clock())
+
+    def fire(self):
+        """Notify about every reminder that is due, returns those tasks
+
+        The tasks are stamped as reminded, the owner saves them.
+        """
+        now = self.clock()
+        tasks = [task for task in map(self._task, self.heap.pop_due(now)) if task is not None]
+        if tasks:
+            self.store.mark_reminded([task["id"] for task in tasks], int(now))
+            self.notify(tasks)
+        self._arm()
+        return tasks
+
+    def _on_timer(self):
+        self.timer = None
+        self.armed_for = None
+        self.fire()
+
+    def _disarm(self):
+        if self.timer is not None:
+            self.after_cancel(self.timer)
+        self.timer = None
+        self.armed_for = None
+
+    def _arm(self):
+        """Keep one timer pending, for the earliest reminder"""
+        if self.after is None:
+            return
+        when = self.heap.peek()
+        if when == self.armed_for and self.timer is not None:
+            return
+        self._disarm()
+        if when is None:
+            return
+        delay = min(max(0, when - self.clock()), MAX_WAIT)
+        self.timer = self.after(int(delay * 1000), self._on_timer)
+        self.armed_for = when
@@ -0,0 +1,67 @@
+"""
+PyTo-Do Sort Orders
+Task orders kept sorted as the list changes
+
+A SortOrder holds (key, tiebreak, id) entries in sorted order plus the key
+it computed for each id. Adding or editing a task moves one entry with a
+bisection instead of re-sorting the whole list, and the cached key means a
+task can be found again even after its fields have changed.
+"""
+
+import bisect
+
+# Orders the frontends can sort by: name -> (fields it depends on, key)
+SORT_KEYS = {
+    "status": (("completed",), lambda task: bool(task.get("completed"))),
+    "task": (("task",), lambda task: task.get("task", "").casefold()),
+    "added": (("created_at",), lambda task: task.get("created_at") or 0),
+    "completed": (("completed_at",), lambda task: task.get("completed_at") or 0),
+    # Tasks without a due date sort after every dated one
+    "due": (("due_at",), lambda task: (task.get("due_at") is None, task.get("due_at") or 0)),
+    # Most urgent first, tasks without a priority count as "normal"
+    "priority": (("priority",), lambda task: task.get("priority", 1)),
+}
+
+
+def _tiebreak(task):
+    """Equal keys keep creation order"""
+    return task.get("clock", {}).get("created", "")
+
+
+class SortOrder:
+    """Task ids sorted by one of SORT_KEYS"""
+
+    def __init__(self, name, tasks=()):
+        self.name = name
+        self.fields, self.key = SORT_KEYS[name]
+        self.entries = []
+        self.cached = {}
+        self.rebuild(tasks)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _entry(self, task):
+        return self.key(task), _tiebreak(task), task["id"]
+
+    def rebuild(self, tasks):
+        self.cached = {task["id"]: self._entry(task) for task in tasks}
+        self.entries = sorted(self.cached.values())
+
+    def add(self, task):
+        entry = self._entry(task)
+        self.cached[task["id"]] = entry
+        bisect.insort(self.entries, entry)
+
+    def discard(self, task):
+        entry = self.cached.pop(task["id"], None)
+        if entry is None:
+            return
+        position = bisect.bisect_left(self.entries, entry)
+        if position < len(self.entries) and self.entries[position] == entry:
+            del self.entries[position]
+
+    def ids(self, reverse=False):
+        """Task ids in sorted order"""
+        entries = reversed(self.entries) if reverse else self.entries
+        return [entry[2] for entry in entries]
@@ -1,5 +1,13 @@
+import gc
+import hashlib
 import json
+import marshal
+import os
+import sys
 import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 # file to store tasks
 TASKS_FILE = "storage.json"
 
@@ -16,7 +24,7 @@ def load_tasks():
         # if file is corrupted, reset tasks
         print("Error: Resetting tasks")
     return []
-    
+
     # Save the tasks to the file
 def save_tasks(tasks):
     with open(TASKS_FILE, "w") as file:
@@ -24,4 +32,289 @@ def save_tasks(tasks):
         print("Saving tasks...")
         time.sleep(1)
         print("Tasks saved successfully.")
-    
\ No newline at end of file
+
+# Read and write the task list at a given path, used by the task store
+def read_tasks(path=TASKS_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return []
+    except json.JSONDecodeError:
+        print("Warning: Corrupted storage file, starting fresh")
+        return []
+
+# Tasks of a file one at a time, reading it in blocks, so a huge file
+# can be streamed through without holding the whole list
+READ_BLOCK = 1 << 16
+
+def iter_tasks(path=TASKS_FILE):
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as file:
+        buffer, position, done = "", 0, False
+        started = False
+        while True:
+            # Skip whitespace, commas and the opening bracket
+            while position < len(buffer) and buffer[position] in " \t\r\n,[":
+                if buffer[position] == "[":
+                    started = True
+                position += 1
+            if started and position < len(buffer) and buffer[position] == "]":
+                return
+            if position < len(buffer) and started:
+                try:
+                    task, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if done:
+                        raise
+                else:
+                    yield task
+                    position = end
+                    continue
+            elif done:
+                if started:
+                    raise json.JSONDecodeError("Unterminated task list", buffer, position)
+                return
+            # Need more text: drop what was used and read the next block
+            block = file.read(READ_BLOCK)
+            done = not block
+            buffer, position = buffer[position:] + block, 0
+
+# Write a whole file under a temporary name and move it into place, so a
+# reader in another process, the daemon's saver running say, never sees
+# half of it. The name is per process as several may save at once
+def write_atomic(path, data):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+def write_tasks(tasks, path=TASKS_FILE):
+    write_atomic(path, json.dumps(tasks, indent=4, ensure_ascii=False).encode("utf-8"))
+
+# Snapshot cache: the parsed task list saved with marshal beside the data
+# file, so a start where the file has not changed skips JSON parsing. It is
+# keyed by the file's size, mtime and content hash, and by the Python
+# version since marshal's format may change between versions.
+SNAPSHOT_FORMAT = 1
+
+def snapshot_path(path=TASKS_FILE):
+    root, _ = os.path.splitext(path)
+    return root + ".snapshot"
+
+def _snapshot_key(path, digest):
+    stat = os.stat(path)
+    return {"format": SNAPSHOT_FORMAT, "python": tuple(sys.version_info[:2]),
+            "size": stat.st_size, "mtime": stat.st_mtime_ns, "sha1": digest}
+
+def _file_digest(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+def save_snapshot(tasks, path=TASKS_FILE, digest=None):
+    key = _snapshot_key(path, digest or _file_digest(path))
+    header = marshal.dumps(key)
+    write_atomic(snapshot_path(path), len(header).to_bytes(4, "little") + header + marshal.dumps(tasks))
+
+def load_snapshot(path=TASKS_FILE):
+    # The cached tasks if they still match the data file, otherwise None
+    try:
+        stat = os.stat(path)
+        with open(snapshot_path(path), "rb") as file:
+            # marshal.load on a file reads in tiny pieces, so the key is
+            # length-prefixed and the tasks are read in one go
+            key = marshal.loads(file.read(int.from_bytes(file.read(4), "little")))
+            if key.get("format") != SNAPSHOT_FORMAT or key.get("python") != tuple(sys.version_info[:2]) \
+                    or key.get("size") != stat.st_size:
+                return None
+            # Same size but touched since, e.g. copied back: compare contents
+            if key.get("mtime") != stat.st_mtime_ns and key.get("sha1") != _file_digest(path):
+                return None
+            data = file.read()
+        # Decoding a million small dicts sets off one collection after
+        # another, and plain JSON data has no cycles for them to find
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            tasks = marshal.loads(data)
+        finally:
+            if enabled:
+                gc.enable()
+    except (OSError, EOFError, ValueError, TypeError, AttributeError):
+        return None
+    return tasks if isinstance(tasks, list) else None
+
+def read_tasks_cached(path=TASKS_FILE):
+    tasks = load_snapshot(path)
+    if tasks is not None:
+        return tasks
+    tasks = read_tasks(path)
+    if os.path.exists(path):
+        try:
+            save_snapshot(tasks, path)
+        except (OSError, ValueError):
+            pass # Only a cache, the next start parses the JSON again
+    return tasks
+
+def write_tasks_cached(tasks, path=TASKS_FILE):
+    data = json.dumps(tasks, indent=4, ensure_ascii=False).encode("utf-8")
+    write_atomic(path, data)
+    try:
+        save_snapshot(tasks, path, hashlib.sha1(data).hexdigest())
+    except (OSError, ValueError):
+        pass
+
+# Removed task ids live next to the data file so merges can tell
+# "deleted here" apart from "never seen here"
+def tombstones_path(path=TASKS_FILE):
+    root, _ = os.path.splitext(path)
+    return root + ".tombstones.json"
+
+def load_tombstones(path=TASKS_FILE):
+    try:
+        with open(tombstones_path(path), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_tombstones(tombstones, path=TASKS_FILE):
+    write_atomic(tombstones_path(path), json.dumps(tombstones).encode("utf-8"))
+
+# Sharded storage: a task list split into many files under storage.shards/,
+# so loading and scanning can be spread over worker processes. Tasks go to
+# a shard by a hash of their id, or by the month they were created in. The
+# list file stays the list as loaded, in its own order, and a sharded list
+# is split again with the same layout on every save so the shards never
+# fall behind it; only the shards whose tasks changed are written.
+SHARD_PARTITIONS = ("hash", "date")
+# Shard count, partition and a digest of each shard, kept beside the shards
+LAYOUT_FILE = "layout.json"
+
+def shards_dir(path=TASKS_FILE):
+    root, _ = os.path.splitext(path)
+    return root + ".shards"
+
+def shard_name(task, shards, partition="hash"):
+    if partition == "date":
+        created = task.get("created_at")
+        if created is None:
+            return "shard-undated.json"
+        return datetime.fromtimestamp(created).strftime("shard-%Y-%m.json")
+    # crc32 rather than hash() so the layout is the same in every process
+    return f"shard-{zlib.crc32(task['id'].encode('utf-8')) % shards:03d}.json"
+
+def shard_layout(path=TASKS_FILE):
+    # {"shards": count, "partition": name, "digests": {shard: sha1}}, or
+    # None if the list is not sharded
+    try:
+        with open(os.path.join(shards_dir(path), LAYOUT_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def shard_files(path=TASKS_FILE):
+    # Falls back to the plain data file when the list was never sharded,
+    # or was saved since without them, so a scan never sees stale shards.
+    # The layout is written last on every split, unchanged shards are not
+    directory = shards_dir(path)
+    try:
+        files = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                 if name.startswith("shard-") and name.endswith(".json")]
+    except FileNotFoundError:
+        files = []
+    saved = os.path.getmtime(path) if os.path.exists(path) else None
+    layout = os.path.join(directory, LAYOUT_FILE)
+    if files:
+        split = os.path.getmtime(layout) if os.path.exists(layout) else min(os.path.getmtime(shard) for shard in files)
+        if saved is None or split >= saved:
+            return files
+    return [path] if saved is not None else []
+
+def write_shards(tasks, path=TASKS_FILE, shards=None, partition="hash"):
+    if partition not in SHARD_PARTITIONS:
+        raise ValueError(f"Unknown partition '{partition}'")
+    shards = shards or os.cpu_count() or 1
+    grouped = {}
+    for task in tasks:
+        grouped.setdefault(shard_name(task, shards, partition), []).append(task)
+    directory = shards_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    # A shard whose contents are as last written is left alone
+    layout = shard_layout(path) or {}
+    written = layout.get("digests", {}) if (layout.get("shards"), layout.get("partition")) == (shards, partition) else {}
+    digests = {}
+    for name, shard in grouped.items():
+        data = json.dumps(shard, ensure_ascii=False).encode("utf-8")
+        digests[name] = hashlib.sha1(data).hexdigest()
+        if written.get(name) != digests[name] or not os.path.exists(os.path.join(directory, name)):
+            write_atomic(os.path.join(directory, name), data)
+    # Only once the new shards are in place, so a scan never misses tasks
+    for name in os.listdir(directory):
+        if name.startswith("shard-") and name.endswith(".json") and name not in grouped:
+            os.remove(os.path.join(directory, name))
+    layout = {"shards": shards, "partition": partition, "digests": digests}
+    write_atomic(os.path.join(directory, LAYOUT_FILE), json.dumps(layout).encode("utf-8"))
+    return len(grouped)
+
+# A query is a dict, so it can be sent to worker processes:
+#   "text": substring to look for, case-insensitive
+#   "completed": True or False
+#   "created_at" / "completed_at": (start, end) epochs, either may be None
+def matches(task, query):
+    text = query.get("text")
+    if text is not None and text.casefold() not in task.get("task", "").casefold():
+        return False
+    if "completed" in query and bool(task.get("completed")) != query["completed"]:
+        return False
+    for field in ("created_at", "completed_at"):
+        if field in query:
+            start, end = query[field]
+            value = task.get(field)
+            if value is None or (start is not None and value < start) or (end is not None and value >= end):
+                return False
+    return True
+
+# Worker functions, one shard file each
+def _load_shard(shard, query):
+    tasks = read_tasks(shard)
+    if query:
+        tasks = [task for task in tasks if matches(task, query)]
+    return tasks
+
+def _count_shard(shard, query):
+    return sum(1 for task in read_tasks(shard) if not query or matches(task, query))
+
+def _map_shards(function, path, query, workers):
+    files = shard_files(path)
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers <= 1:
+        # Not worth starting processes for
+        return [function(shard, query) for shard in files]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(function, files, [query] * len(files)))
+
+def _in_order(results):
+    # Shards interleave the list, creation order puts it back together
+    tasks = [task for shard in results for task in shard]
+    tasks.sort(key=lambda task: (task.get("clock", {}).get("created", ""), task.get("id", "")))
+    return tasks
+
+def load_shards(path=TASKS_FILE, workers=None):
+    return _in_order(_map_shards(_load_shard, path, None, workers))
+
+def filter_shards(query, path=TASKS_FILE, workers=None):
+    return _in_order(_map_shards(_load_shard, path, query, workers))
+
+def search_shards(text, path=TASKS_FILE, workers=None):
+    return filter_shards({"text": text}, path, workers)
+
+def count_shards(query=None, path=TASKS_FILE, workers=None):
+    return sum(_map_shards(_count_shard, path, query, workers))
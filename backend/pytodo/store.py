@@ -0,0 +1,586 @@
+"""
+PyTo-Do Task Store
+The in-memory task list shared by the CLI and the GUIs
+
+Every change goes through the store so it can be stamped for merging and
+recorded for undo. History entries hold inverse operations rather than
+copies of the list: undoing a delete keeps only the removed task, undoing
+an edit keeps only the old field values, and undoing "clear all" keeps a
+reference to the old list object. Each step costs memory proportional to
+what changed, never to the size of the list.
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from . import merge
+from .archive import Archive, ARCHIVE_AFTER_DAYS
+from .timeindex import TimestampIndex, parse_added
+from .sortindex import SortOrder
+from .nextup import NextUpQueue, NEXT_UP
+from .tags import TagIndex, TAG_CLOUD, positions_of
+from .duplicates import FingerprintIndex, NEAR_THRESHOLD, near_duplicate_groups
+from .subtasks import ChildIndex
+from .analytics import CompletionStats, REPORT_DAYS, REPORT_WEEKS, completion_report, day_of
+from .changes import ChangeFeed, Change, INSERTED, UPDATED, REMOVED, RESET
+from .storage_processor import (TASKS_FILE, read_tasks_cached, write_tasks_cached, load_tombstones, save_tombstones,
+                                shard_layout, write_shards)
+
+# How many steps can be undone
+MAX_HISTORY = 100
+# Marks a field that did not exist before an edit
+_MISSING = object()
+
+
+def migrate_timestamps(tasks):
+    """Give tasks from older versions an epoch "created_at" from "added"
+
+    The string is parsed once here and the epoch is saved with the task.
+    """
+    for task in tasks:
+        if "created_at" not in task and "added" in task:
+            task["created_at"] = parse_added(task["added"])
+
+
+class TaskStore:
+    """A task list loaded from a JSON file with undo/redo"""
+
+    def __init__(self, path=TASKS_FILE):
+        self.path = path
+        self.tasks = read_tasks_cached(path)
+        merge.ensure_metadata(self.tasks)
+        migrate_timestamps(self.tasks)
+        self.tombstones = load_tombstones(path)
+        self.undo_stack = deque(maxlen=MAX_HISTORY)
+        self.redo_stack = []
+        # Inverse operations of the transaction in progress
+        self._pending = None
+        # Position of each task id, rebuilt lazily after inserts and removals
+        self._positions = None
+        # Indexes kept in step with every change, each watching some fields
+        self.created_index = TimestampIndex("created_at")
+        self.completed_index = TimestampIndex("completed_at")
+        self.indexes = [self.created_index, self.completed_index]
+        # Tag bitmaps are over list positions, so they are told positions too
+        self.tag_index = TagIndex()
+        # Sort orders, each built the first time it is asked for
+        self.sort_orders = {}
+        # Pending tasks by priority and due date, built on first use
+        self.next_up_queue = None
+        # Task ids by text fingerprint, built on first use
+        self.fingerprint_index = None
+        # Subtasks and rolled-up counts of every task, built on first use
+        self.child_index = None
+        # Tasks added and completed per day, built on the first report
+        self.completion_stats = None
+        # Subscribers are told what changed after every edit
+        self.changes = ChangeFeed()
+        self._outbox = []
+        self.archive = Archive(path)
+        self._reindex()
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def __getitem__(self, index):
+        return self.tasks[index]
+
+    def save(self):
+        """Write the tasks and tombstones to disk, and the shards of a sharded list"""
+        write_tasks_cached(self.tasks, self.path)
+        layout = shard_layout(self.path)
+        if layout:
+            write_shards(self.tasks, self.path, layout["shards"], layout["partition"])
+        save_tombstones(self.tombstones, self.path)
+
+    # Change feed
+
+    def _emit(self, kind, task_id=None, fields=None):
+        self._outbox.append(Change(kind, task_id, fields))
+
+    def _publish(self):
+        """Send the changes made so far, unless a transaction is still open"""
+        if self._pending is None and self._outbox:
+            outbox, self._outbox = self._outbox, []
+            self.changes.publish(outbox)
+
+    # Indexes
+
+    def _reindex(self):
+        self._positions = None
+        for index in self.indexes:
+            index.rebuild(self.tasks)
+        # Built on the first tag query, lists without tags never pay for it
+        self.tag_index.stale = True
+
+    def _index_add(self, task, position=None):
+        # Appending leaves every other position as it was
+        if self._positions is not None and position == len(self.tasks) - 1:
+            self._positions[task["id"]] = position
+        else:
+            self._positions = None
+        for index in self.indexes:
+            index.add(task)
+        if position is None:
+            self.tag_index.stale = True
+        else:
+            self.tag_index.insert(position, task)
+
+    def _index_discard(self, task, position=None):
+        if self._positions is not None and position == len(self.tasks):
+            del self._positions[task["id"]]
+        else:
+            self._positions = None
+        for index in self.indexes:
+            index.discard(task)
+        if position is None:
+            self.tag_index.stale = True
+        else:
+            self.tag_index.remove(position, task)
+
+    def index_of(self, task_id):
+        """Current position of a task id in the list"""
+        if self._positions is None:
+            self._positions = {task["id"]: position for position, task in enumerate(self.tasks)}
+        return self._positions[task_id]
+
+    def between(self, field, start=None, end=None):
+        """(position, task) pairs with start <= task[field] < end, in list order"""
+        index = self.created_index if field == "created_at" else self.completed_index
+        positions = sorted(self.index_of(task_id) for task_id in index.range(start, end))
+        return [(position, self.tasks[position]) for position in positions]
+
+    def sorted_positions(self, name, reverse=False, positions=None):
+        """Positions in the order of a sort key, optionally only those given
+
+        The order is built on first use and then kept up to date as tasks
+        change, so later calls only walk the already-sorted ids.
+        """
+        order = self.sort_orders.get(name)
+        if order is None:
+            order = self.sort_orders[name] = SortOrder(name, self.tasks)
+            self.indexes.append(order)
+        ordered = [self.index_of(task_id) for task_id in order.ids(reverse)]
+        if positions is not None:
+            allowed = set(positions)
+            ordered = [position for position in ordered if position in allowed]
+        return ordered
+
+    def next_up(self, count=NEXT_UP):
+        """Positions of the count most urgent pending tasks, most urgent first"""
+        if self.next_up_queue is None:
+            self.next_up_queue = NextUpQueue(self.tasks)
+            self.indexes.append(self.next_up_queue)
+        return [self.index_of(task_id) for task_id in self.next_up_queue.top(count)]
+
+    def _fingerprints(self):
+        if self.fingerprint_index is None:
+            self.fingerprint_index = FingerprintIndex(self.tasks)
+            self.indexes.append(self.fingerprint_index)
+        return self.fingerprint_index
+
+    def duplicates_of(self, text):
+        """Positions of the tasks whose text is the same as text, ignoring case and punctuation"""
+        return sorted(self.index_of(task_id) for task_id in self._fingerprints().find(text))
+
+    def duplicate_groups(self, near=False, threshold=NEAR_THRESHOLD):
+        """Position lists of tasks with the same text, or similar text with near"""
+        if near:
+            return near_duplicate_groups(self.tasks, threshold)
+        groups = [sorted(self.index_of(task_id) for task_id in ids) for ids in self._fingerprints().groups()]
+        return sorted(groups, key=lambda group: group[0])
+
+    def _subtasks(self):
+        if self.child_index is None:
+            self.child_index = ChildIndex(self.tasks)
+            self.indexes.append(self.child_index)
+        return self.child_index
+
+    def has_subtasks(self):
+        """Whether any task in the list has subtasks"""
+        return bool(self._subtasks().children)
+
+    def parent_of(self, task):
+        """Id of a task's parent, None for a top-level task"""
+        if task.get("parent") is None:
+            return None
+        return self._subtasks().parent_of(task["id"])
+
+    def top_level(self, positions):
+        """Those of positions whose task is not a subtask"""
+        tasks, parents = self.tasks, self._subtasks().parents
+        return [position for position in positions if tasks[position].get("parent") not in parents]
+
+    def root_of(self, task):
+        """Id of the top-level task a task is under, its own id at the top"""
+        return self._subtasks().root_of(task["id"])
+
+    def subtasks(self, task_id):
+        """Positions of a task's direct subtasks, in list order"""
+        return sorted(self.index_of(child) for child in self._subtasks().children_of(task_id))
+
+    def subtree(self, index):
+        """Positions of the task at index and every task below it, in list order"""
+        task_id = self.tasks[index]["id"]
+        return sorted([index] + [self.index_of(child) for child in self._subtasks().descendants(task_id)])
+
+    def rollup(self, task_id):
+        """(done, total) over every task below a task"""
+        return self._subtasks().rollup(task_id)
+
+    def _completion_buckets(self):
+        """Daily buckets of the list and of the archive"""
+        if self.completion_stats is None:
+            self.completion_stats = CompletionStats(self.tasks)
+            self.indexes.append(self.completion_stats)
+        return [self.completion_stats, self.archive.history()]
+
+    def report(self, days=REPORT_DAYS, weeks=REPORT_WEEKS, today=None):
+        """analytics.Report of throughput, lead time and backlog, archived tasks included"""
+        return completion_report(self._completion_buckets(), today, days, weeks)
+
+    def completed_in(self, days, today=None):
+        """Tasks completed in the last days days, today included, archived tasks included"""
+        today = day_of(int(time.time())) if today is None else today
+        return sum(buckets.total("completed", today + 1 - days, today + 1) for buckets in self._completion_buckets())
+
+    def _tags(self):
+        if self.tag_index.stale:
+            self.tag_index.rebuild(self.tasks)
+        return self.tag_index
+
+    def tagged(self, tag_filter):
+        """Positions of the tasks passing a tags.TagFilter, in list order"""
+        return positions_of(self._tags().select(tag_filter))
+
+    def count_tagged(self, tag_filter):
+        return self._tags().count(tag_filter)
+
+    def tag_cloud(self, limit=TAG_CLOUD):
+        """(tag, count) of the most used tags, most used first"""
+        return self._tags().cloud(limit)
+
+    # Primitive operations, each returns the operation that reverses it
+
+    def _insert(self, index, task):
+        self.tasks.insert(index, task)
+        # Put back after a removal, so under a new add the tombstone does not cover
+        if self.tombstones.pop(task.get("id"), None) is not None:
+            merge.readd(task)
+        self._index_add(task, index)
+        self._emit(INSERTED, task["id"])
+        return ("remove", index)
+
+    def _remove(self, index):
+        task = self.tasks.pop(index)
+        merge.remove(self.tombstones, task)
+        self._index_discard(task, index)
+        self._emit(REMOVED, task["id"])
+        return ("insert", index, task)
+
+    def _set(self, index, fields):
+        task = self.tasks[index]
+        previous = {field: task.get(field, _MISSING) for field in fields}
+        watching = [idx for idx in self.indexes if any(field in fields for field in idx.fields)]
+        for idx in watching:
+            idx.discard(task)
+        for field, value in fields.items():
+            if value is _MISSING:
+                task.pop(field, None)
+            else:
+                task[field] = value
+        merge.touch(task, *fields)
+        for idx in watching:
+            idx.add(task)
+        if "tags" in fields:
+            old = previous["tags"]
+            self.tag_index.retag(index, () if old is _MISSING else old, task.get("tags", ()))
+        self._emit(UPDATED, task["id"], frozenset(fields))
+        return ("set", index, previous)
+
+    def _remove_many(self, indexes):
+        doomed = set(indexes)
+        removed = []
+        kept = []
+        for index, task in enumerate(self.tasks):
+            if index in doomed:
+                removed.append((index, task))
+                merge.remove(self.tombstones, task)
+            else:
+                kept.append(task)
+        self.tasks[:] = kept
+        for _, task in removed:
+            self._index_discard(task)
+            self._emit(REMOVED, task["id"])
+        return ("insert_many", removed)
+
+    def _insert_many(self, pairs):
+        merged = []
+        tasks = iter(self.tasks)
+        for index, task in pairs:
+            while len(merged) < index:
+                merged.append(next(tasks))
+            merged.append(task)
+            if self.tombstones.pop(task.get("id"), None) is not None:
+                merge.readd(task)
+            self._index_add(task)
+            self._emit(INSERTED, task["id"])
+        merged.extend(tasks)
+        self.tasks[:] = merged
+        return ("remove_many", [index for index, _ in pairs])
+
+    def _swap(self, tasks, tombstones):
+        previous = ("swap", self.tasks, self.tombstones)
+        self.tasks, self.tombstones = tasks, tombstones
+        self._reindex()
+        self._emit(RESET)
+        return previous
+
+    def _apply(self, op):
+        name, args = op[0], op[1:]
+        return getattr(self, "_" + name)(*args)
+
+    def _record(self, label, *ops):
+        """Apply operations as one undoable step"""
+        inverse = [self._apply(op) for op in ops]
+        if self._pending is not None:
+            self._pending.extend(inverse)
+            return
+        self.undo_stack.append((label, inverse))
+        self.redo_stack.clear()
+        self._publish()
+
+    @contextmanager
+    def transaction(self, label):
+        """Group every change made inside the block into one undo step
+
+        Nested blocks join the outer one. If the block raises, its changes
+        are rolled back.
+        """
+        if self._pending is not None:
+            yield self
+            return
+        self._pending = []
+        try:
+            yield self
+        except BaseException:
+            pending, self._pending = self._pending, None
+            for op in reversed(pending):
+                self._apply(op)
+            self._publish()
+            raise
+        pending, self._pending = self._pending, None
+        if pending:
+            self.undo_stack.append((label, pending))
+            self.redo_stack.clear()
+        self._publish()
+
+    # Changes
+
+    def add(self, text, **fields):
+        """Append a new task and return it"""
+        task = {
+            "task": text,
+            "completed": False,
+            "created_at": int(time.time())
+        }
+        task.update(fields)
+        merge.new_task_metadata(task)
+        self._record(f"Add '{text}'", ("insert", len(self.tasks), task))
+        return task
+
+    def update(self, index, **fields):
+        """Change fields of the task at index"""
+        self._record(f"Edit '{self.tasks[index]['task']}'", ("set", index, fields))
+        return self.tasks[index]
+
+    def mark_reminded(self, task_ids, when):
+        """Stamp tasks whose reminders fired, so they do not fire again
+
+        Bookkeeping rather than an edit, so it is not undoable, like
+        archiving; the stamp still merges like any other field.
+        """
+        for task_id in task_ids:
+            self._set(self.index_of(task_id), {"reminded_at": when})
+        self._publish()
+
+    def set_parent(self, index, parent_id):
+        """Move the task at index under another task, or to the top level with None"""
+        task = self.tasks[index]
+        if parent_id is not None and (parent_id == task["id"] or parent_id in self._subtasks().descendants(task["id"])):
+            raise ValueError("A task cannot be moved under itself or its own subtasks")
+        return self.update(index, parent=_MISSING if parent_id is None else parent_id)
+
+    def complete(self, index):
+        """Mark the task at index as completed"""
+        return self.update(index, completed=True, completed_at=int(time.time()))
+
+    def remove(self, index):
+        """Delete the task at index and return it"""
+        task = self.tasks[index]
+        self._record(f"Delete '{task['task']}'", ("remove", index))
+        return task
+
+    def update_many(self, indexes, **fields):
+        """Change the same fields on several tasks in one step"""
+        with self.transaction(f"Edit {len(indexes)} tasks"):
+            for index in indexes:
+                self._record(None, ("set", index, dict(fields)))
+
+    def complete_many(self, indexes):
+        """Mark several tasks as completed in one step"""
+        pending = [index for index in indexes if not self.tasks[index]["completed"]]
+        now = int(time.time())
+        with self.transaction(f"Complete {len(pending)} tasks"):
+            for index in pending:
+                self._record(None, ("set", index, {"completed": True, "completed_at": now}))
+
+    def remove_many(self, indexes):
+        """Delete several tasks in one pass over the list"""
+        indexes = sorted(set(indexes))
+        if indexes:
+            self._record(f"Delete {len(indexes)} tasks", ("remove_many", indexes))
+
+    def clear(self):
+        """Delete every task"""
+        tombstones = dict(self.tombstones)
+        for task in self.tasks:
+            merge.remove(tombstones, task)
+        self._record("Clear all", ("swap", [], tombstones))
+
+    def replace(self, tasks):
+        """Replace every task with another list, e.g. from an import"""
+        merge.ensure_metadata(tasks)
+        migrate_timestamps(tasks)
+        kept = {task["id"] for task in tasks}
+        tombstones = {task_id: stamp for task_id, stamp in self.tombstones.items() if task_id not in kept}
+        for task in tasks:
+            if task["id"] in self.tombstones:
+                merge.readd(task)
+        for task in self.tasks:
+            if task["id"] not in kept:
+                merge.remove(tombstones, task)
+        self._record("Import", ("swap", tasks, tombstones))
+
+    def reload(self, tasks, tombstones=None):
+        """Take the list as saved by another instance
+
+        Like archiving this is not undoable, and the history is cleared
+        since its positions refer to the list that was replaced.
+        """
+        merge.ensure_metadata(tasks)
+        migrate_timestamps(tasks)
+        self.tasks[:] = tasks
+        if tombstones is not None:
+            self.tombstones = tombstones
+        self._reindex()
+        self._emit(RESET)
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self._publish()
+
+    def catch_up(self, tasks, tombstones=None):
+        """Merge in the list as saved by another instance, like reload
+
+        Someone else's write is not an edit made here, so it is not undone
+        by undo; the history is cleared as its positions no longer apply.
+        """
+        migrate_timestamps(tasks)
+        self.reload(*merge.merge_tasks(self.tasks, tasks, self.tombstones, tombstones))
+
+    def merge(self, tasks, tombstones=None):
+        """Merge another copy of the task list into this one, as one undoable step"""
+        migrate_timestamps(tasks)
+        merged, merged_tombstones = merge.merge_tasks(self.tasks, tasks, self.tombstones, tombstones)
+        self._record("Merge", ("swap", merged, merged_tombstones))
+
+    # Archive
+
+    def archive_completed(self, max_age_days=ARCHIVE_AFTER_DAYS):
+        """Move tasks completed more than max_age_days ago into the archive
+
+        Tasks completed before completion times were recorded get one now,
+        so they are archived once they have aged like any other. Archiving
+        is housekeeping rather than an edit, so it is not undoable, and it
+        saves straight away so no task is ever in both places. Archived
+        tasks are tombstoned, so merging a copy that still has them does
+        not bring them back. The frontends run this when they start.
+        Returns the number of tasks archived.
+        """
+        now = int(time.time())
+        cutoff = now - max_age_days * 86400
+        kept = []
+        archived = []
+        changed = False
+        for task in self.tasks:
+            if task.get("completed"):
+                if "completed_at" not in task:
+                    task["completed_at"] = now
+                    changed = True
+                elif task["completed_at"] <= cutoff:
+                    archived.append(task)
+                    continue
+            kept.append(task)
+        if archived:
+            self.archive.add(archived)
+            for task in archived:
+                merge.remove(self.tombstones, task)
+            self.tasks[:] = kept
+            self._reindex()
+            for task in archived:
+                self._emit(REMOVED, task["id"])
+            # Positions changed under the history, so it no longer applies
+            self.undo_stack.clear()
+            self.redo_stack.clear()
+        if archived or changed:
+            self.save()
+        self._publish()
+        return len(archived)
+
+    def restore(self, task_ids):
+        """Move archived tasks back to the active list, returns them
+
+        Their completion time is reset so they are not archived again on
+        the next start, and they are re-added so copies that still hold
+        the archive tombstone do not remove them again. Saves straight
+        away, like archiving.
+        """
+        restored = self.archive.take(task_ids)
+        now = int(time.time())
+        for task in restored:
+            task["completed_at"] = now
+            self.tombstones.pop(task.get("id"), None)
+            merge.readd(task)
+            self.tasks.append(task)
+            self._index_add(task, len(self.tasks) - 1)
+            self._emit(INSERTED, task["id"])
+        if restored:
+            self.save()
+        self._publish()
+        return restored
+
+    # History
+
+    def undo(self):
+        """Reverse the last change, returns its label or None"""
+        if not self.undo_stack:
+            return None
+        label, ops = self.undo_stack.pop()
+        inverse = [self._apply(op) for op in reversed(ops)]
+        self.redo_stack.append((label, inverse))
+        self._publish()
+        return label
+
+    def redo(self):
+        """Reapply the last undone change, returns its label or None"""
+        if not self.redo_stack:
+            return None
+        label, ops = self.redo_stack.pop()
+        inverse = [self._apply(op) for op in reversed(ops)]
+        self.undo_stack.append((label, inverse))
+        self._publish()
+        return label
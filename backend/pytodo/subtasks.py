@@ -0,0 +1,136 @@
+"""
+PyTo-Do Subtasks
+Tasks inside tasks, and how far along each one's subtasks are
+
+A subtask names its parent by id in its "parent" field, so the list on
+disk stays flat and merges like any other field. ChildIndex keeps the
+children of every task and the parent of every task in step with the
+store, so a task's subtasks are found without scanning the list. It also
+keeps each task's rolled-up (done, total) over all the tasks below it:
+adding, removing or completing a task walks up its ancestors adjusting
+their counts, so an edit costs the depth of the task, and reading counts
+is a dict lookup however large the tree below.
+
+A task whose parent is not in the list, deleted or not yet merged, is
+shown at the top level. The counts of a deleted task are kept up to date
+while its subtasks remain, so undoing the delete puts it back as it was.
+"""
+
+
+class ChildIndex:
+    """Children and rolled-up completion counts of every task"""
+
+    fields = ("parent", "completed")
+
+    def __init__(self, tasks=()):
+        self.children = {}
+        self.parents = {}
+        # Whether each subtask is done, top-level tasks count for nobody
+        self.completed = {}
+        # Task id -> [done, total] over the tasks below it, for tasks with any
+        self.counts = {}
+        self.rebuild(tasks)
+
+    def rebuild(self, tasks):
+        parents = {task["id"]: task.get("parent") for task in tasks}
+        children, completed, counts = {}, {}, {}
+        for task in tasks:
+            parent = task.get("parent")
+            if parent is None:
+                continue
+            task_id = task["id"]
+            done = completed[task_id] = bool(task.get("completed"))
+            children.setdefault(parent, set()).add(task_id)
+            # Inline _adjust, this runs once per subtask
+            for _ in range(len(parents) + 1):
+                entry = counts.get(parent)
+                if entry is None:
+                    counts[parent] = [int(done), 1]
+                else:
+                    entry[0] += done
+                    entry[1] += 1
+                parent = parents.get(parent)
+                if parent is None:
+                    break
+        self.children, self.parents, self.completed, self.counts = children, parents, completed, counts
+
+    def _adjust(self, task_id, done, total):
+        """Add to the counts of a task and every task above it"""
+        counts, parents = self.counts, self.parents
+        # Bounded, in case merged edits left a cycle of parents
+        for _ in range(len(parents) + 1):
+            entry = counts.get(task_id)
+            if entry is None:
+                entry = counts[task_id] = [0, 0]
+            entry[0] += done
+            entry[1] += total
+            if not entry[1]:
+                del counts[task_id]
+            task_id = parents.get(task_id)
+            if task_id is None:
+                return
+
+    def _own(self, task_id):
+        """(done, total) a task adds to each task above it, itself included"""
+        done, total = self.counts.get(task_id, (0, 0))
+        return done + self.completed[task_id], total + 1
+
+    def add(self, task):
+        task_id, parent = task["id"], task.get("parent")
+        self.parents[task_id] = parent
+        if parent is not None:
+            self.completed[task_id] = bool(task.get("completed"))
+            self.children.setdefault(parent, set()).add(task_id)
+            self._adjust(parent, *self._own(task_id))
+
+    def discard(self, task):
+        task_id = task["id"]
+        if task_id not in self.parents:
+            return
+        parent = self.parents[task_id]
+        if parent is not None:
+            done, total = self._own(task_id)
+            self._adjust(parent, -done, -total)
+            siblings = self.children.get(parent)
+            if siblings is not None:
+                siblings.discard(task_id)
+                if not siblings:
+                    del self.children[parent]
+            del self.completed[task_id]
+        del self.parents[task_id]
+
+    def parent_of(self, task_id):
+        """Id of a task's parent, None when it has none in the list"""
+        parent = self.parents.get(task_id)
+        return parent if parent in self.parents else None
+
+    def root_of(self, task_id):
+        """Id of the top-level task above a task, the task itself at the top"""
+        for _ in range(len(self.parents) + 1):
+            parent = self.parent_of(task_id)
+            if parent is None:
+                break
+            task_id = parent
+        return task_id
+
+    def children_of(self, task_id):
+        """Ids of a task's subtasks, in no particular order"""
+        return self.children.get(task_id, ())
+
+    def rollup(self, task_id):
+        """(done, total) over every task below a task"""
+        entry = self.counts.get(task_id)
+        return (entry[0], entry[1]) if entry is not None else (0, 0)
+
+    def descendants(self, task_id):
+        """Ids of every task below a task"""
+        found, pending = [], list(self.children.get(task_id, ()))
+        seen = {task_id}
+        while pending:
+            child = pending.pop()
+            if child in seen or child not in self.parents:
+                continue
+            seen.add(child)
+            found.append(child)
+            pending.extend(self.children.get(child, ()))
+        return found
@@ -0,0 +1,180 @@
+"""
+PyTo-Do Tags
+Task tags and a bitmap index for filtering by them
+
+A task's "tags" field holds a list of normalized tag names. TagIndex keeps
+one bitmap per tag, a Python int whose bit i is set when the task at list
+position i carries the tag, built from bytearrays when the list is loaded.
+A filter such as "work,home urgent -someday" (work or home, and urgent,
+and not someday) then costs a few bitwise operations over whole bitmaps,
+counting its matches is a popcount, and the tag cloud comes from counts
+kept as tags are added and removed. Inserting or removing a task shifts
+the bits above its position; bulk edits mark the index stale and it is
+rebuilt on the next query.
+"""
+
+import re
+
+# Tags shown in a tag cloud
+TAG_CLOUD = 15
+
+# Bit offsets set in each byte value, for turning bitmaps into positions
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+# Runs of non-zero bytes, so empty stretches of a bitmap are skipped in C
+_NONZERO = re.compile(rb"[^\x00]+")
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(bits):
+        return bin(bits).count("1")
+
+
+def normalize_tag(text):
+    """Canonical form of a tag: no leading "#", lower case, dashes for spaces"""
+    return "-".join(text.strip().lstrip("#").casefold().split())
+
+
+def parse_tags(text):
+    """Tags in text separated by commas or spaces, normalized and without repeats"""
+    tags = []
+    for word in re.split(r"[,\s]+", text):
+        tag = normalize_tag(word)
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def format_tags(tags):
+    return " ".join(f"#{tag}" for tag in tags)
+
+
+def positions_of(bits):
+    """Set bit numbers of a bitmap, in increasing order"""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    positions = []
+    for run in _NONZERO.finditer(data):
+        for index in range(run.start(), run.end()):
+            base = index << 3
+            positions += [base + bit for bit in _BYTE_BITS[data[index]]]
+    return positions
+
+
+class TagFilter:
+    """Tags a task must and must not have
+
+    Words separated by spaces must all match; a word lists alternatives
+    separated by commas, and a leading "-" or "!" negates it, so
+    "work,home urgent -someday" is (work or home) and urgent and not someday.
+    """
+
+    def __init__(self, text=""):
+        # (negated, tags) per word
+        self.terms = []
+        for word in text.split():
+            negated = word[0] in "-!"
+            tags = frozenset(parse_tags(word[1:] if negated else word))
+            if tags:
+                self.terms.append((negated, tags))
+
+    def __bool__(self):
+        return bool(self.terms)
+
+    def __str__(self):
+        return " ".join(("-" if negated else "") + ",".join(sorted(tags)) for negated, tags in self.terms)
+
+    def matches(self, tags):
+        """Whether a task with these tags passes"""
+        tags = set(tags)
+        return all(bool(tags & alternatives) != negated for negated, alternatives in self.terms)
+
+
+class TagIndex:
+    """One bitmap per tag over list positions, with per-tag counts"""
+
+    def __init__(self, tasks=()):
+        self.bitmaps = {}
+        self.counts = {}
+        self.size = 0
+        # Set when positions changed in bulk, rebuild() before the next query
+        self.stale = False
+        self.rebuild(tasks)
+
+    def rebuild(self, tasks):
+        rows = {}
+        width = (len(tasks) + 7) // 8
+        for position, task in enumerate(tasks):
+            for tag in task.get("tags", ()):
+                row = rows.get(tag)
+                if row is None:
+                    row = rows[tag] = bytearray(width)
+                row[position >> 3] |= 1 << (position & 7)
+        self.bitmaps = {tag: int.from_bytes(row, "little") for tag, row in rows.items()}
+        self.counts = {tag: _popcount(bits) for tag, bits in self.bitmaps.items()}
+        self.size = len(tasks)
+        self.stale = False
+
+    def _tag(self, tag, bit):
+        self.bitmaps[tag] = self.bitmaps.get(tag, 0) | bit
+        self.counts[tag] = self.counts.get(tag, 0) + 1
+
+    def _untag(self, tag, bit):
+        if self.counts.get(tag, 0) <= 1:
+            self.bitmaps.pop(tag, None)
+            self.counts.pop(tag, None)
+        else:
+            self.bitmaps[tag] &= ~bit
+            self.counts[tag] -= 1
+
+    def insert(self, position, task):
+        """A task was inserted at position, moving those after it up one"""
+        if self.stale:
+            return
+        if position < self.size:
+            low = (1 << position) - 1
+            for tag, bits in self.bitmaps.items():
+                if bits >> position:
+                    self.bitmaps[tag] = (bits & low) | ((bits >> position) << (position + 1))
+        self.size += 1
+        for tag in task.get("tags", ()):
+            self._tag(tag, 1 << position)
+
+    def remove(self, position, task):
+        """The task at position was removed, moving those after it down one"""
+        if self.stale:
+            return
+        for tag in task.get("tags", ()):
+            self._untag(tag, 1 << position)
+        self.size -= 1
+        if position < self.size:
+            low = (1 << position) - 1
+            for tag, bits in self.bitmaps.items():
+                if bits >> position:
+                    self.bitmaps[tag] = (bits & low) | ((bits >> (position + 1)) << position)
+
+    def retag(self, position, old, new):
+        """The task at position had its tags changed from old to new"""
+        if self.stale:
+            return
+        bit = 1 << position
+        for tag in set(old) - set(new):
+            self._untag(tag, bit)
+        for tag in set(new) - set(old):
+            self._tag(tag, bit)
+
+    def select(self, tag_filter):
+        """Bitmap of the positions passing a TagFilter"""
+        selected = (1 << self.size) - 1
+        for negated, alternatives in tag_filter.terms:
+            bits = 0
+            for tag in alternatives:
+                bits |= self.bitmaps.get(tag, 0)
+            selected &= ~bits if negated else bits
+        return selected
+
+    def count(self, tag_filter):
+        return _popcount(self.select(tag_filter))
+
+    def cloud(self, limit=TAG_CLOUD):
+        """(tag, count) of the most used tags, most used first"""
+        return sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
@@ -1,46 +1,485 @@
 import sys
 import os
-from .storage_processor import TASKS_FILE, save_tasks, load_tasks
+import time
+from .storage_processor import TASKS_FILE, read_tasks, write_shards, filter_shards, count_shards, load_tombstones
+from .lists import Catalog, DEFAULT_LIST
+from .reminders import ReminderScheduler, reminder_text
+from .timeindex import format_epoch
+from .export import export_file, STDOUT
+from .nextup import PRIORITIES, NEXT_UP, priority_of
+from .tags import TAG_CLOUD
+from .duplicates import NEAR_THRESHOLD, split_duplicates
+from .analytics import REPORT_DAYS, REPORT_WEEKS, format_report
+from .archive import ARCHIVE_AFTER_DAYS
+from . import memory
+from . import daemon
+from . import tui
 
-# Load tasks from file
+# Tasks shown per page, and per write when streaming to a pipe
+PAGE_SIZE = 20
+STREAM_CHUNK = 10000
+
+# Task lists, only the one in use is loaded from file
+
+catalog = Catalog(TASKS_FILE)
+store = None
+
+def open_list(name=DEFAULT_LIST):
+    global store
+    if name not in catalog:
+        catalog.create(name)
+        print(f"Created list: '{name}'")
+    store = catalog.open(name)
+
+# Names and task counts from the catalog, without opening any list
+def view_lists():
+    sys.stdout.write("".join(
+        f"{name} ({'?' if catalog.count(name) is None else catalog.count(name)})\n"
+        for name in catalog.names()
+    ))
+    sys.stdout.flush()
+
+# Renaming or deleting a list changes the catalog, and deleting removes
+# the list's files, so both wait for the daemon's commit in progress
+def rename_list(name, new_name):
+    try:
+        save_now(lambda: catalog.rename(name, new_name), catalog_only=True)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    print(f"Renamed list: '{name}' to '{new_name.strip()}'")
+
+def delete_list(name):
+    try:
+        save_now(lambda: catalog.delete(name), catalog_only=True)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    print(f"Deleted list: '{name}'")
+
+# Set while running as the daemon, which saves in group commits instead
+deferred_save = None
+# Also set in the daemon, for changes that write the list files themselves
+immediate_save = None
+
+# Run a change that saves the list itself, like archiving. In the daemon
+# it waits for the commit in progress, so the two never write at once.
+# Changes to the catalog alone write no file of the open list
+def save_now(change, catalog_only=False):
+    if immediate_save is None:
+        return change()
+    return immediate_save(None if catalog_only else store, change)
+
+# Save the tasks to the file
+def save_tasks():
+    if deferred_save is not None:
+        deferred_save(store)
+        return
+    print("Saving tasks...")
+    store.save()
+    catalog.save()
+    time.sleep(1)
+    print("Tasks saved successfully.")
 
-tasks = load_tasks()
 # Add a task
 
-def add_task(task):
-   save_tasks(tasks)
+def add_task(task, priority=None, tags=None, duplicates="flag", parent=None):
+   if parent is not None and not 0 < parent <= len(store):
+       print("Invalid parent task number")
+       return
+   same = [] if duplicates == "allow" else store.duplicates_of(task)
+   if same and duplicates == "skip":
+       print(f"Skipped, already in the list as task {same[0]+1}")
+       return
+   fields = {} if priority is None else {"priority": priority}
+   if tags:
+       fields["tags"] = tags
+   if parent is not None:
+       fields["parent"] = store.tasks[parent-1]["id"]
+   store.add(task, **fields)
+   save_tasks()
    print(f"Added task: '{task}'")
+   if same:
+       print(f"Note: the same as task {', '.join(str(i+1) for i in same)}")
+
+# Merge tasks from a file, leaving out new tasks that repeat existing ones
+def import_tasks(path, near=False, keep_duplicates=False):
+    incoming = read_tasks(path)
+    if keep_duplicates:
+        new, skipped = incoming, []
+    else:
+        new, skipped = split_duplicates(store.tasks, incoming, near)
+    before = len(store)
+    store.merge(new, load_tombstones(path))
+    save_tasks()
+    print(f"Imported {len(store) - before} new task(s), skipped {len(skipped)} duplicate(s)")
+
+# Tasks that say the same thing, or nearly, numbered as in the list
+def view_duplicates(near=False, threshold=NEAR_THRESHOLD, remove=False):
+    groups = store.duplicate_groups(near, threshold)
+    if not groups:
+        print("No duplicates")
+        return
+    tasks = store.tasks
+    sys.stdout.write("".join(
+        f"{', '.join(str(i+1) for i in group)}: " + " | ".join(tasks[i]["task"] for i in group) + "\n"
+        for group in groups
+    ))
+    extra = [i for group in groups for i in group[1:]]
+    if remove:
+        # The first of each group stays, undo brings the others back
+        store.remove_many(extra)
+        save_tasks()
+        print(f"Removed {len(extra)} duplicate(s)")
+    else:
+        print(f"{len(groups)} group(s), {len(extra)} duplicate(s)")
+
+# Render tasks at the given positions (all by default) as one string, numbered from 1
+def render_tasks(start=0, stop=None, positions=None):
+    tasks = store.tasks
+    if positions is None:
+        positions = range(len(tasks))
+    return "".join(
+        f"{i+1}. {tasks[i]['task']} - {'✓' if tasks[i]['completed'] else '✗'}\n"
+        for i in positions[start:stop]
+    )
+
+# Positions of tasks in a date range, from the store's timestamp index
+def tasks_between(field, start=None, end=None):
+    return [position for position, _ in store.between(field, start, end)]
+
+# Positions in a sort order, from the store's maintained sort orders
+def sorted_tasks(name, reverse=False, positions=None):
+    return store.sorted_positions(name, reverse, positions)
 
 # List task elif choice == "5":
-def view_tasks():
-    if not tasks:
+def view_tasks(offset=0, limit=None, positions=None):
+    if not store.tasks or positions == []:
         print("No tasks in your To-Do list")
     else:
-        print("To-Do List:")
-        for i, task in enumerate(tasks, 0): # start numbering from 1
-            status = "✓" if task["completed"] else "✗"
-            print(f"{i+1}. {task['task']} - {status}")
-        
+        stop = None if limit is None else offset + limit
+        # one write for the whole page instead of a print per task
+        sys.stdout.write("To-Do List:\n" + render_tasks(offset, stop, positions))
+        sys.stdout.flush()
+
+# Write every task to a pipe or file in large chunks
+def stream_tasks(out=None, positions=None):
+    out = out or sys.stdout
+    total = len(store.tasks) if positions is None else len(positions)
+    for start in range(0, total, STREAM_CHUNK):
+        out.write(render_tasks(start, start + STREAM_CHUNK, positions))
+    out.flush()
+
+def page_count(limit=PAGE_SIZE, positions=None):
+    total = len(store.tasks) if positions is None else len(positions)
+    return max(1, -(-total // limit))
+
+# Show one page with a footer, pages are numbered from 1
+def view_page(page, limit=PAGE_SIZE, positions=None):
+    pages = page_count(limit, positions)
+    page = min(max(page, 1), pages)
+    view_tasks((page - 1) * limit, limit, positions)
+    total = len(store.tasks) if positions is None else len(positions)
+    if total:
+        sys.stdout.write(f"-- Page {page}/{pages} ({total} tasks) --\n")
+    return page
+
+# Interactive pager for the menu
+def page_tasks(limit=PAGE_SIZE):
+    page = 1
+    while True:
+        page = view_page(page, limit)
+        if page_count(limit) == 1:
+            return
+        choice = input("[n]ext, [p]revious, page number, or [q]uit: ").strip().lower()
+        if choice in ("", "n"):
+            if page == page_count(limit):
+                return
+            page += 1
+        elif choice == "p":
+            page -= 1
+        elif choice.isdigit():
+            page = int(choice)
+        else:
+            return
+
 # Mark task as completed
 def complete_task(task_number):
-    try:
-        task = tasks[task_number-1]
-    except IndexError:
+    if not 0 < task_number <= len(store):
         print("Invalid task number")
         return
-    task["completed"] = True
-    save_tasks(tasks)   
-    
+    store.complete(task_number-1)
+    save_tasks()
+
     # Remove task
-    
+
 def delete_task(task_number):
+    if not 0 < task_number <= len(store):
+        print("Invalid task number")
+        return
+    task = store.tasks[task_number-1]
+    # Subtasks go with their task
+    doomed = store.subtree(task_number-1)
+    store.remove_many(doomed)
+    save_tasks()
+    print(f"Deleted task: '{task['task']}'" + (f" and {len(doomed)-1} subtask(s)" if len(doomed) > 1 else ""))
+
+# Undo or redo the last change
+def undo():
+    label = store.undo()
+    if label is None:
+        print("Nothing to undo")
+        return
+    save_tasks()
+    print(f"Undone: {label}")
+
+def redo():
+    label = store.redo()
+    if label is None:
+        print("Nothing to redo")
+        return
+    save_tasks()
+    print(f"Redone: {label}")
+
+# Archived tasks are listed by id, since they have no place in the list
+def view_archived(offset=0, limit=PAGE_SIZE):
+    tasks = store.archive.page(offset, limit)
+    if not tasks:
+        print("No archived tasks")
+        return
+    sys.stdout.write("Archived Tasks:\n" + "".join(f"{task['id']}  {task['task']}\n" for task in tasks))
+    sys.stdout.flush()
+
+def restore_tasks(task_ids):
+    def restore():
+        restored = store.restore(task_ids)
+        catalog.save()
+        return restored
+    restored = save_now(restore)
+    for task in restored:
+        print(f"Restored task: '{task['task']}'")
+    missing = len(set(task_ids)) - len(restored)
+    if missing:
+        print(f"{missing} id(s) not found in the archive")
+
+def archive_tasks(days):
+    def archive():
+        count = store.archive_completed(days)
+        catalog.save()
+        return count
+    count = save_now(archive)
+    print(f"Archived {count} task(s) completed more than {days} days ago")
+
+# Archive old completed tasks when an interactive session starts, only
+# saying so when there were any
+def archive_on_start(days=ARCHIVE_AFTER_DAYS):
+    count = store.archive_completed(days)
+    if count:
+        catalog.save()
+        print(f"Archived {count} task(s) completed more than {days} days ago")
+
+# Split the open list into shard files for parallel scans, saving the
+# list from then on writes its shards too
+def shard_tasks(shards=None, partition="hash"):
+    count = save_now(lambda: write_shards(store.tasks, store.path, shards, partition))
+    print(f"Wrote {len(store)} task(s) into {count} shard(s)")
+
+# Search and count straight from the shards of a list, without loading it
+def search_tasks(query, name=DEFAULT_LIST, workers=None):
+    if name not in catalog:
+        print(f"No list named '{name}'")
+        return
+    found = filter_shards(query, catalog.path_of(name), workers)
+    if not found:
+        print("No matching tasks")
+        return
+    sys.stdout.write("".join(
+        f"{task['id']}  {task['task']} - {'✓' if task['completed'] else '✗'}\n" for task in found
+    ))
+    sys.stdout.flush()
+
+def count_tasks(query, name=DEFAULT_LIST, workers=None):
+    if name not in catalog:
+        print(f"No list named '{name}'")
+        return
+    print(count_shards(query, catalog.path_of(name), workers))
+
+# Export a list to CSV, NDJSON, Markdown or JSON, streamed from its file
+def export_list(path, query=None, fmt=None, name=DEFAULT_LIST):
+    if name not in catalog:
+        print(f"No list named '{name}'")
+        return
+    count = export_file(catalog.path_of(name), path, fmt, query)
+    if path == STDOUT:
+        # Kept out of the exported tasks
+        print(f"Exported {count} task(s)", file=sys.stderr)
+    else:
+        print(f"Exported {count} task(s) to {path}")
+
+# Give a task a due date, reminding some minutes before it, or clear both
+def set_due(task_number, due_at=None, remind_before=None):
+    if not 0 < task_number <= len(store):
+        print("Invalid task number")
+        return
+    remind_at = None if due_at is None or not remind_before else due_at - remind_before * 60
+    store.update(task_number-1, due_at=due_at, remind_at=remind_at)
+    save_tasks()
+    if due_at is None:
+        print("Due date cleared")
+    else:
+        print(f"Due {format_epoch(due_at)}")
+
+# Set a task's priority, an index into PRIORITIES
+def set_priority(task_number, priority):
+    if not 0 < task_number <= len(store):
+        print("Invalid task number")
+        return
+    store.update(task_number-1, priority=priority)
+    save_tasks()
+    print(f"Priority set to {PRIORITIES[priority]}")
+
+# Add tags to a task and take others away
+def tag_task(task_number, added=(), removed=()):
+    if not 0 < task_number <= len(store):
+        print("Invalid task number")
+        return
+    tags = [tag for tag in store.tasks[task_number-1].get("tags", []) if tag not in removed]
+    tags += [tag for tag in added if tag not in tags]
+    store.update(task_number-1, tags=tags)
+    save_tasks()
+    print(f"Tags: {' '.join(tags) or 'none'}")
+
+# Move a task under another one, or back to the top level without a parent
+def move_task(task_number, parent=None):
+    if not 0 < task_number <= len(store) or (parent is not None and not 0 < parent <= len(store)):
+        print("Invalid task number")
+        return
     try:
-        task = tasks.pop(task_number-1)
-    except IndexError:
+        store.set_parent(task_number-1, None if parent is None else store.tasks[parent-1]["id"])
+    except ValueError as e:
+        print(e)
+        return
+    save_tasks()
+    print(f"Moved under task {parent}" if parent is not None else "Moved to the top level")
+
+# A task's subtasks, or the top-level tasks, with how many of the tasks
+# below each are done, opening depth levels and no further
+def view_tree(task_number=None, depth=1):
+    if task_number is not None and not 0 < task_number <= len(store):
         print("Invalid task number")
         return
-    save_tasks(tasks)
-    print(f"Deleted task: '{task['task']}'")
-    
+    tasks = store.tasks
+    if task_number is None:
+        level = [i for i, task in enumerate(tasks) if store.parent_of(task) is None]
+    else:
+        level = store.subtasks(tasks[task_number-1]["id"])
+    lines = []
+    pending = [(i, 0) for i in reversed(level)]
+    while pending:
+        i, indent = pending.pop()
+        done, total = store.rollup(tasks[i]["id"])
+        counts = f" [{done}/{total}]" if total else ""
+        lines.append(f"{'  ' * indent}{i+1}. {tasks[i]['task']} - {'✓' if tasks[i]['completed'] else '✗'}{counts}\n")
+        if total and (depth is None or indent + 1 < depth):
+            pending += [(child, indent + 1) for child in reversed(store.subtasks(tasks[i]["id"]))]
+    sys.stdout.write("".join(lines) or ("No tasks\n" if task_number is None else "No subtasks\n"))
+    sys.stdout.flush()
+
+# Positions of tasks passing a tag filter, from the store's tag bitmaps
+def tasks_tagged(tag_filter):
+    return store.tagged(tag_filter)
+
+# How many tasks pass a tag filter, a popcount over the tag bitmaps
+def count_tagged(tag_filter):
+    print(store.count_tagged(tag_filter))
+
+# Most used tags and how many tasks carry each
+def view_tag_cloud(limit=TAG_CLOUD):
+    cloud = store.tag_cloud(limit)
+    if not cloud:
+        print("No tags")
+        return
+    width = max(len(tag) for tag, _ in cloud)
+    sys.stdout.write("".join(f"{tag:<{width}}  {count}\n" for tag, count in cloud))
+    sys.stdout.flush()
+
+# The most urgent pending tasks from the store's priority queue, numbered as in the list
+def view_next(count=NEXT_UP):
+    positions = store.next_up(count)
+    if not positions:
+        print("Nothing to do")
+        return
+    tasks = store.tasks
+    lines = []
+    for i in positions:
+        due = f" (due {format_epoch(tasks[i]['due_at'])})" if tasks[i].get("due_at") is not None else ""
+        lines.append(f"{i+1}. [{PRIORITIES[priority_of(tasks[i])]}] {tasks[i]['task']}{due}\n")
+    sys.stdout.write("Next up:\n" + "".join(lines))
+    sys.stdout.flush()
+
+# Throughput, lead time and backlog trend of the list and its archive,
+# read from per-day counters rather than the tasks
+def view_report(days=REPORT_DAYS, weeks=REPORT_WEEKS):
+    sys.stdout.write(format_report(store.report(days, weeks)))
+    sys.stdout.flush()
+
+# Print reminders as they come due until interrupted, picking up edits
+# saved by other instances by reloading the file when it changes. Fired
+# reminders are saved as such, so they do not fire again after a reload
+WATCH_POLL = 5
+
+def watch(poll=WATCH_POLL):
+    scheduler = ReminderScheduler(store, lambda tasks: print(f"[{time.strftime('%H:%M')}] {reminder_text(tasks)}", flush=True))
+    print(f"Watching {len(scheduler.heap)} reminder(s), press Ctrl+C to stop", flush=True)
+    def mtime():
+        return os.path.getmtime(store.path) if os.path.exists(store.path) else None
+    seen = mtime()
+    while True:
+        if scheduler.fire():
+            store.save()
+            seen = mtime()
+        delay = scheduler.next_delay()
+        time.sleep(poll if delay is None else min(delay, poll))
+        if mtime() != seen:
+            seen = mtime()
+            store.reload(read_tasks(store.path), load_tombstones(store.path))
+
+# Totals for the open list, and what it costs in memory
+def view_stats(show_memory=False):
+    completed = sum(1 for task in store.tasks if task['completed'])
+    print(f"Tasks: {len(store)} total, {completed} completed, {len(store) - completed} pending")
+    if show_memory:
+        sys.stdout.write(memory.format_report(memory.report(store.tasks)))
+        sys.stdout.flush()
+
+# Append a memory report to a file every interval seconds, count times
+# or until interrupted
+def sample_memory(path, interval=memory.SAMPLE_INTERVAL, count=None):
+    sampler = memory.MemorySampler(path, lambda: memory.report(store.tasks), interval)
+    taken = 0
+    while count is None or taken < count:
+        if taken:
+            time.sleep(interval)
+        sampler.sample()
+        taken += 1
+        print(f"Sample {taken} written to {path}", flush=True)
+
+# Full-screen terminal interface on the open list, saving when idle
+def run_tui():
+    if not tui.supported():
+        print("The terminal interface needs curses (pip install windows-curses on Windows)")
+        return
+    def save():
+        store.save()
+        catalog.save()
+    tui.run(store, save)
 
-        
\ No newline at end of file
+# Keep lists loaded and answer CLI commands over a socket until stopped,
+# run(argv) carrying out each command
+def run_daemon(run):
+    def started(server):
+        global deferred_save, immediate_save
+        deferred_save = server.defer
+        immediate_save = server.save_now
+        print(f"Daemon {os.getpid()} listening on {server.server_address}", flush=True)
+    daemon.serve(catalog, run, started)
@@ -0,0 +1,125 @@
+"""
+PyTo-Do Time Index
+Sorted indexes over task timestamps for date-range queries
+
+Creation and completion times are stored as integer epochs in the
+"created_at" and "completed_at" fields. Each TimestampIndex keeps a sorted
+list of (epoch, id) pairs, so "added this week" or "completed between X
+and Y" is two bisections plus the matching slice.
+"""
+
+import bisect
+import functools
+import time
+from datetime import datetime, timedelta
+
+# Format of the legacy "added" field written by older versions
+ADDED_FORMAT = "%Y-%m-%d %H:%M"
+# Format accepted for dates typed by the user
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def parse_added(text):
+    """Epoch of a legacy "added" string, or None if it cannot be read"""
+    try:
+        return int(datetime.strptime(text, ADDED_FORMAT).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_date(text):
+    """Epoch of local midnight on a YYYY-MM-DD date"""
+    return int(datetime.strptime(text, DATE_FORMAT).timestamp())
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_minute(minute, fmt):
+    return datetime.fromtimestamp(minute * 60).strftime(fmt)
+
+
+def format_epoch(epoch, fmt=ADDED_FORMAT):
+    """Display string for an epoch, cached per minute so renders stay cheap"""
+    if epoch is None:
+        return "Unknown"
+    return _format_minute(epoch // 60, fmt)
+
+
+class TimestampIndex:
+    """Tasks ordered by one epoch field"""
+
+    def __init__(self, field, tasks=()):
+        self.field = field
+        self.fields = (field,)
+        self.keys = []
+        self.rebuild(tasks)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def rebuild(self, tasks):
+        field = self.field
+        self.keys = sorted((task[field], task["id"]) for task in tasks if task.get(field) is not None)
+
+    def add(self, task):
+        if task.get(self.field) is not None:
+            bisect.insort(self.keys, (task[self.field], task["id"]))
+
+    def discard(self, task):
+        if task.get(self.field) is None:
+            return
+        key = (task[self.field], task["id"])
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+
+    def _bounds(self, start, end):
+        low = 0 if start is None else bisect.bisect_left(self.keys, (start,))
+        high = len(self.keys) if end is None else bisect.bisect_left(self.keys, (end,))
+        return low, high
+
+    def range(self, start=None, end=None):
+        """Ids with start <= epoch < end, oldest first"""
+        low, high = self._bounds(start, end)
+        return [task_id for _, task_id in self.keys[low:high]]
+
+    def count(self, start=None, end=None):
+        """Number of tasks with start <= epoch < end"""
+        low, high = self._bounds(start, end)
+        return max(0, high - low)
+
+
+# Preset ranges offered by the GUIs, in display order
+DATE_RANGES = [
+    "Any time",
+    "Added today",
+    "Added this week",
+    "Added this month",
+    "Completed today",
+    "Completed this week",
+    "Completed this month",
+    "Added between...",
+    "Completed between...",
+]
+
+
+def date_range(name, now=None):
+    """(field, start, end) for a preset range, None for "Any time" and custom ranges"""
+    if name not in DATE_RANGES[1:] or name.endswith("between..."):
+        return None
+    today = datetime.fromtimestamp(now if now is not None else time.time()).replace(
+        hour=0, minute=0, second=0, microsecond=0)
+    verb, period = name.split(" ", 1)
+    field = "created_at" if verb == "Added" else "completed_at"
+    if period == "today":
+        start = today
+    elif period == "this week":
+        start = today - timedelta(days=today.weekday())
+    else:
+        start = today.replace(day=1)
+    return field, int(start.timestamp()), None
+
+
+def custom_range(name, first_day, last_day):
+    """(field, start, end) for an "... between..." range, both days included"""
+    field = "created_at" if name.startswith("Added") else "completed_at"
+    return field, parse_date(first_day), parse_date(last_day) + 86400
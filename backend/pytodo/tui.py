@@ -0,0 +1,391 @@
+"""
+PyTo-Do Terminal Interface
+A full-screen curses task list for terminals and SSH sessions
+
+Only the tasks on screen are ever formatted. Each line of the list
+window remembers what it shows and is rewritten only when that changes,
+scrolling shifts the window with the terminal's own scroll command so
+just the uncovered lines are sent, and every frame goes out in a single
+doupdate(), drawn only once the keys typed ahead have been handled.
+Edits reach the list of visible tasks and the header counts as diffs of
+the tasks they touched, and typing into the filter narrows the tasks
+already matched, so neither goes over the whole list again. Changes are
+saved once the keyboard has been idle for SAVE_DELAY_MS, not after
+every keystroke.
+"""
+
+import os
+import time
+
+from .viewmodel import TaskListView, STATUS_FILTERS
+from .changes import coalesce, INSERTED, REMOVED, RESET
+from .nextup import PRIORITIES, priority_of
+from .tags import TagFilter
+
+try:
+    import curses
+except ImportError:  # Windows without the windows-curses package
+    curses = None
+
+# Idle milliseconds before unsaved changes are written
+SAVE_DELAY_MS = 1000
+# Milliseconds curses waits after Esc for the rest of a key sequence
+ESCAPE_DELAY_MS = 25
+
+HELP = "a add  e edit  space done  d delete  p priority  u/^R undo/redo  / filter  t tags  s search  n next  f status  q quit"
+
+
+def supported():
+    """Whether curses is available here"""
+    return curses is not None
+
+
+class TaskTUI:
+    """The list window, header and footer of one store"""
+
+    def __init__(self, screen, store, save, clock=time.time):
+        self.screen = screen
+        self.store = store
+        self.save = save
+        self.view = TaskListView(store, clock)
+        # Ids of the visible tasks in display order, kept as ids since
+        # list positions shift with every insert and delete
+        self.ids = []
+        self.cursor = 0
+        self.top = 0
+        # First task shown by the list window as last drawn
+        self.top_drawn = 0
+        self.search = ""
+        self.message = ""
+        self.unsaved = False
+        # Ids of the completed tasks, so the header counts follow each change
+        self.done = {task["id"] for task in store.tasks if task["completed"]}
+        # What each line of the list window shows, None when unknown
+        self.lines = []
+        self.unsubscribe = store.changes.subscribe(self.on_changes)
+        self.layout()
+        self.refilter()
+
+    # Screen setup
+
+    def layout(self):
+        """Make the header, list and footer windows for the terminal size"""
+        self.height, self.width = self.screen.getmaxyx()
+        rows = max(1, self.height - 2)
+        self.header = curses.newwin(1, self.width, 0, 0)
+        self.list = curses.newwin(rows, self.width, 1, 0)
+        self.footer = curses.newwin(1, self.width, min(rows + 1, self.height - 1), 0)
+        self.list.scrollok(True)
+        self.list.idlok(True)
+        self.footer.keypad(True)
+        self.footer.timeout(SAVE_DELAY_MS)
+        self.lines = [None] * rows
+        self.top_drawn = self.top
+        self.screen.clear()
+        self.screen.noutrefresh()
+
+    @property
+    def rows(self):
+        return len(self.lines)
+
+    # Model
+
+    def on_changes(self, changes):
+        self.unsaved = True
+        changes = coalesce(changes)
+        self.count(changes)
+        task_id = self.current_id()
+        for diff in self.view.diff(changes):
+            if diff.kind == RESET:
+                self.refilter()
+                return
+            if diff.kind == REMOVED:
+                self.ids.remove(diff.id)
+            elif diff.kind == INSERTED:
+                self.ids.insert(len(self.ids) if diff.before is None else self.ids.index(diff.before), diff.id)
+            # An updated task keeps its line, which is redrawn as it now reads
+        if task_id in self.view.shown:
+            self.cursor = self.ids.index(task_id)
+        self.clamp()
+
+    def count(self, changes):
+        """Bring the completed tasks up to date with changes"""
+        tasks, done = self.store.tasks, self.done
+        for change in changes:
+            if change.kind == RESET:
+                self.done = {task["id"] for task in tasks if task["completed"]}
+                return
+            if change.kind == REMOVED:
+                done.discard(change.id)
+            elif tasks[self.store.index_of(change.id)]["completed"]:
+                done.add(change.id)
+            else:
+                done.discard(change.id)
+
+    @property
+    def counts(self):
+        """(total, completed, pending) over the whole list"""
+        total, completed = len(self.store), len(self.done)
+        return total, completed, total - completed
+
+    def current_id(self):
+        if not self.ids:
+            return None
+        return self.ids[self.cursor]
+
+    def refilter(self, narrow=False):
+        """Work out the visible tasks again, keeping the cursor on its task"""
+        task_id = self.current_id()
+        tasks, index_of = self.store.tasks, self.store.index_of
+        positions = self.view.matching([index_of(shown) for shown in self.ids]) if narrow else self.view.positions()
+        self.ids = [tasks[position]["id"] for position in positions]
+        # What the view's diffs are worked out against
+        self.view.shown = set(self.ids)
+        self.cursor = 0
+        if task_id in self.view.shown:
+            self.cursor = self.ids.index(task_id)
+        self.clamp()
+
+    def clamp(self):
+        self.cursor = max(0, min(self.cursor, len(self.ids) - 1))
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + self.rows:
+            self.top = self.cursor - self.rows + 1
+        self.top = max(0, min(self.top, max(0, len(self.ids) - self.rows)))
+
+    # Drawing
+
+    def line(self, index):
+        """(text, attributes) of list line index, counted from the top task"""
+        if index >= len(self.ids):
+            return "", curses.A_NORMAL
+        position = self.store.index_of(self.ids[index])
+        row = self.view.row(self.store.tasks[position])
+        due = (f"  {row.priority}" if row.priority else "") + (f"  due {row.due}" if row.due else "")
+        text = f"{position + 1:>6}. [{'x' if row.completed else ' '}] {row.text}" + (f"  {row.tags}" if row.tags else "")
+        room = self.width - 1 - len(due)
+        text = (text[:room - 1] + "…" if len(text) > room else text.ljust(room)) + due
+        attr = curses.A_DIM if row.completed else curses.A_NORMAL
+        if row.overdue:
+            attr |= curses.A_BOLD
+        if index == self.cursor:
+            attr |= curses.A_REVERSE
+        return text, attr
+
+    def scroll_to(self, top):
+        """Scroll the list window, keeping the lines that stay on screen"""
+        shift = top - self.top_drawn
+        if shift and abs(shift) < self.rows:
+            self.list.scroll(shift)
+            if shift > 0:
+                self.lines = self.lines[shift:] + [None] * shift
+            else:
+                self.lines = [None] * -shift + self.lines[:shift]
+        elif shift:
+            self.lines = [None] * self.rows
+        self.top_drawn = top
+
+    def draw(self):
+        self.scroll_to(self.top)
+        for y in range(self.rows):
+            shown = self.line(self.top + y)
+            if self.lines[y] != shown:
+                self.lines[y] = shown
+                self.list.addnstr(y, 0, shown[0], self.width - 1, shown[1])
+        self.list.noutrefresh()
+
+        total, completed, _ = self.counts
+        parts = [f"PyTo-Do  {total} tasks, {completed} done", f"showing {self.view.status}"]
+        if self.view.text:
+            parts.append(f"filter '{self.view.text}'")
+        if self.view.tags:
+            parts.append(f"tags {self.view.tags}")
+        parts.append(f"{self.cursor + 1 if self.ids else 0}/{len(self.ids)}")
+        self.header.addnstr(0, 0, "  |  ".join(parts).ljust(self.width - 1), self.width - 1, curses.A_REVERSE)
+        self.header.noutrefresh()
+        self.status(self.message or HELP)
+        curses.doupdate()
+
+    def status(self, text):
+        self.footer.addnstr(0, 0, text.ljust(self.width - 1), self.width - 1)
+        self.footer.noutrefresh()
+
+    # Input
+
+    def key(self):
+        """Next key as a str or curses key code, None when idle"""
+        try:
+            return self.footer.get_wch()
+        except curses.error:
+            return None
+
+    def prompt(self, label, text="", on_change=None):
+        """Edit a line in the footer; the text, or None if Esc was pressed"""
+        try:
+            curses.curs_set(1)
+        except curses.error:
+            pass
+        try:
+            while True:
+                shown = label + text
+                self.footer.addnstr(0, 0, shown[-(self.width - 1):].ljust(self.width - 1), self.width - 1)
+                self.footer.move(0, min(len(shown), self.width - 2))
+                self.footer.noutrefresh()
+                curses.doupdate()
+                key = self.key()
+                if key is None:
+                    continue
+                if key in ("\n", "\r", curses.KEY_ENTER):
+                    return text
+                if key == "\x1b":
+                    return None
+                if key in (curses.KEY_BACKSPACE, "\x7f", "\b"):
+                    text = text[:-1]
+                elif isinstance(key, str) and key.isprintable():
+                    text += key
+                else:
+                    continue
+                if on_change is not None:
+                    on_change(text)
+                    self.draw()
+        finally:
+            try:
+                curses.curs_set(0)
+            except curses.error:
+                pass
+
+    def set_filter(self, text):
+        # A longer filter only drops tasks, so narrow the current matches
+        # (the Next Up ranking fills in from further down instead)
+        narrow = self.view.status != "next" and bool(self.view.text) and text.casefold().startswith(self.view.text.casefold())
+        self.view.text = text
+        self.refilter(narrow)
+
+    def find(self, start):
+        """Move to the next visible task from start containing the search text"""
+        text = self.search.casefold()
+        tasks, index_of = self.store.tasks, self.store.index_of
+        count = len(self.ids)
+        for step in range(count):
+            index = (start + step) % count
+            if text in tasks[index_of(self.ids[index])]["task"].casefold():
+                self.cursor = index
+                self.clamp()
+                self.message = ""
+                return
+        self.message = f"Not found: {self.search}"
+
+    def handle(self, key):
+        """Act on a key, returns False to quit"""
+        self.message = ""
+        position = self.store.index_of(self.ids[self.cursor]) if self.ids else None
+        if key in ("q", "Q"):
+            return False
+        if key == curses.KEY_RESIZE:
+            self.layout()
+        elif key in (curses.KEY_UP, "k"):
+            self.cursor -= 1
+        elif key in (curses.KEY_DOWN, "j"):
+            self.cursor += 1
+        elif key == curses.KEY_PPAGE:
+            self.cursor -= self.rows
+        elif key == curses.KEY_NPAGE:
+            self.cursor += self.rows
+        elif key in (curses.KEY_HOME, "g"):
+            self.cursor = 0
+        elif key in (curses.KEY_END, "G"):
+            self.cursor = len(self.ids) - 1
+        elif key == "a":
+            text = self.prompt("Add: ")
+            if text and text.strip():
+                self.store.add(text.strip())
+                self.view.text = ""
+                self.refilter()
+                self.cursor = len(self.ids) - 1
+        elif key == "e" and position is not None:
+            text = self.prompt("Edit: ", self.store.tasks[position]["task"])
+            if text and text.strip():
+                self.store.update(position, task=text.strip())
+        elif key == " " and position is not None:
+            if self.store.tasks[position]["completed"]:
+                self.store.update(position, completed=False, completed_at=None)
+            else:
+                self.store.complete(position)
+        elif key == "d" and position is not None:
+            if self.prompt(f"Delete '{self.store.tasks[position]['task']}'? (y/n) ") in ("y", "Y"):
+                # Subtasks go with their task, as in the CLI and GUIs
+                doomed = self.store.subtree(position)
+                self.store.remove_many(doomed)
+                if len(doomed) > 1:
+                    self.message = f"Deleted with {len(doomed) - 1} subtask(s)"
+        elif key == "p" and position is not None:
+            priority = (priority_of(self.store.tasks[position]) + 1) % len(PRIORITIES)
+            self.store.update(position, priority=priority)
+            self.message = f"Priority: {PRIORITIES[priority]}"
+        elif key == "u":
+            self.message = f"Undone: {self.store.undo() or 'nothing'}"
+        elif key in ("\x12", "r"):
+            self.message = f"Redone: {self.store.redo() or 'nothing'}"
+        elif key == "f":
+            self.view.status = STATUS_FILTERS[(STATUS_FILTERS.index(self.view.status) + 1) % len(STATUS_FILTERS)]
+            self.refilter()
+        elif key == "/":
+            previous = self.view.text
+            if self.prompt("Filter: ", previous, self.set_filter) is None:
+                self.set_filter(previous)
+        elif key == "t":
+            text = self.prompt("Tags (a,b c -d): ", str(self.view.tags or ""))
+            if text is not None:
+                self.view.tags = TagFilter(text) or None
+                self.refilter()
+        elif key == "\x1b" and self.view.text:
+            self.set_filter("")
+        elif key == "s":
+            text = self.prompt("Search: ", self.search)
+            if text:
+                self.search = text
+                self.find(self.cursor)
+        elif key == "n" and self.search:
+            self.find(self.cursor + 1)
+        self.clamp()
+        return True
+
+    def idle(self):
+        if self.unsaved:
+            self.status("Saving...")
+            curses.doupdate()
+            self.save()
+            self.unsaved = False
+            self.message = "Saved"
+
+    def run(self):
+        try:
+            curses.curs_set(0)
+        except curses.error:
+            pass
+        try:
+            while True:
+                self.draw()
+                key = self.key()
+                if key is None:
+                    self.idle()
+                    continue
+                # Keys typed ahead, e.g. a held arrow over a slow link, are
+                # all handled before the next frame
+                while key is not None:
+                    if not self.handle(key):
+                        return
+                    self.footer.timeout(0)
+                    key = self.key()
+                    self.footer.timeout(SAVE_DELAY_MS)
+        finally:
+            self.unsubscribe()
+            if self.unsaved:
+                self.save()
+
+
+def run(store, save):
+    """Show the interface for a store until the user quits"""
+    os.environ.setdefault("ESCDELAY", str(ESCAPE_DELAY_MS))
+    curses.wrapper(lambda screen: TaskTUI(screen, store, save).run())
@@ -0,0 +1,264 @@
+"""
+PyTo-Do View Model
+What the task list shows, worked out without any widgets
+
+TaskListView turns the store and the current filter, date range, text
+and tag filters and sort into Row descriptors holding the display text
+of each task. It turns batches of store changes into diff operations that say
+which rows to remove, update or insert, and where. The Tk frontends and
+the terminal interface only translate rows and diffs into widget or
+screen calls, so everything here runs, and can be timed, without a
+display.
+"""
+
+import time
+from collections import namedtuple
+
+from .changes import INSERTED, UPDATED, REMOVED, RESET
+from .timeindex import format_epoch
+from .nextup import PRIORITIES, DEFAULT_PRIORITY, NEXT_UP, priority_of
+from .tags import format_tags
+
+# Status filters, in the order the GUIs offer them; "next" shows the
+# NEXT_UP most urgent pending tasks, most urgent first
+STATUS_FILTERS = ("all", "pending", "completed", "next")
+
+# Display form of one task; due is "" when it has no due date,
+# priority is "" when it is the default, tags reads "#a #b" and
+# subtasks reads "done/total" over the tasks below it, "" without any
+Row = namedtuple("Row", "id text completed added due overdue priority tags subtasks")
+
+# Diff operations, applied in the order given:
+#   RESET   redraw every row from rows()
+#   REMOVED drop the row of id
+#   UPDATED replace the row of id in place with row; in tree views its
+#           subtasks may have changed too
+#   INSERTED add row before the row of before, or at the end if None
+Diff = namedtuple("Diff", "kind id row before")
+
+
+class TaskListView:
+    """Rows and row diffs for one store and the current view settings"""
+
+    def __init__(self, store, clock=time.time):
+        self.store = store
+        self.clock = clock
+        self.status = "all"
+        # (field, start, end) as made by timeindex, or None for any time
+        self.date_filter = None
+        # Name of a sort order from sortindex.SORT_KEYS, None keeps list order
+        self.sort = None
+        self.reverse = False
+        # Text a task must contain, case-insensitive, "" for any
+        self.text = ""
+        # A tags.TagFilter, or None for any tags
+        self.tags = None
+        # Show only top-level tasks, their subtasks come from children()
+        self.tree = False
+        # Ids of the rows last described, i.e. on screen
+        self.shown = set()
+        # (done, total) described for each row with subtasks, to tell
+        # when a deleted or moved subtask has left its count stale
+        self.rollups = {}
+
+    def visible(self, task):
+        """Whether a task passes the status filter and date range"""
+        if self.status in ("pending", "next") and task["completed"]:
+            return False
+        if self.status == "completed" and not task["completed"]:
+            return False
+        if self.date_filter:
+            field, start, end = self.date_filter
+            value = task.get(field)
+            if value is None or value < start or (end is not None and value >= end):
+                return False
+        if self.text and self.text.casefold() not in task["task"].casefold():
+            return False
+        if self.tags and not self.tags.matches(task.get("tags", ())):
+            return False
+        return True
+
+    def positions(self):
+        """List positions of the visible tasks, in display order"""
+        tasks = self.store.tasks
+        if self.status == "next":
+            return self._next_up()
+        # Tag filters and date ranges come straight from the store's indexes
+        positions = self.store.tagged(self.tags) if self.tags else None
+        if self.date_filter:
+            dated = [position for position, _ in self.store.between(*self.date_filter)]
+            if positions is None:
+                positions = dated
+            else:
+                tagged = set(positions)
+                positions = [position for position in dated if position in tagged]
+        # Sorting uses the store's maintained sort orders
+        if self.sort:
+            positions = self.store.sorted_positions(self.sort, self.reverse, positions)
+        elif positions is None:
+            positions = range(len(tasks))
+        if self.status == "pending":
+            positions = [position for position in positions if not tasks[position]["completed"]]
+        elif self.status == "completed":
+            positions = [position for position in positions if tasks[position]["completed"]]
+        if self.text:
+            positions = self.matching(positions)
+        if self.tree:
+            return self.store.top_level(positions)
+        return list(positions)
+
+    def children(self, task_id):
+        """Rows of the visible subtasks of a task, in list order"""
+        tasks = self.store.tasks
+        return [self.row(tasks[position]) for position in self.store.subtasks(task_id) if self.visible(tasks[position])]
+
+    def _next_up(self):
+        """The most urgent pending tasks that pass the date range and text filter"""
+        if not self.date_filter and not self.text and not self.tags:
+            return self.store.next_up(NEXT_UP)
+        # Filtered out tasks leave room for the next most urgent ones
+        tasks, count = self.store.tasks, NEXT_UP
+        while True:
+            ranked = self.store.next_up(count)
+            positions = [position for position in ranked if self.visible(tasks[position])]
+            if len(positions) >= NEXT_UP or len(ranked) < count:
+                return positions[:NEXT_UP]
+            count *= 4
+
+    def matching(self, positions):
+        """Those of positions whose task contains the filter text"""
+        tasks, text = self.store.tasks, self.text.casefold()
+        return [position for position in positions if text in tasks[position]["task"].casefold()]
+
+    def ids(self):
+        """Ids of the visible tasks, in display order"""
+        tasks = self.store.tasks
+        return [tasks[position]["id"] for position in self.positions()]
+
+    def row(self, task):
+        """Display form of a task"""
+        due_at = task.get("due_at")
+        done, total = self.store.rollup(task["id"])
+        if total:
+            self.rollups[task["id"]] = (done, total)
+        else:
+            self.rollups.pop(task["id"], None)
+        return Row(
+            task["id"],
+            task["task"],
+            bool(task["completed"]),
+            format_epoch(task.get("created_at")),
+            format_epoch(due_at) if due_at is not None else "",
+            due_at is not None and not task["completed"] and due_at <= self.clock(),
+            "" if priority_of(task) == DEFAULT_PRIORITY else PRIORITIES[priority_of(task)],
+            format_tags(task.get("tags", ())),
+            f"{done}/{total}" if total else "",
+        )
+
+    def rows(self):
+        """Every visible row, in display order"""
+        tasks = self.store.tasks
+        self.rollups = {}
+        rows = [self.row(tasks[position]) for position in self.positions()]
+        self.shown = {row.id for row in rows}
+        return rows
+
+    def stats(self):
+        """(total, completed, pending) over the whole list"""
+        total = len(self.store.tasks)
+        completed = sum(1 for task in self.store.tasks if task["completed"])
+        return total, completed, total - completed
+
+    def _reshaped(self, changes):
+        """Whether changes may have moved tasks between levels of the tree"""
+        for change in changes:
+            if change.kind == UPDATED and (change.fields is None or "parent" in change.fields):
+                return True
+            # Subtasks of a deleted task move to the top level, and back on undo
+            if change.kind in (REMOVED, INSERTED) and self.store.subtasks(change.id):
+                return True
+        return False
+
+    def _ancestors(self, task):
+        """Ids of the tasks above a task, nearest first"""
+        found = []
+        parent = self.store.parent_of(task)
+        while parent is not None and parent not in found:
+            found.append(parent)
+            parent = self.store.parent_of(self.store.tasks[self.store.index_of(parent)])
+        return found
+
+    def _next_shown(self, position):
+        """Id of the first shown task after position, or None"""
+        shown, tasks = self.shown, self.store.tasks
+        for index in range(position + 1, len(tasks)):
+            if tasks[index]["id"] in shown:
+                return tasks[index]["id"]
+        return None
+
+    def diff(self, changes):
+        """Diff operations that bring the shown rows up to date"""
+        # Sorted and ranked views and whole-list changes place rows themselves
+        if self.sort or self.status == "next" or any(change.kind == RESET for change in changes):
+            return [Diff(RESET, None, None, None)]
+        if self.tree and self._reshaped(changes):
+            return [Diff(RESET, None, None, None)]
+
+        # Removals first, then the rest in list order so each row can be
+        # placed before the next row already shown
+        diffs = []
+        placed = []
+        updated = set()
+        # Deleted and moved subtasks cannot say which tasks they were under
+        recount = False
+        for change in changes:
+            if change.kind == REMOVED:
+                recount = True
+                if change.id in self.shown:
+                    self.shown.discard(change.id)
+                    diffs.append(Diff(REMOVED, change.id, None, None))
+            else:
+                recount = recount or (change.kind == UPDATED and (change.fields is None or "parent" in change.fields))
+                placed.append((self.store.index_of(change.id), change))
+
+        for position, change in sorted(placed, key=lambda pair: pair[0]):
+            task = self.store.tasks[position]
+            shown = change.id in self.shown
+            if self.tree and self.store.parent_of(task) is not None:
+                # A subtask changed, its top-level task's counts and subtasks with it
+                root = self.store.root_of(task)
+                if root in self.shown and root not in updated:
+                    updated.add(root)
+                    diffs.append(Diff(UPDATED, root, self.row(self.store.tasks[self.store.index_of(root)]), None))
+                continue
+            if not self.tree and (change.kind != UPDATED or change.fields is None or
+                                  change.fields & {"parent", "completed"}):
+                # The counts of every task above it change with it
+                for ancestor in self._ancestors(task):
+                    if ancestor in self.shown and ancestor not in updated:
+                        updated.add(ancestor)
+                        diffs.append(Diff(UPDATED, ancestor,
+                                          self.row(self.store.tasks[self.store.index_of(ancestor)]), None))
+            if not self.visible(task):
+                if shown:
+                    self.shown.discard(change.id)
+                    diffs.append(Diff(REMOVED, change.id, None, None))
+            elif shown and change.kind == UPDATED and change.fields is not None:
+                # Same place, new content
+                diffs.append(Diff(UPDATED, change.id, self.row(task), None))
+            else:
+                # New, or put back by undo and possibly moved
+                if shown:
+                    self.shown.discard(change.id)
+                    diffs.append(Diff(REMOVED, change.id, None, None))
+                diffs.append(Diff(INSERTED, change.id, self.row(task), self._next_shown(position)))
+                self.shown.add(change.id)
+
+        if recount and self.rollups:
+            for task_id, counts in list(self.rollups.items()):
+                if task_id not in self.shown:
+                    del self.rollups[task_id]
+                elif task_id not in updated and self.store.rollup(task_id) != counts:
+                    updated.add(task_id)
+                    diffs.append(Diff(UPDATED, task_id, self.row(self.store.tasks[self.store.index_of(task_id)]), None))
+        return diffs
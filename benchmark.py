@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for PyTo-Do
+Times storage operations and startup on generated task lists
+
+Run one benchmark by name, e.g. "python benchmark.py shards --tasks 1000000".
+The startup benchmark launches the builds made by build.py, so build both
+profiles first.
+Data is written to a temporary directory and removed afterwards.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from pytodo import merge
+from pytodo.storage_processor import write_tasks, read_tasks, write_shards, load_shards, count_shards, search_shards
+from pytodo.storage_processor import read_tasks_cached, snapshot_path
+from pytodo.store import TaskStore
+from pytodo.viewmodel import TaskListView
+from pytodo.changes import coalesce
+
+
+def make_tasks(count):
+    """A task list of the given size with ids, clocks and timestamps"""
+    start = int(time.time()) - count
+    tasks = [{"task": f"Task number {i}", "completed": i % 3 == 0, "created_at": start + i}
+             for i in range(count)]
+    merge.ensure_metadata(tasks)
+    return tasks
+
+
+def timed(function, *args):
+    """Seconds one call takes, best of three"""
+    best = None
+    for _ in range(3):
+        began = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_shards(args):
+    """Single-file load against parallel shard load, count and search"""
+    cores = os.cpu_count() or 1
+    shards = args.shards or cores
+    print(f"{args.tasks} tasks, {shards} shards, {cores} cores")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "storage.json")
+        tasks = make_tasks(args.tasks)
+        write_tasks(tasks, path)
+        baseline = timed(lambda: [task for task in read_tasks(path) if "99" in task["task"]])
+        print(f"single file load + search: {baseline:.3f}s")
+        write_shards(tasks, path, shards)
+        del tasks
+
+        print(f"{'workers':>8} {'load':>8} {'count':>8} {'search':>8} {'speedup':>8}")
+        first = None
+        counts = sorted({cores} | {2 ** power for power in range(cores.bit_length()) if 2 ** power < cores})
+        for workers in counts:
+            load = timed(load_shards, path, workers)
+            count = timed(count_shards, {"completed": False}, path, workers)
+            search = timed(search_shards, "99", path, workers)
+            first = first or search
+            print(f"{workers:>8} {load:>7.3f}s {count:>7.3f}s {search:>7.3f}s {first / search:>7.2f}x")
+
+
+def bench_snapshot(args):
+    """Startup from JSON against startup from the snapshot cache"""
+    print(f"{args.tasks} tasks")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "storage.json")
+        write_tasks(make_tasks(args.tasks), path)
+
+        def cold(load):
+            if os.path.exists(snapshot_path(path)):
+                os.remove(snapshot_path(path))
+            load(path)
+
+        def store(path):
+            TaskStore(path)
+
+        json_read = timed(read_tasks, path)
+        read_tasks_cached(path)
+        cached_read = timed(read_tasks_cached, path)
+        cold_start = timed(cold, store)
+        store(path)
+        cached_start = timed(store, path)
+        print(f"{'':>14} {'json':>8} {'cached':>8} {'speedup':>8}")
+        print(f"{'read':>14} {json_read:>7.3f}s {cached_read:>7.3f}s {json_read / cached_read:>7.2f}x")
+        print(f"{'store startup':>14} {cold_start:>7.3f}s {cached_start:>7.3f}s {cold_start / cached_start:>7.2f}x")
+
+
+def bench_viewmodel(args):
+    """View model recomputation: full row lists, statistics and diffs"""
+    print(f"{args.tasks} tasks")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "storage.json")
+        write_tasks(make_tasks(args.tasks), path)
+        store = TaskStore(path)
+        view = TaskListView(store)
+
+        def rows(status="all", sort=None, date_filter=None):
+            view.status, view.sort, view.date_filter = status, sort, date_filter
+            return view.rows()
+
+        week = int(time.time()) - 7 * 86400
+        rows("all", "task")  # builds the sort order once, as the first sorted view would
+        for label, settings in (("rows, all", ()),
+                                ("rows, pending", ("pending",)),
+                                ("rows, next up", ("next",)),
+                                ("rows, sorted by task", ("all", "task")),
+                                ("rows, added this week", ("all", None, ("created_at", week, None)))):
+            print(f"{label:>24} {timed(rows, *settings):>7.3f}s")
+        store.has_subtasks()  # builds the subtask index once, as the classic GUI's first redraw would
+        view.tree = True
+        print(f"{'rows, top level':>24} {timed(rows):>7.3f}s")
+        view.tree = False
+        print(f"{'stats':>24} {timed(view.stats):>7.3f}s")
+        store.report()  # builds the per-day counters once, as the first report would
+        print(f"{'completion report':>24} {timed(store.report):>7.3f}s")
+
+        rows()
+        batch = []
+        store.changes.subscribe(batch.extend)
+
+        def diff_after(edit):
+            del batch[:]
+            edit()
+            return view.diff(coalesce(batch))
+
+        print(f"{'diff, complete one':>24} {timed(diff_after, lambda: store.complete(len(store) // 2)):>7.3f}s")
+        print(f"{'diff, add one':>24} {timed(diff_after, lambda: store.add('New task')):>7.3f}s")
+
+        def add_burst():
+            with store.transaction("Burst"):
+                for i in range(100):
+                    store.add(f"Burst task {i}")
+
+        print(f"{'diff, add 100':>24} {timed(diff_after, add_burst):>7.3f}s")
+
+
+def bench_startup(args):
+    """Launch time of the CLI and GUI from source and from each build profile"""
+    import statistics
+    import subprocess
+    import build
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    # Arguments that make each interface load the list in the working
+    # directory and exit straight away; the CLI goes round any daemon
+    launches = {"cli": ["--no-banner", "--no-daemon", "list", "--limit", "1"], "gui": []}
+    # main.py runs in its own directory, main-cli.py in the working one
+    sources = {"cli": os.path.join(root, "backend", "main-cli.py"), "gui": os.path.join(root, "frontend", "modern_gui.py")}
+    env = dict(os.environ, PYTODO_EXIT_AFTER_START="1")
+    print(f"{args.tasks} tasks, {args.runs} runs each")
+    with tempfile.TemporaryDirectory() as directory:
+        write_tasks(make_tasks(args.tasks), os.path.join(directory, "storage.json"))
+
+        def launch(command):
+            began = time.perf_counter()
+            subprocess.run(command, cwd=directory, env=env, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return time.perf_counter() - began
+
+        print(f"{'':>16} {'best':>8} {'median':>8}")
+        for target, extra in launches.items():
+            if target == "gui" and sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+                print(f"{target:>4}: skipped, no display")
+                continue
+            commands = [("source", [sys.executable, sources[target]])]
+            commands += [(profile, [os.path.join(root, build.executable_path(target, profile))])
+                         for profile in build.PROFILES]
+            for label, command in commands:
+                if not os.path.exists(command[-1]):
+                    print(f"{target + ' ' + label:>16} not built, run python build.py")
+                    continue
+                times = [launch(command + extra) for _ in range(args.runs)]
+                print(f"{target + ' ' + label:>16} {min(times):>7.3f}s {statistics.median(times):>7.3f}s")
+
+
+BENCHMARKS = {
+    "shards": bench_shards,
+    "snapshot": bench_snapshot,
+    "startup": bench_startup,
+    "viewmodel": bench_viewmodel,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTo-Do benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="Benchmark to run")
+    parser.add_argument("--tasks", type=int, default=200000, help="Size of the generated task list")
+    parser.add_argument("--shards", type=int, help="Shard count (default: one per core)")
+    parser.add_argument("--runs", type=int, default=10, help="Launches per interface for the startup benchmark")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,14 @@ Build script for PyTo-Do
 Creates executable files (.exe, standalone binaries) using PyInstaller
 """
 
+import argparse
+import hashlib
 import os
 import sys
 import subprocess
 import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 def check_pyinstaller():
@@ -26,159 +30,228 @@ def check_pyinstaller():
             print("❌ Failed to install PyInstaller")
             return False
 
-def build_executable():
-    """Build the executable using PyInstaller"""
-    if not check_pyinstaller():
-        return False
+# Build profiles
+#   portable    one self-extracting file; every launch unpacks the whole
+#               bundle to a temporary directory first
+#   fast-start  a folder that is already unpacked, with bytecode compiled
+#               at -OO, unused standard library modules left out and the
+#               code bundled as compiled modules instead of data files
+PROFILES = {
+    "portable": {"layout": "--onefile", "optimize": False, "code_as_data": True},
+    "fast-start": {"layout": "--onedir", "optimize": True, "code_as_data": False},
+}
+
+# Standard library modules none of the interfaces import, left out of
+# fast-start builds; tkinter is left out of the CLI as well
+UNUSED_MODULES = [
+    "unittest", "doctest", "pdb", "pydoc", "test", "lib2to3", "distutils", "setuptools",
+    "pip", "xmlrpc", "sqlite3", "asyncio", "ssl", "ftplib", "imaplib", "smtplib", "mailbox",
+]
+
+TK_IMPORTS = ["tkinter", "tkinter.ttk", "tkinter.messagebox", "tkinter.simpledialog", "tkinter.filedialog"]
+
+# What each build contains
+TARGETS = {
+    "gui": {"label": "Modern GUI", "name": "PyTo-Do-GUI", "script": "frontend/modern_gui.py",
+            "window": "--windowed", "tk": True, "code": ["frontend", "backend"], "cli": False},
+    "cli": {"label": "CLI", "name": "PyTo-Do-CLI", "script": "main.py",
+            "window": "--console", "tk": False, "code": ["backend"], "cli": True},
+    "launcher": {"label": "Launcher", "name": "PyTo-Do-Launcher", "script": "launcher.py",
+                 "window": "--console", "tk": True, "code": ["frontend", "backend"], "cli": True},
+}
+
+# Menu choices and the targets each builds
+CHOICES = {'1': ["gui"], '2': ["cli"], '3': ["launcher"], '4': ["gui", "cli"]}
+
+def dist_dir(profile):
+    """Where PyInstaller puts the builds of a profile"""
+    return "dist" if profile == "portable" else os.path.join("dist", profile)
+
+def work_dir(target, profile):
+    """PyInstaller's scratch directory for one target and profile"""
+    return os.path.join("build", profile, target)
+
+def release_dir(profile):
+    """Where the finished builds of a profile are copied"""
+    return Path("release") if profile == "portable" else Path("release") / profile
+
+def executable_path(target, profile, root="release"):
+    """Path of a built executable, under release/ unless root says otherwise"""
+    name = TARGETS[target]["name"] + (".exe" if os.name == "nt" else "")
+    base = str(release_dir(profile)) if root == "release" else dist_dir(profile)
+    if profile == "portable":
+        return os.path.join(base, name)
+    return os.path.join(base, TARGETS[target]["name"], name)
+
+def pyinstaller_command(target, profile):
+    """PyInstaller invocation that builds one target with one profile"""
+    spec = TARGETS[target]
+    options = PROFILES[profile]
+    separator = ";" if os.name == "nt" else ":"
     
-    print("🔨 Building PyTo-Do executable...")
+    # Bytecode is compiled at the interpreter's optimization level
+    cmd = [sys.executable] + (["-OO"] if options["optimize"] else []) + ["-m", "PyInstaller"]
+    cmd += [options["layout"], spec["window"], "--name", spec["name"], "--noconfirm"]
+    # Its own work directory, so targets can build side by side
+    cmd += ["--workpath", work_dir(target, profile)]
+    if profile != "portable":
+        cmd += ["--distpath", dist_dir(profile)]
+    
+    imports = (TK_IMPORTS if spec["tk"] else []) + ["json", "datetime"]
+    cmd += [f"--hidden-import={module}" for module in imports]
+    cmd += [f"--add-data=storage.json{separator}.", f"--add-data=assets{separator}assets"]
+    
+    if options["code_as_data"]:
+        cmd += [f"--add-data={folder}{separator}{folder}" for folder in spec["code"]]
+    else:
+        # Let PyInstaller find and compile the code; the CLI's entry module is
+        # loaded by path from main.py, so its imports are listed explicitly
+        cmd += ["--paths", ".", "--paths", "backend"]
+        cmd += [f"--hidden-import=pytodo.{module.stem}" for module in sorted(Path("backend/pytodo").glob("*.py"))]
+        if spec["cli"]:
+            cmd.append(f"--add-data=backend/main-cli.py{separator}backend")
+        excluded = UNUSED_MODULES + ([] if spec["tk"] else ["tkinter"])
+        cmd += [f"--exclude-module={module}" for module in excluded]
     
-    # Ask user for build type
+    # Add icon if available
+    icon_path = "assets/Py-ToDoLogo.png"
+    if os.path.exists(icon_path):
+        cmd.extend(["--icon", icon_path])
+    
+    cmd.append(spec["script"])
+    return cmd
+
+def copy_to_release(target, profile):
+    """Copy a finished build into the release folder"""
+    release = release_dir(profile)
+    release.mkdir(parents=True, exist_ok=True)
+    name = TARGETS[target]["name"]
+    if profile == "portable":
+        built = Path(executable_path(target, profile, root="dist"))
+        shutil.copy2(built, release / built.name)
+    else:
+        shutil.copytree(Path(dist_dir(profile)) / name, release / name, dirs_exist_ok=True)
+    print(f"📦 Copied {name} to {release}")
+
+def source_files(target):
+    """Every file that goes into a target's build"""
+    spec = TARGETS[target]
+    roots = [spec["script"], "storage.json", "assets"] + spec["code"] + (["main.py"] if spec["cli"] else [])
+    for root in roots:
+        if os.path.isfile(root):
+            yield root
+            continue
+        for folder, dirs, files in os.walk(root):
+            dirs[:] = [name for name in dirs if name != "__pycache__"]
+            for name in files:
+                yield os.path.join(folder, name)
+
+def build_hash(target, profile):
+    """Content hash of a target's sources, options and toolchain"""
+    try:
+        from PyInstaller import __version__ as pyinstaller_version
+    except ImportError:
+        pyinstaller_version = None
+    digest = hashlib.sha1(repr((pyinstaller_command(target, profile), sys.version, pyinstaller_version)).encode())
+    for path in sorted(set(source_files(target))):
+        digest.update(path.encode() + b"\0")
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def stamp_path(target, profile):
+    """Where the hash of a target's last successful build is kept"""
+    return os.path.join(work_dir(target, profile), "source.sha1")
+
+def is_current(target, profile, digest):
+    """Whether a target was already built from exactly these sources"""
+    if not os.path.exists(executable_path(target, profile)):
+        return False
+    try:
+        with open(stamp_path(target, profile)) as file:
+            return file.read().strip() == digest
+    except OSError:
+        return False
+
+def run_build(target, profile, digest):
+    """Build one target, in a worker process; returns (target, error, seconds)"""
+    began = time.perf_counter()
+    try:
+        subprocess.run(pyinstaller_command(target, profile), check=True, capture_output=True, text=True)
+        copy_to_release(target, profile)
+    except subprocess.CalledProcessError as e:
+        return target, e.stderr or str(e), time.perf_counter() - began
+    with open(stamp_path(target, profile), "w") as file:
+        file.write(digest)
+    return target, None, time.perf_counter() - began
+
+def ask_targets():
+    """Build type and profile chosen from the interactive menu"""
     print("Choose build type:")
     print("1. Modern GUI Application (frontend/modern_gui.py) - Recommended")
     print("2. CLI Application (main.py)")
     print("3. Launcher (all interfaces) - Best option")
     print("4. Both CLI and GUI")
     
-    choice = input("Enter choice (1-3): ").strip()
+    choice = input("Enter choice (1-4): ").strip()
     
     # Default to launcher if invalid choice
-    if choice not in ['1', '2', '3', '4']:
+    if choice not in CHOICES:
         choice = '3'
         print("Invalid choice, defaulting to launcher application")
     
-    separator = ";" if os.name == "nt" else ":"
+    print("Choose build profile:")
+    print("1. Portable - a single file, unpacks itself on every launch")
+    print("2. Fast start - a folder, starts without unpacking")
+    profile = "fast-start" if input("Enter choice (1-2): ").strip() == '2' else "portable"
+    return CHOICES[choice], profile
+
+def build_executable(targets=None, profile="portable", jobs=None, force=False):
+    """Build the executables using PyInstaller, independent targets in parallel"""
+    if not check_pyinstaller():
+        return False
     
-    builds = []
-    if choice == '1':  # Modern GUI build
-        gui_cmd = [
-            "pyinstaller",
-            "--onefile",
-            "--windowed",                     # No console window for GUI
-            "--name", "PyTo-Do-GUI",
-            "--hidden-import=tkinter",
-            "--hidden-import=tkinter.ttk",
-            "--hidden-import=tkinter.messagebox",
-            "--hidden-import=tkinter.simpledialog",
-            "--hidden-import=tkinter.filedialog",
-            "--hidden-import=json",
-            "--hidden-import=datetime",
-            f"--add-data=storage.json{separator}.",
-            f"--add-data=assets{separator}assets",
-            f"--add-data=frontend{separator}frontend",
-            f"--add-data=backend{separator}backend",
-            "frontend/modern_gui.py"
-        ]
-        builds.append(("Modern GUI", gui_cmd))
-    
-    if choice == '2':  # CLI build
-        cli_cmd = [
-            "pyinstaller",
-            "--onefile",
-            "--console",
-            "--name", "PyTo-Do-CLI",
-            "--hidden-import=json",
-            "--hidden-import=datetime",
-            f"--add-data=storage.json{separator}.",
-            f"--add-data=assets{separator}assets",
-            f"--add-data=backend{separator}backend",
-            "main.py"
-        ]
-        builds.append(("CLI", cli_cmd))
-    
-    if choice == '3':  # Launcher build
-        launcher_cmd = [
-            "pyinstaller",
-            "--onefile",
-            "--console",
-            "--name", "PyTo-Do-Launcher",
-            "--hidden-import=tkinter",
-            "--hidden-import=tkinter.ttk",
-            "--hidden-import=tkinter.messagebox",
-            "--hidden-import=tkinter.simpledialog",
-            "--hidden-import=tkinter.filedialog",
-            "--hidden-import=json",
-            "--hidden-import=datetime",
-            f"--add-data=storage.json{separator}.",
-            f"--add-data=assets{separator}assets",
-            f"--add-data=frontend{separator}frontend",
-            f"--add-data=backend{separator}backend",
-            "launcher.py"
-        ]
-        builds.append(("Launcher", launcher_cmd))
-    
-    if choice == '4':  # Both CLI and GUI
-        # Add both builds
-        gui_cmd = [
-            "pyinstaller",
-            "--onefile",
-            "--windowed",
-            "--name", "PyTo-Do-GUI",
-            "--hidden-import=tkinter",
-            "--hidden-import=tkinter.ttk",
-            "--hidden-import=tkinter.messagebox",
-            "--hidden-import=tkinter.simpledialog",
-            "--hidden-import=tkinter.filedialog",
-            "--hidden-import=json",
-            "--hidden-import=datetime",
-            f"--add-data=storage.json{separator}.",
-            f"--add-data=assets{separator}assets",
-            f"--add-data=frontend{separator}frontend",
-            f"--add-data=backend{separator}backend",
-            "frontend/modern_gui.py"
-        ]
-        builds.append(("Modern GUI", gui_cmd))
-        
-        cli_cmd = [
-            "pyinstaller",
-            "--onefile",
-            "--console",
-            "--name", "PyTo-Do-CLI",
-            "--hidden-import=json",
-            "--hidden-import=datetime",
-            f"--add-data=storage.json{separator}.",
-            f"--add-data=assets{separator}assets",
-            f"--add-data=backend{separator}backend",
-            "main.py"
-        ]
-        builds.append(("CLI", cli_cmd))
-    
-    # Add icon to builds if available
-    icon_path = "assets/Py-ToDoLogo.png"
-    if os.path.exists(icon_path):
-        for i, (build_type, cmd) in enumerate(builds):
-            cmd.extend(["--icon", icon_path])
-            builds[i] = (build_type, cmd)
+    print("🔨 Building PyTo-Do executable...")
     
-    success_count = 0
-    total_builds = len(builds)
+    if not targets:
+        targets, profile = ask_targets()
     
-    # Execute builds
-    for build_type, cmd in builds:
-        print(f"\n🔨 Building {build_type} version...")
-        try:
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-            print(f"✓ {build_type} build completed successfully!")
-            success_count += 1
-        except subprocess.CalledProcessError as e:
-            print(f"❌ {build_type} build failed: {e}")
-            if e.stderr:
-                print(f"Error output: {e.stderr}")
-    
-    if success_count > 0:
-        # Create release folder and copy executables
-        release_dir = Path("release")
-        release_dir.mkdir(exist_ok=True)
-        
-        # Copy built executables
-        for exe_file in Path("dist").glob("*"):
-            if exe_file.is_file():
-                shutil.copy2(exe_file, release_dir / exe_file.name)
-                print(f"📦 Copied {exe_file.name} to release folder")
-        
-        print(f"\n🎉 {success_count}/{total_builds} builds completed successfully!")
-        print(f"📁 Executables available in: {release_dir.absolute()}")
-        return True
+    # Skip targets whose sources and options have not changed
+    digests = {target: build_hash(target, profile) for target in targets}
+    pending = [target for target in targets if force or not is_current(target, profile, digests[target])]
+    for target in targets:
+        if target not in pending:
+            print(f"✓ {TARGETS[target]['label']} is up to date, skipped")
+    
+    times = {}
+    failed = []
+    if pending:
+        jobs = jobs or len(pending)
+        print(f"\n🔨 Building {', '.join(TARGETS[target]['label'] for target in pending)} ({profile}, {jobs} at a time)...")
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(run_build, target, profile, digests[target]) for target in pending]
+            for future in as_completed(futures):
+                target, error, seconds = future.result()
+                times[target] = seconds
+                build_type = TARGETS[target]["label"]
+                if error is None:
+                    print(f"✓ {build_type} build completed successfully in {seconds:.1f}s!")
+                else:
+                    failed.append(target)
+                    print(f"❌ {build_type} build failed after {seconds:.1f}s")
+                    print(f"Error output: {error}")
+    
+    if times:
+        print("\n⏱️  Build times:")
+        for target in sorted(times, key=times.get, reverse=True):
+            status = "failed" if target in failed else "ok"
+            print(f"  {TARGETS[target]['label']:<12} {times[target]:>7.1f}s  {status}")
+    
+    built = len(targets) - len(failed)
+    if built > 0:
+        print(f"\n🎉 {built}/{len(targets)} builds ready!")
+        print(f"📁 Executables available in: {release_dir(profile).absolute()}")
+        return not failed
     else:
         print(f"\n❌ All builds failed.")
         return False
@@ -203,15 +276,27 @@ def clean_build():
 
 def main():
     """Main build function"""
+    parser = argparse.ArgumentParser(description="Build PyTo-Do executables with PyInstaller")
+    parser.add_argument("action", nargs="?", choices=["build", "clean"], default="build",
+                        help="Build executables (default) or remove build artifacts")
+    parser.add_argument("--target", dest="targets", action="append", choices=sorted(TARGETS),
+                        help="Target to build, may be repeated; without it the build menu is shown")
+    parser.add_argument("--all", action="store_true", help="Build every target")
+    parser.add_argument("--profile", choices=list(PROFILES), default="portable", help="Build profile (default portable)")
+    parser.add_argument("--jobs", type=int, help="Targets built at once (default: all of them)")
+    parser.add_argument("--force", action="store_true", help="Rebuild targets even if their sources are unchanged")
+    args = parser.parse_args()
+    
     print("🚀 PyTo-Do Build Script")
     print("=" * 30)
     
-    if len(sys.argv) > 1 and sys.argv[1] == "clean":
+    if args.action == "clean":
         clean_build()
         return
     
     # Build executable
-    success = build_executable()
+    targets = list(TARGETS) if args.all else args.targets
+    success = build_executable(targets, args.profile, args.jobs, args.force)
     
     if success:
         print("\n🎉 Build completed successfully!")
@@ -221,6 +306,7 @@ def main():
         print("  - Clean build files: python build.py clean")
     else:
         print("\n❌ Build failed. Please check the error messages above.")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -9,14 +9,29 @@ import os
 import sys
 from datetime import datetime
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import webbrowser
 
+# Make the backend's pytodo package importable when run directly or bundled
+BASE_PATH = getattr(sys, '_MEIPASS', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BACKEND_PATH = os.path.join(BASE_PATH, 'backend')
+if BACKEND_PATH not in sys.path:
+    sys.path.insert(0, BACKEND_PATH)
+
+from pytodo import merge
+from pytodo.storage_processor import load_tombstones, save_tombstones, tombstones_path
+from pytodo.timeindex import DATE_RANGES, date_range, custom_range
+from pytodo.export import FILETYPES, export_file, format_for, query_for
+from pytodo.duplicates import split_duplicates
+
+# Status choices for exports and the view filter each stands for
+EXPORT_STATUSES = {"All tasks": "all", "Pending tasks": "pending", "Completed tasks": "completed"}
+
 class CloudSyncGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("PyTo-Do Cloud Sync")
-        self.root.geometry("600x500")
+        self.root.geometry("600x550")
         self.root.minsize(500, 400)
         
         self.storage_file = "storage.json"
@@ -50,6 +65,18 @@ class CloudSyncGUI:
         
         ttk.Button(export_frame, text="Export Tasks", command=self.export_tasks).grid(row=0, column=0, padx=(0, 10))
         ttk.Button(export_frame, text="Import Tasks", command=self.import_tasks).grid(row=0, column=1, padx=(10, 0))
+        ttk.Button(export_frame, text="Merge Tasks", command=self.merge_tasks).grid(row=0, column=2, padx=(10, 0))
+        
+        # What an export includes; JSON of everything is a full backup
+        select_frame = ttk.Frame(export_frame)
+        select_frame.grid(row=1, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        ttk.Label(select_frame, text="Export:").grid(row=0, column=0, padx=(0, 5))
+        self.export_status = tk.StringVar(value="All tasks")
+        ttk.Combobox(select_frame, textvariable=self.export_status, state="readonly", width=16,
+                     values=list(EXPORT_STATUSES)).grid(row=0, column=1, padx=(0, 5))
+        self.export_range = tk.StringVar(value=DATE_RANGES[0])
+        ttk.Combobox(select_frame, textvariable=self.export_range, state="readonly", width=20,
+                     values=DATE_RANGES).grid(row=0, column=2)
         
         # Cloud Services Section
         cloud_frame = ttk.LabelFrame(main_frame, text="Cloud Services", padding="15")
@@ -94,39 +121,69 @@ class CloudSyncGUI:
         status_label.grid(row=0, column=0, sticky=tk.W)
         
         # Task count
+        self.count_label = ttk.Label(status_frame, text=self.count_text(), foreground="gray")
+        self.count_label.grid(row=1, column=0, sticky=tk.W)
+    
+    def count_text(self):
+        """Describe the tasks currently in the storage file"""
         try:
             with open(self.storage_file, 'r') as f:
                 tasks = json.load(f)
                 task_count = len(tasks)
                 completed = sum(1 for task in tasks if task.get('completed', False))
-                count_text = f"Current tasks: {task_count} total, {completed} completed"
+                return f"Current tasks: {task_count} total, {completed} completed"
         except:
-            count_text = "No tasks file found"
-        
-        count_label = ttk.Label(status_frame, text=count_text, foreground="gray")
-        count_label.grid(row=1, column=0, sticky=tk.W)
+            return "No tasks file found"
+    
+    def export_query(self):
+        """Query for the chosen status and date range, None if cancelled"""
+        name = self.export_range.get()
+        if name.endswith("between..."):
+            first_day = simpledialog.askstring("Date Range", "From (YYYY-MM-DD):")
+            last_day = first_day and simpledialog.askstring("Date Range", "To (YYYY-MM-DD):", initialvalue=first_day)
+            if not last_day:
+                return None
+            try:
+                date_filter = custom_range(name, first_day.strip(), last_day.strip())
+            except ValueError:
+                messagebox.showwarning("Warning", "Please enter dates as YYYY-MM-DD!")
+                return None
+        else:
+            date_filter = date_range(name)
+        return query_for(EXPORT_STATUSES[self.export_status.get()], date_filter)
     
     def export_tasks(self):
-        """Export tasks to a file"""
+        """Export tasks to a JSON, CSV, NDJSON or Markdown file"""
         if not os.path.exists(self.storage_file):
             messagebox.showerror("Error", "No tasks file found!")
             return
+        query = self.export_query()
+        if query is None:
+            return
         
         # Ask user where to save
         filename = filedialog.asksaveasfilename(
             title="Export Tasks",
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=FILETYPES,
             initialfile=f"pytodo_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         )
         
         if filename:
             try:
-                # Copy the storage file
-                import shutil
-                shutil.copy2(self.storage_file, filename)
-                self.status_var.set(f"Tasks exported to: {os.path.basename(filename)}")
-                messagebox.showinfo("Success", f"Tasks exported successfully to:\n{filename}")
+                if format_for(filename) == "json" and not query:
+                    # Copy the storage file
+                    import shutil
+                    shutil.copy2(self.storage_file, filename)
+                    if os.path.exists(tombstones_path(self.storage_file)):
+                        shutil.copy2(tombstones_path(self.storage_file), tombstones_path(filename))
+                    message = "Tasks exported"
+                else:
+                    # Streamed from the file a task at a time
+                    count = export_file(self.storage_file, filename, query=query)
+                    message = f"{count} tasks exported"
+                self.status_var.set(f"{message} to: {os.path.basename(filename)}")
+                messagebox.showinfo("Success", f"{message} successfully to:\n{filename}")
             except Exception as e:
                 self.status_var.set("Export failed")
                 messagebox.showerror("Error", f"Failed to export tasks:\n{str(e)}")
@@ -144,6 +201,29 @@ class CloudSyncGUI:
                 with open(filename, 'r') as f:
                     tasks = json.load(f)
                 
+                mode = messagebox.askyesnocancel(
+                    "Import Mode",
+                    f"Import {len(tasks)} tasks from the backup.\n\n"
+                    "Yes: add them to your current tasks, skipping duplicates\n"
+                    "No: replace your current tasks")
+                if mode is None:
+                    return
+                if mode:
+                    local = []
+                    if os.path.exists(self.storage_file):
+                        with open(self.storage_file, 'r', encoding='utf-8') as f:
+                            local = json.load(f)
+                    new, skipped = split_duplicates(local, tasks)
+                    merged, tombstones = merge.merge_tasks(
+                        local, new,
+                        load_tombstones(self.storage_file), load_tombstones(filename))
+                    with open(self.storage_file, 'w', encoding='utf-8') as f:
+                        json.dump(merged, f, indent=4, ensure_ascii=False)
+                    save_tombstones(tombstones, self.storage_file)
+                    self.count_label.config(text=self.count_text())
+                    self.status_var.set(f"Imported {len(merged) - len(local)} tasks, skipped {len(skipped)} duplicates")
+                    return
+                
                 # Confirm with user
                 if messagebox.askyesno("Confirm Import", 
                                      f"This will replace your current tasks with {len(tasks)} tasks from the backup.\n\nContinue?"):
@@ -168,6 +248,39 @@ class CloudSyncGUI:
                 self.status_var.set("Import failed")
                 messagebox.showerror("Error", f"Failed to import tasks:\n{str(e)}")
     
+    def merge_tasks(self):
+        """Merge tasks from a file into the current tasks"""
+        filename = filedialog.askopenfilename(
+            title="Merge Tasks",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            try:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    remote = json.load(f)
+                local = []
+                if os.path.exists(self.storage_file):
+                    with open(self.storage_file, 'r', encoding='utf-8') as f:
+                        local = json.load(f)
+                
+                merged, tombstones = merge.merge_tasks(
+                    local, remote,
+                    load_tombstones(self.storage_file), load_tombstones(filename))
+                
+                if messagebox.askyesno("Confirm Merge",
+                                     f"Merge {len(remote)} tasks from the backup into your {len(local)} current tasks?\n\n"
+                                     f"The merged list will have {len(merged)} tasks."):
+                    with open(self.storage_file, 'w', encoding='utf-8') as f:
+                        json.dump(merged, f, indent=4, ensure_ascii=False)
+                    save_tombstones(tombstones, self.storage_file)
+                    self.count_label.config(text=self.count_text())
+                    self.status_var.set(f"Tasks merged from: {os.path.basename(filename)}")
+                    
+            except Exception as e:
+                self.status_var.set("Merge failed")
+                messagebox.showerror("Error", f"Failed to merge tasks:\n{str(e)}")
+    
     def show_instructions(self, service):
         """Show setup instructions for cloud services"""
         instructions = {
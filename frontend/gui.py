@@ -12,36 +12,75 @@ import os
 from datetime import datetime
 import sys
 
+# Make the backend's pytodo package importable when run directly or bundled
+BASE_PATH = getattr(sys, '_MEIPASS', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BACKEND_PATH = os.path.join(BASE_PATH, 'backend')
+if BACKEND_PATH not in sys.path:
+    sys.path.insert(0, BACKEND_PATH)
+
+from pytodo.store import TaskStore
+from pytodo.changes import IdleBatcher, INSERTED, UPDATED, REMOVED, RESET
+from pytodo.viewmodel import TaskListView
+from pytodo.timeindex import DATE_RANGES, date_range, custom_range, format_epoch
+from pytodo.reminders import ReminderScheduler, parse_due, reminder_text
+from pytodo.redraw import FrameScheduler
+from pytodo.nextup import PRIORITIES, parse_priority, priority_of
+
+# Archived tasks loaded per "Load More" click
+ARCHIVE_PAGE = 200
+# Store sort order behind each column
+SORT_COLUMNS = {"Status": "status", "Task": "task", "Added": "added", "Due": "due", "Priority": "priority"}
+# Suffix of the stand-in child that makes a task with unloaded subtasks expandable
+PLACEHOLDER = ":subtasks"
+
 class PyToDoGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("PyTo-Do - Task Manager")
-        self.root.geometry("600x500")
-        self.root.minsize(500, 400)
+        self.root.geometry("840x560")  # room for every tree column
+        self.root.minsize(640, 450)
         
         # Task storage file
         self.storage_file = "storage.json"
-        self.tasks = self.load_tasks()
+        self.store = TaskStore(self.storage_file)
+        self.store.archive_completed()
+        # Date range and sort order of the rows shown
+        self.view = TaskListView(self.store)
+        # Top-level tasks only, subtasks are loaded as their tasks are opened
+        self.view.tree = True
+        # Ids of the tasks the user has opened, kept open across redraws
+        self.open_nodes = set()
+        # Column the list is sorted by, None keeps list order
+        self.sort_column = None
+        
+        # Redraws are marked dirty and done once per idle cycle, in this order
+        self.redraw = FrameScheduler(self.root.after_idle, self.root.after, self.root.after_cancel)
+        self.redraw.register("rows", self.redraw_rows)
+        self.redraw.register("counts", self.update_counts)
+        self.redraw.register("status", self.show_status)
+        self.status_message = ""
         
         self.setup_ui()
         self.refresh_task_list()
+        
+        # Apply store changes to the tree once per idle cycle
+        self.store.changes.subscribe(IdleBatcher(self.root.after_idle, self.on_changes))
+        # One timer for the earliest due reminder
+        self.reminders = ReminderScheduler(self.store, self.on_reminders, self.root.after, self.root.after_cancel)
+        
+        # Undo/redo shortcuts
+        self.root.bind("<Control-z>", lambda e: self.undo())
+        self.root.bind("<Control-y>", lambda e: self.redo())
     
-    def load_tasks(self):
-        """Load tasks from storage file"""
-        try:
-            with open(self.storage_file, "r", encoding="utf-8") as file:
-                return json.load(file)
-        except FileNotFoundError:
-            return []
-        except json.JSONDecodeError:
-            print("Warning: Corrupted storage file, starting fresh")
-            return []
+    @property
+    def tasks(self):
+        """Tasks currently held by the store"""
+        return self.store.tasks
     
     def save_tasks(self):
         """Save tasks to storage file"""
         try:
-            with open(self.storage_file, "w", encoding="utf-8") as file:
-                json.dump(self.tasks, file, indent=4, ensure_ascii=False)
+            self.store.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save tasks: {e}")
     
@@ -78,19 +117,26 @@ class PyToDoGUI:
         list_frame.rowconfigure(0, weight=1)
         
         # Treeview for tasks
-        columns = ("Status", "Task", "Added")
-        self.task_tree = ttk.Treeview(list_frame, columns=columns, show="tree headings", height=15)
+        columns = ("Status", "Task", "Added", "Due", "Priority")
+        self.task_tree = ttk.Treeview(list_frame, columns=columns, show="tree headings", height=15,
+                                      selectmode="extended")  # shift/ctrl-click for bulk actions
         
         # Configure columns
-        self.task_tree.column("#0", width=0, stretch=False)  # Hide tree column
+        self.task_tree.column("#0", width=80, stretch=False)  # Expanders and "done/total" of subtasks
+        self.task_tree.heading("#0", text="Subtasks")
         self.task_tree.column("Status", width=80, anchor=tk.CENTER)
         self.task_tree.column("Task", width=300, anchor=tk.W)
         self.task_tree.column("Added", width=120, anchor=tk.CENTER)
+        self.task_tree.column("Due", width=120, anchor=tk.CENTER)
+        self.task_tree.column("Priority", width=70, anchor=tk.CENTER)
+        
+        # Configure headings, click to sort
+        for column in columns:
+            self.task_tree.heading(column, text=column, command=lambda c=column: self.sort_by(c))
         
-        # Configure headings
-        self.task_tree.heading("Status", text="Status")
-        self.task_tree.heading("Task", text="Task")
-        self.task_tree.heading("Added", text="Added")
+        # Subtasks are put in the tree the first time their task is opened
+        self.task_tree.bind("<<TreeviewOpen>>", lambda e: self.on_open())
+        self.task_tree.bind("<<TreeviewClose>>", lambda e: self.open_nodes.discard(self.task_tree.focus()))
         
         # Scrollbar for treeview
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.task_tree.yview)
@@ -104,11 +150,33 @@ class PyToDoGUI:
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=3, column=0, columnspan=3, pady=(20, 0))
         
+        # Action buttons on the first row, view controls on the second
+        action_row = ttk.Frame(button_frame)
+        action_row.pack()
+        view_row = ttk.Frame(button_frame)
+        view_row.pack(pady=(10, 0))
+        
         # Action buttons
-        ttk.Button(button_frame, text="Complete Task", command=self.complete_task).pack(side=tk.LEFT, padx=(0, 10))
-        ttk.Button(button_frame, text="Delete Task", command=self.delete_task).pack(side=tk.LEFT, padx=(0, 10))
-        ttk.Button(button_frame, text="Edit Task", command=self.edit_task).pack(side=tk.LEFT, padx=(0, 10))
-        ttk.Button(button_frame, text="Refresh", command=self.refresh_task_list).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(action_row, text="Complete Task", command=self.complete_task).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(action_row, text="Add Subtask", command=self.add_subtask).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(action_row, text="Delete Task", command=self.delete_task).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(action_row, text="Edit Task", command=self.edit_task).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(action_row, text="Set Due", command=self.set_due).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(action_row, text="Priority", command=self.set_priority).pack(side=tk.LEFT)
+        ttk.Button(view_row, text="Refresh", command=self.refresh_task_list).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(view_row, text="Archived", command=self.show_archived).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Most urgent pending tasks only
+        self.next_up = tk.BooleanVar(value=False)
+        ttk.Checkbutton(view_row, text="Next Up", variable=self.next_up,
+                        command=self.toggle_next_up).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Date range filter
+        self.date_choice = tk.StringVar(value=DATE_RANGES[0])
+        date_box = ttk.Combobox(view_row, textvariable=self.date_choice, values=DATE_RANGES,
+                                state="readonly", width=20)
+        date_box.pack(side=tk.LEFT)
+        date_box.bind("<<ComboboxSelected>>", lambda e: self.set_date_filter(self.date_choice.get()))
         
         # Status bar
         self.status_var = tk.StringVar()
@@ -124,99 +192,334 @@ class PyToDoGUI:
             messagebox.showwarning("Warning", "Please enter a task!")
             return
         
-        # Create new task
-        new_task = {
-            "task": task_text,
-            "completed": False,
-            "added": datetime.now().strftime("%Y-%m-%d %H:%M")
-        }
+        same = self.store.duplicates_of(task_text)
+        if same and not messagebox.askyesno("Duplicate Task",
+                                            f"'{self.tasks[same[0]]['task']}' is already in the list.\n\nAdd it anyway?"):
+            return
         
-        self.tasks.append(new_task)
+        # Create new task
+        self.store.add(task_text)
         self.save_tasks()
         self.task_entry.delete(0, tk.END)
-        self.refresh_task_list()
         self.update_status(f"Added task: '{task_text}'")
     
+    def add_subtask(self):
+        """Add a new task under the selected task"""
+        indexes = self.selected_indexes()
+        if len(indexes) != 1:
+            messagebox.showwarning("Warning", "Please select one task to add a subtask to!")
+            return
+        task_text = self.task_entry.get().strip()
+        if not task_text:
+            messagebox.showwarning("Warning", "Please enter a task!")
+            return
+        
+        parent = self.tasks[indexes[0]]
+        self.open_nodes.add(parent["id"])
+        self.store.add(task_text, parent=parent["id"])
+        self.save_tasks()
+        self.task_entry.delete(0, tk.END)
+        self.update_status(f"Added subtask to '{parent['task']}': '{task_text}'")
+    
+    def selected_indexes(self):
+        """Indexes of every selected task, in list order"""
+        return sorted(self.store.index_of(item) for item in self.task_tree.selection()
+                      if not item.endswith(PLACEHOLDER))
+    
     def complete_task(self):
-        """Mark selected task as completed"""
-        selected = self.task_tree.selection()
-        if not selected:
+        """Mark selected tasks as completed"""
+        indexes = self.selected_indexes()
+        if not indexes:
             messagebox.showwarning("Warning", "Please select a task to complete!")
             return
         
-        item = selected[0]
-        task_index = int(self.task_tree.item(item)["tags"][0])
-        
-        if self.tasks[task_index]["completed"]:
+        pending = [i for i in indexes if not self.tasks[i]["completed"]]
+        if not pending:
             messagebox.showinfo("Info", "Task is already completed!")
             return
         
-        self.tasks[task_index]["completed"] = True
+        self.store.complete_many(pending)
         self.save_tasks()
-        self.refresh_task_list()
-        self.update_status(f"Completed task: '{self.tasks[task_index]['task']}'")
+        if len(pending) == 1:
+            self.update_status(f"Completed task: '{self.tasks[pending[0]]['task']}'")
+        else:
+            self.update_status(f"Completed {len(pending)} tasks")
     
     def delete_task(self):
-        """Delete selected task"""
-        selected = self.task_tree.selection()
-        if not selected:
+        """Delete selected tasks"""
+        indexes = self.selected_indexes()
+        if not indexes:
             messagebox.showwarning("Warning", "Please select a task to delete!")
             return
         
-        item = selected[0]
-        task_index = int(self.task_tree.item(item)["tags"][0])
-        task_text = self.tasks[task_index]["task"]
+        if len(indexes) == 1:
+            description = f"task: '{self.tasks[indexes[0]]['task']}'"
+        else:
+            description = f"{len(indexes)} tasks"
+        # Subtasks go with their task
+        doomed = set()
+        for index in indexes:
+            doomed.update(self.store.subtree(index))
+        if len(doomed) > len(indexes):
+            description += f" and {len(doomed) - len(indexes)} subtask(s)"
         
-        if messagebox.askyesno("Confirm", f"Delete task: '{task_text}'?"):
-            self.tasks.pop(task_index)
+        if messagebox.askyesno("Confirm", f"Delete {description}?"):
+            self.store.remove_many(doomed)
             self.save_tasks()
-            self.refresh_task_list()
-            self.update_status(f"Deleted task: '{task_text}'")
+            self.update_status(f"Deleted {description}")
     
     def edit_task(self):
-        """Edit selected task"""
-        selected = self.task_tree.selection()
-        if not selected:
+        """Edit selected tasks"""
+        indexes = self.selected_indexes()
+        if not indexes:
             messagebox.showwarning("Warning", "Please select a task to edit!")
             return
         
-        item = selected[0]
-        task_index = int(self.task_tree.item(item)["tags"][0])
-        current_task = self.tasks[task_index]["task"]
+        if len(indexes) == 1:
+            prompt = "Enter new task text:"
+        else:
+            prompt = f"Enter new text for {len(indexes)} tasks:"
+        current_task = self.tasks[indexes[0]]["task"]
         
-        new_text = simpledialog.askstring("Edit Task", "Enter new task text:", initialvalue=current_task)
+        new_text = simpledialog.askstring("Edit Task", prompt, initialvalue=current_task)
         if new_text and new_text.strip():
-            self.tasks[task_index]["task"] = new_text.strip()
+            self.store.update_many(indexes, task=new_text.strip())
             self.save_tasks()
-            self.refresh_task_list()
-            self.update_status(f"Updated task to: '{new_text.strip()}'")
+            self.update_status(f"Updated {len(indexes)} task(s) to: '{new_text.strip()}'")
+    
+    def set_due(self):
+        """Set or clear the due date of selected tasks"""
+        indexes = self.selected_indexes()
+        if not indexes:
+            messagebox.showwarning("Warning", "Please select a task to set a due date for!")
+            return
+        
+        current = self.tasks[indexes[0]].get("due_at")
+        text = simpledialog.askstring("Set Due", "Due date (YYYY-MM-DD HH:MM), leave empty to clear:",
+                                      initialvalue=format_epoch(current) if current is not None else "")
+        if text is None:
+            return
+        try:
+            due_at = parse_due(text) if text.strip() else None
+        except ValueError:
+            messagebox.showerror("Error", "Dates must look like YYYY-MM-DD or YYYY-MM-DD HH:MM")
+            return
+        self.store.update_many(indexes, due_at=due_at, remind_at=None)
+        self.save_tasks()
+        self.update_status(f"Due {format_epoch(due_at)}" if due_at is not None else "Due date cleared")
+    
+    def set_priority(self):
+        """Set the priority of selected tasks"""
+        indexes = self.selected_indexes()
+        if not indexes:
+            messagebox.showwarning("Warning", "Please select a task to set a priority for!")
+            return
+        
+        current = PRIORITIES[priority_of(self.tasks[indexes[0]])]
+        text = simpledialog.askstring("Priority", f"Priority ({', '.join(PRIORITIES)}):", initialvalue=current)
+        if text is None:
+            return
+        try:
+            priority = parse_priority(text)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.store.update_many(indexes, priority=priority)
+        self.save_tasks()
+        self.update_status(f"Priority set to {PRIORITIES[priority]} for {len(indexes)} task(s)")
+    
+    def toggle_next_up(self):
+        """Switch between every task and the most urgent pending ones"""
+        self.view.status = "next" if self.next_up.get() else "all"
+        self.refresh_task_list()
+    
+    def on_reminders(self, tasks):
+        """Show reminders that came due in the status bar, saving that they fired"""
+        self.root.bell()
+        self.save_tasks()
+        self.update_status(reminder_text(tasks))
     
     def refresh_task_list(self):
-        """Refresh the task list display"""
+        """Refresh the task list display on the next idle cycle"""
+        self.redraw.mark("rows", "counts")
+    
+    def row_values(self, row):
+        """Treeview values and tags for a view model row"""
+        status = "✓ Done" if row.completed else "○ Pending"
+        return (status, row.text, row.added, row.due, row.priority), ("completed" if row.completed else "pending",)
+    
+    def redraw_rows(self):
+        """Rebuild every row of the tree, a frame's worth of rows at a time
+
+        Items are keyed by task id.
+        """
         # Clear existing items
-        for item in self.task_tree.get_children():
-            self.task_tree.delete(item)
-        
-        # Add tasks to treeview
-        for i, task in enumerate(self.tasks):
-            status = "✓ Done" if task["completed"] else "○ Pending"
-            added_date = task.get("added", "Unknown")
-            
-            # Insert with alternating colors
-            tags = (str(i), "completed" if task["completed"] else "pending")
-            self.task_tree.insert("", tk.END, values=(status, task["task"], added_date), tags=tags)
+        self.task_tree.delete(*self.task_tree.get_children())
         
         # Configure row colors
         self.task_tree.tag_configure("completed", background="#e8f5e8")
         self.task_tree.tag_configure("pending", background="white")
         
-        total_tasks = len(self.tasks)
-        completed_tasks = sum(1 for task in self.tasks if task["completed"])
-        self.update_status(f"Tasks: {total_tasks} total, {completed_tasks} completed, {total_tasks - completed_tasks} pending")
+        # Add tasks to treeview
+        self.redraw.in_slices("rows", self.view.rows(), self.insert_row)
+    
+    def insert_row(self, row, before=None, parent=""):
+        """Add one view model row to the tree, at the end or before another row"""
+        index = self.task_tree.index(before) if before is not None else tk.END
+        values, tags = self.row_values(row)
+        self.task_tree.insert(parent, index, iid=row.id, text=row.subtasks, values=values, tags=tags)
+        self.reset_children(row)
+    
+    def reset_children(self, row):
+        """Drop an item's subtasks, leaving a stand-in to load them when it is opened"""
+        self.task_tree.delete(*self.task_tree.get_children(row.id))
+        if row.subtasks:
+            self.task_tree.insert(row.id, tk.END, iid=row.id + PLACEHOLDER, text="…")
+            if row.id in self.open_nodes:
+                self.load_children(row.id)
+    
+    def load_children(self, item):
+        """Replace an item's stand-in with its subtasks, the first time it is opened"""
+        if not self.task_tree.exists(item + PLACEHOLDER):
+            return
+        self.task_tree.delete(item + PLACEHOLDER)
+        for row in self.view.children(item):
+            self.insert_row(row, parent=item)
+        self.task_tree.item(item, open=True)
+    
+    def on_open(self):
+        """Load the subtasks of the item being opened"""
+        item = self.task_tree.focus()
+        self.open_nodes.add(item)
+        self.load_children(item)
+    
+    def on_changes(self, changes):
+        """Apply a batch of store changes to just the affected rows
+
+        The status bar is left alone so the message about the action that
+        caused the changes stays visible.
+        """
+        # A tree that is still being filled is simply filled again
+        if self.redraw.is_dirty("rows") or self.redraw.busy("rows"):
+            self.redraw.mark("rows")
+            return
+        
+        for diff in self.view.diff(changes):
+            if diff.kind == RESET:
+                self.redraw.mark("rows")
+                return
+            if diff.kind == REMOVED:
+                self.task_tree.delete(diff.id)
+            elif diff.kind == UPDATED:
+                values, tags = self.row_values(diff.row)
+                self.task_tree.item(diff.id, text=diff.row.subtasks, values=values, tags=tags)
+                self.reset_children(diff.row)
+            else:
+                self.insert_row(diff.row, diff.before)
+    
+    def update_counts(self):
+        """Show task totals in the status bar"""
+        total_tasks, completed_tasks, pending_tasks = self.view.stats()
+        self.update_status(f"Tasks: {total_tasks} total, {completed_tasks} completed, {pending_tasks} pending")
+    
+    def sort_by(self, column):
+        """Sort by a column, clicking it again reverses the order"""
+        if self.sort_column == column:
+            self.view.reverse = not self.view.reverse
+        else:
+            self.sort_column, self.view.reverse = column, False
+        self.view.sort = SORT_COLUMNS[column]
+        for name in SORT_COLUMNS:
+            arrow = (" ▼" if self.view.reverse else " ▲") if name == column else ""
+            self.task_tree.heading(name, text=name + arrow)
+        self.refresh_task_list()
+    
+    def set_date_filter(self, name):
+        """Limit the list to tasks added or completed in a date range"""
+        if name.endswith("between..."):
+            first_day = simpledialog.askstring("Date Range", "From (YYYY-MM-DD):")
+            last_day = first_day and simpledialog.askstring("Date Range", "To (YYYY-MM-DD):", initialvalue=first_day)
+            if not last_day:
+                self.date_choice.set(DATE_RANGES[0])
+                self.view.date_filter = None
+            else:
+                try:
+                    self.view.date_filter = custom_range(name, first_day.strip(), last_day.strip())
+                except ValueError:
+                    messagebox.showwarning("Warning", "Please enter dates as YYYY-MM-DD!")
+                    return
+        else:
+            self.view.date_filter = date_range(name)
+        self.refresh_task_list()
+    
+    def show_archived(self):
+        """Open a window listing archived tasks, loaded a page at a time"""
+        window = tk.Toplevel(self.root)
+        window.title("Archived Tasks")
+        window.geometry("500x400")
+        window.columnconfigure(0, weight=1)
+        window.rowconfigure(0, weight=1)
+        
+        tree = ttk.Treeview(window, columns=("Task", "Completed"), show="headings", selectmode="extended")
+        tree.column("Task", width=320, anchor=tk.W)
+        tree.column("Completed", width=120, anchor=tk.CENTER)
+        tree.heading("Task", text="Task")
+        tree.heading("Completed", text="Completed")
+        scrollbar = ttk.Scrollbar(window, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(10, 0), pady=10)
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S), pady=10)
+        
+        def load_more():
+            archived = self.store.archive.page(len(tree.get_children()), ARCHIVE_PAGE)
+            for task in archived:
+                completed = format_epoch(task.get("completed_at"), "%Y-%m-%d")
+                tree.insert("", tk.END, iid=task["id"], values=(task["task"], completed))
+            if len(archived) < ARCHIVE_PAGE:
+                more_button.state(["disabled"])
+        
+        def restore():
+            selected = tree.selection()
+            if not selected:
+                messagebox.showwarning("Warning", "Please select a task to restore!", parent=window)
+                return
+            restored = self.store.restore(selected)
+            tree.delete(*selected)
+            self.update_status(f"Restored {len(restored)} task(s)")
+        
+        buttons = ttk.Frame(window)
+        buttons.grid(row=1, column=0, columnspan=2, pady=(0, 10))
+        ttk.Button(buttons, text="Restore Selected", command=restore).pack(side=tk.LEFT, padx=(0, 10))
+        more_button = ttk.Button(buttons, text="Load More", command=load_more)
+        more_button.pack(side=tk.LEFT)
+        load_more()
+    
+    def undo(self):
+        """Undo the last change"""
+        label = self.store.undo()
+        if label is None:
+            self.update_status("Nothing to undo")
+            return
+        self.save_tasks()
+        self.update_status(f"Undone: {label}")
+    
+    def redo(self):
+        """Redo the last undone change"""
+        label = self.store.redo()
+        if label is None:
+            self.update_status("Nothing to redo")
+            return
+        self.save_tasks()
+        self.update_status(f"Redone: {label}")
     
     def update_status(self, message):
-        """Update status bar"""
-        self.status_var.set(f" {message}")
+        """Update status bar on the next idle cycle"""
+        self.status_message = message
+        self.redraw.mark("status")
+    
+    def show_status(self):
+        """Show the latest status message"""
+        self.status_var.set(f" {self.status_message}")
 
 def main():
     """Main function to run the GUI"""
@@ -8,10 +8,48 @@ Features: Modern design, dark/light theme, animations, better UX
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import json
+import multiprocessing
 import os
 from datetime import datetime
 import sys
 
+# Make the backend's pytodo package importable when run directly or bundled
+BASE_PATH = getattr(sys, '_MEIPASS', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BACKEND_PATH = os.path.join(BASE_PATH, 'backend')
+if BACKEND_PATH not in sys.path:
+    sys.path.insert(0, BACKEND_PATH)
+
+from pytodo.storage_processor import load_tombstones, tombstones_path
+from pytodo.lists import Catalog, DEFAULT_LIST
+from pytodo.changes import IdleBatcher, INSERTED, UPDATED, REMOVED, RESET
+from pytodo.viewmodel import TaskListView
+from pytodo import memory
+from pytodo.timeindex import DATE_RANGES, date_range, custom_range, format_epoch
+from pytodo.reminders import ReminderScheduler, parse_due, reminder_text
+from pytodo.redraw import FrameScheduler
+from pytodo.export import FILETYPES, export_tasks, format_for, query_for
+from pytodo.nextup import PRIORITIES, parse_priority, priority_of
+from pytodo.tags import TagFilter, parse_tags
+from pytodo.duplicates import split_duplicates
+from pytodo.analytics import format_report, format_duration, date_of
+
+# Archived tasks shown at once in the Archived view
+ARCHIVE_PAGE = 100
+# Sort choices as (label, store sort order, reversed)
+SORT_CHOICES = [
+    ("List order", None, False),
+    ("Newest first", "added", True),
+    ("Oldest first", "added", False),
+    ("Task A-Z", "task", False),
+    ("Task Z-A", "task", True),
+    ("Pending first", "status", False),
+    ("Recently completed", "completed", True),
+    ("Due soonest", "due", False),
+    ("Highest priority", "priority", False),
+]
+# Days of daily completions charted in the Analytics window
+CHART_DAYS = 30
+
 class ModernPyToDoGUI:
     def __init__(self, root):
         self.root = root
@@ -36,17 +74,54 @@ class ModernPyToDoGUI:
         # Configure root
         self.root.configure(bg=self.colors['bg'])
         
-        # Task storage
-        self.storage_file = "storage.json"
-        self.tasks = self.load_tasks()
-        
-        # Current filter
+        # Redraws are marked dirty and done once per idle cycle, in this order
+        self.redraw = FrameScheduler(self.root.after_idle, self.root.after, self.root.after_cancel)
+        self.redraw.register("rows", self.redraw_rows)
+        self.redraw.register("stats", self.update_statistics)
+        self.redraw.register("tags", self.update_tag_cloud)
+        self.redraw.register("selection", self.update_selection_label)
+        self.redraw.register("lists", self.refresh_lists)
+        self.redraw.register("status", self.show_status)
+        self.status_message = "Ready"
+        
+        # Task storage, one file per list
+        self.catalog = Catalog("storage.json")
+        self.list_name = DEFAULT_LIST
+        self.storage_file = self.catalog.path_of(self.list_name)
+        self.store = self.catalog.open(self.list_name)
+        self.store.archive_completed()
+        
+        # Current filter, the view model holds the rest of what is shown
         self.current_filter = "all"
+        self.view = TaskListView(self.store)
+        
+        # Ids of tasks ticked for bulk actions
+        self.selected_ids = set()
+        # Row frame of each task on screen, by task id
+        self.task_widgets = {}
         
         self.setup_styles()
         self.setup_ui()
         self.refresh_task_list()
         
+        # Apply store changes to the list once per idle cycle
+        self.batcher = IdleBatcher(self.root.after_idle, self.on_changes)
+        self.unsubscribe = self.store.changes.subscribe(self.batcher)
+        # One timer for the earliest due reminder
+        self.reminders = self.watch_reminders()
+        
+        # Undo/redo shortcuts
+        self.root.bind("<Control-z>", lambda e: self.undo())
+        self.root.bind("<Control-y>", lambda e: self.redo())
+        # Debug panel
+        self.root.bind("<F12>", lambda e: self.show_memory_panel())
+        self.memory_sampler = None
+    
+    @property
+    def tasks(self):
+        """Tasks currently held by the store"""
+        return self.store.tasks
+        
     def setup_styles(self):
         """Setup modern ttk styles"""
         style = ttk.Style()
@@ -95,24 +170,14 @@ class ModernPyToDoGUI:
                        font=('Segoe UI', 11, 'bold'),
                        padding=(10, 10))
     
-    def load_tasks(self):
-        """Load tasks from storage file"""
-        try:
-            with open(self.storage_file, "r", encoding="utf-8") as file:
-                return json.load(file)
-        except FileNotFoundError:
-            return []
-        except json.JSONDecodeError:
-            print("Warning: Corrupted storage file, starting fresh")
-            return []
-    
     def save_tasks(self):
         """Save tasks to storage file"""
         try:
-            with open(self.storage_file, "w", encoding="utf-8") as file:
-                json.dump(self.tasks, file, indent=4, ensure_ascii=False)
+            self.store.save()
+            self.catalog.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save tasks: {e}")
+        self.redraw.mark("lists")
     
     def setup_ui(self):
         """Setup the modern user interface"""
@@ -181,6 +246,16 @@ class ModernPyToDoGUI:
                                      fg=self.colors['warning'],
                                      bg=self.colors['bg'])
         self.pending_label.pack(side=tk.RIGHT, padx=(0, 15))
+        
+        # Completions over the last week, click for the full analytics
+        self.week_label = tk.Label(stats_frame,
+                                  text="📈 0 done in 7 days",
+                                  font=('Segoe UI', 12, 'bold'),
+                                  fg=self.colors['primary'],
+                                  bg=self.colors['bg'],
+                                  cursor='hand2')
+        self.week_label.pack(side=tk.RIGHT, padx=(0, 15))
+        self.week_label.bind("<Button-1>", lambda e: self.show_analytics())
     
     def setup_sidebar(self, parent):
         """Setup the sidebar with filters and actions"""
@@ -188,19 +263,53 @@ class ModernPyToDoGUI:
         sidebar_frame.pack(side=tk.LEFT, fill=tk.Y, padx=(0, 20))
         sidebar_frame.pack_propagate(False)
         
+        # List switcher, counts come from the catalog so no list is opened
+        lists_title = tk.Label(sidebar_frame,
+                              text="Lists",
+                              font=('Segoe UI', 14, 'bold'),
+                              fg=self.colors['white'],
+                              bg=self.colors['sidebar'])
+        lists_title.pack(pady=(20, 10))
+        
+        self.list_box = tk.Listbox(sidebar_frame,
+                                   height=5,
+                                   font=('Segoe UI', 10),
+                                   bg=self.colors['white'],
+                                   fg=self.colors['text'],
+                                   selectbackground=self.colors['primary'],
+                                   activestyle='none',
+                                   exportselection=False,
+                                   border=0)
+        self.list_box.pack(fill=tk.X, padx=15)
+        self.list_box.bind("<<ListboxSelect>>", lambda e: self.on_list_selected())
+        
+        new_list_btn = tk.Button(sidebar_frame,
+                                 text="+ New List",
+                                 font=('Segoe UI', 10),
+                                 bg=self.colors['dark_gray'],
+                                 fg=self.colors['white'],
+                                 border=0,
+                                 pady=4,
+                                 cursor='hand2',
+                                 command=self.new_list)
+        new_list_btn.pack(fill=tk.X, padx=15, pady=(5, 0))
+        self.refresh_lists()
+        
         # Sidebar title
         sidebar_title = tk.Label(sidebar_frame,
                                 text="Filters",
                                 font=('Segoe UI', 14, 'bold'),
                                 fg=self.colors['white'],
                                 bg=self.colors['sidebar'])
-        sidebar_title.pack(pady=(20, 15))
+        sidebar_title.pack(pady=(15, 10))
         
         # Filter buttons
         filters = [
             ("All Tasks", "all", self.colors['primary']),
             ("Pending", "pending", self.colors['warning']),
-            ("Completed", "completed", self.colors['success'])
+            ("Completed", "completed", self.colors['success']),
+            ("Next Up", "next", self.colors['danger']),
+            ("Archived", "archived", self.colors['dark_gray'])
         ]
         
         for text, filter_type, color in filters:
@@ -216,6 +325,36 @@ class ModernPyToDoGUI:
                            command=lambda f=filter_type: self.set_filter(f))
             btn.pack(fill=tk.X, padx=15, pady=5)
         
+        # Date range filter
+        self.date_choice = tk.StringVar(value=DATE_RANGES[0])
+        date_box = ttk.Combobox(sidebar_frame,
+                                textvariable=self.date_choice,
+                                values=DATE_RANGES,
+                                state="readonly",
+                                font=('Segoe UI', 10))
+        date_box.pack(fill=tk.X, padx=15, pady=(10, 5))
+        date_box.bind("<<ComboboxSelected>>", lambda e: self.set_date_filter(self.date_choice.get()))
+        
+        # Tag filter, "a,b c -d" meaning (a or b) and c and not d
+        tags_label = tk.Label(sidebar_frame,
+                             text="Tags (a,b c -d)",
+                             font=('Segoe UI', 9),
+                             fg=self.colors['white'],
+                             bg=self.colors['sidebar'],
+                             anchor=tk.W)
+        tags_label.pack(fill=tk.X, padx=15, pady=(10, 0))
+        self.tag_filter_var = tk.StringVar()
+        tag_entry = tk.Entry(sidebar_frame,
+                             textvariable=self.tag_filter_var,
+                             font=('Segoe UI', 10))
+        tag_entry.pack(fill=tk.X, padx=15, pady=(2, 5))
+        tag_entry.bind("<Return>", lambda e: self.set_tag_filter(self.tag_filter_var.get()))
+        
+        # Tag cloud, click a tag to filter by it
+        self.tag_cloud_frame = tk.Frame(sidebar_frame, bg=self.colors['sidebar'])
+        self.tag_cloud_frame.pack(fill=tk.X, padx=15)
+        self.shown_cloud = None
+        
         # Separator
         separator = tk.Frame(sidebar_frame, height=1, bg=self.colors['dark_gray'])
         separator.pack(fill=tk.X, padx=15, pady=20)
@@ -233,6 +372,9 @@ class ModernPyToDoGUI:
             ("🗂️ Export Tasks", self.export_tasks),
             ("📁 Import Tasks", self.import_tasks),
             ("🔄 Refresh", self.refresh_task_list),
+            ("🔍 Find Duplicates", self.show_duplicates),
+            ("📈 Analytics", self.show_analytics),
+            ("🧠 Memory", self.show_memory_panel),
             ("❌ Clear All", self.clear_all_tasks)
         ]
         
@@ -308,6 +450,44 @@ class ModernPyToDoGUI:
                              bg=self.colors['light_gray'])
         list_title.pack(side=tk.LEFT, padx=20, pady=15)
         
+        # Sort order
+        self.sort_choice = tk.StringVar(value=SORT_CHOICES[0][0])
+        sort_box = ttk.Combobox(list_header,
+                                textvariable=self.sort_choice,
+                                values=[label for label, _, _ in SORT_CHOICES],
+                                state="readonly",
+                                width=16,
+                                font=('Segoe UI', 10))
+        sort_box.pack(side=tk.LEFT, pady=12)
+        sort_box.bind("<<ComboboxSelected>>", lambda e: self.set_sort(self.sort_choice.get()))
+        
+        # Bulk actions on ticked tasks
+        bulk_actions = [
+            ("🗑️ Delete", self.colors['danger'], self.delete_selected),
+            ("✏️ Edit", self.colors['primary'], self.edit_selected),
+            ("✓ Complete", self.colors['success'], self.complete_selected),
+            ("Select All", self.colors['dark_gray'], self.toggle_select_all)
+        ]
+        
+        for text, color, command in bulk_actions:
+            btn = tk.Button(list_header,
+                           text=text,
+                           font=('Segoe UI', 9),
+                           bg=color,
+                           fg=self.colors['white'],
+                           border=0,
+                           padx=10,
+                           cursor='hand2',
+                           command=command)
+            btn.pack(side=tk.RIGHT, padx=(0, 10), pady=10)
+        
+        self.selection_label = tk.Label(list_header,
+                                        text="",
+                                        font=('Segoe UI', 10),
+                                        fg=self.colors['dark_gray'],
+                                        bg=self.colors['light_gray'])
+        self.selection_label.pack(side=tk.RIGHT, padx=(0, 10))
+        
         # Tasks container with scrollbar
         tasks_container = tk.Frame(list_frame, bg=self.colors['white'])
         tasks_container.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -357,21 +537,38 @@ class ModernPyToDoGUI:
                                bg=self.colors['light_gray'])
         credit_label.pack(side=tk.RIGHT, padx=20, pady=10)
     
-    def create_task_widget(self, task, index):
-        """Create a modern task widget"""
+    def create_task_widget(self, row, before=None):
+        """Create a modern task widget for a view model row, optionally placed before another"""
         task_frame = tk.Frame(self.scrollable_frame, 
                              bg=self.colors['white'], 
                              relief=tk.RAISED, 
                              bd=1)
-        task_frame.pack(fill=tk.X, pady=5)
+        if before is not None:
+            task_frame.pack(fill=tk.X, pady=5, before=before)
+        else:
+            task_frame.pack(fill=tk.X, pady=5)
+        self.task_widgets[row.id] = task_frame
+        # Rows outlive index shifts, so buttons look their task up by id
+        task_id = row.id
         
         # Task content
         content_frame = tk.Frame(task_frame, bg=self.colors['white'])
         content_frame.pack(fill=tk.X, padx=15, pady=12)
         
+        # Bulk selection checkbox
+        selected_var = tk.BooleanVar(value=task_id in self.selected_ids)
+        select_box = tk.Checkbutton(content_frame,
+                                    variable=selected_var,
+                                    bg=self.colors['white'],
+                                    activebackground=self.colors['white'],
+                                    cursor='hand2',
+                                    command=lambda: self.toggle_selected(task_id, selected_var.get()))
+        select_box.var = selected_var
+        select_box.pack(side=tk.LEFT, padx=(0, 10))
+        
         # Status indicator
-        status_color = self.colors['success'] if task['completed'] else self.colors['warning']
-        status_text = "✓" if task['completed'] else "○"
+        status_color = self.colors['success'] if row.completed else self.colors['warning']
+        status_text = "✓" if row.completed else "○"
         
         status_label = tk.Label(content_frame,
                                text=status_text,
@@ -385,17 +582,26 @@ class ModernPyToDoGUI:
         details_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
         task_label = tk.Label(details_frame,
-                             text=task['task'],
+                             text=row.text,
                              font=('Segoe UI', 12, 'normal'),
                              fg=self.colors['text'],
                              bg=self.colors['white'],
                              anchor=tk.W)
         task_label.pack(fill=tk.X)
         
+        details_text = f"Added: {row.added}"
+        if row.due:
+            details_text += f"  •  Due: {row.due}"
+        if row.priority:
+            details_text += f"  •  Priority: {row.priority}"
+        if row.tags:
+            details_text += f"  •  {row.tags}"
+        if row.subtasks:
+            details_text += f"  •  Subtasks: {row.subtasks} done"
         date_label = tk.Label(details_frame,
-                             text=f"Added: {task.get('added', 'Unknown')}",
+                             text=details_text,
                              font=('Segoe UI', 9),
-                             fg=self.colors['dark_gray'],
+                             fg=self.colors['danger'] if row.overdue else self.colors['dark_gray'],
                              bg=self.colors['white'],
                              anchor=tk.W)
         date_label.pack(fill=tk.X)
@@ -404,7 +610,7 @@ class ModernPyToDoGUI:
         actions_frame = tk.Frame(content_frame, bg=self.colors['white'])
         actions_frame.pack(side=tk.RIGHT)
         
-        if not task['completed']:
+        if not row.completed:
             complete_btn = tk.Button(actions_frame,
                                    text="✓",
                                    font=('Segoe UI', 12, 'bold'),
@@ -413,9 +619,42 @@ class ModernPyToDoGUI:
                                    border=0,
                                    width=3,
                                    cursor='hand2',
-                                   command=lambda: self.complete_task(index))
+                                   command=lambda: self.complete_task(self.store.index_of(task_id)))
             complete_btn.pack(side=tk.LEFT, padx=2)
         
+        due_btn = tk.Button(actions_frame,
+                           text="📅",
+                           font=('Segoe UI', 10),
+                           bg=self.colors['warning'],
+                           fg=self.colors['white'],
+                           border=0,
+                           width=3,
+                           cursor='hand2',
+                           command=lambda: self.set_due(self.store.index_of(task_id)))
+        due_btn.pack(side=tk.LEFT, padx=2)
+        
+        priority_btn = tk.Button(actions_frame,
+                                text="⚑",
+                                font=('Segoe UI', 10),
+                                bg=self.colors['dark_gray'],
+                                fg=self.colors['white'],
+                                border=0,
+                                width=3,
+                                cursor='hand2',
+                                command=lambda: self.set_priority(self.store.index_of(task_id)))
+        priority_btn.pack(side=tk.LEFT, padx=2)
+        
+        tags_btn = tk.Button(actions_frame,
+                            text="🏷",
+                            font=('Segoe UI', 10),
+                            bg=self.colors['sidebar'],
+                            fg=self.colors['white'],
+                            border=0,
+                            width=3,
+                            cursor='hand2',
+                            command=lambda: self.edit_tags(self.store.index_of(task_id)))
+        tags_btn.pack(side=tk.LEFT, padx=2)
+        
         edit_btn = tk.Button(actions_frame,
                             text="✏️",
                             font=('Segoe UI', 10),
@@ -424,7 +663,7 @@ class ModernPyToDoGUI:
                             border=0,
                             width=3,
                             cursor='hand2',
-                            command=lambda: self.edit_task(index))
+                            command=lambda: self.edit_task(self.store.index_of(task_id)))
         edit_btn.pack(side=tk.LEFT, padx=2)
         
         delete_btn = tk.Button(actions_frame,
@@ -435,7 +674,7 @@ class ModernPyToDoGUI:
                               border=0,
                               width=3,
                               cursor='hand2',
-                              command=lambda: self.delete_task(index))
+                              command=lambda: self.delete_task(self.store.index_of(task_id)))
         delete_btn.pack(side=tk.LEFT, padx=2)
     
     def add_task(self):
@@ -445,24 +684,21 @@ class ModernPyToDoGUI:
             messagebox.showwarning("Warning", "Please enter a task!")
             return
         
-        new_task = {
-            "task": task_text,
-            "completed": False,
-            "added": datetime.now().strftime("%Y-%m-%d %H:%M")
-        }
+        same = self.store.duplicates_of(task_text)
+        if same and not messagebox.askyesno("Duplicate Task",
+                                            f"'{self.tasks[same[0]]['task']}' is already in the list.\n\nAdd it anyway?"):
+            return
         
-        self.tasks.append(new_task)
+        self.store.add(task_text)
         self.save_tasks()
         self.task_entry.delete(0, tk.END)
-        self.refresh_task_list()
         self.update_status(f"Added task: '{task_text}'")
     
     def complete_task(self, index):
         """Mark task as completed"""
         if index < len(self.tasks):
-            self.tasks[index]["completed"] = True
+            self.store.complete(index)
             self.save_tasks()
-            self.refresh_task_list()
             self.update_status(f"Completed task: '{self.tasks[index]['task']}'")
     
     def edit_task(self, index):
@@ -471,47 +707,277 @@ class ModernPyToDoGUI:
             current_task = self.tasks[index]["task"]
             new_text = simpledialog.askstring("Edit Task", "Enter new task text:", initialvalue=current_task)
             if new_text and new_text.strip():
-                self.tasks[index]["task"] = new_text.strip()
+                self.store.update(index, task=new_text.strip())
                 self.save_tasks()
-                self.refresh_task_list()
                 self.update_status(f"Updated task to: '{new_text.strip()}'")
     
+    def set_due(self, index):
+        """Set or clear a task's due date"""
+        if index < len(self.tasks):
+            current = self.tasks[index].get("due_at")
+            text = simpledialog.askstring("Set Due", "Due date (YYYY-MM-DD HH:MM), leave empty to clear:",
+                                          initialvalue=format_epoch(current) if current is not None else "")
+            if text is None:
+                return
+            try:
+                due_at = parse_due(text) if text.strip() else None
+            except ValueError:
+                messagebox.showerror("Error", "Dates must look like YYYY-MM-DD or YYYY-MM-DD HH:MM")
+                return
+            self.store.update(index, due_at=due_at, remind_at=None)
+            self.save_tasks()
+            self.update_status(f"Due {format_epoch(due_at)}" if due_at is not None else "Due date cleared")
+    
+    def set_priority(self, index):
+        """Set a task's priority"""
+        if index < len(self.tasks):
+            current = PRIORITIES[priority_of(self.tasks[index])]
+            text = simpledialog.askstring("Priority", f"Priority ({', '.join(PRIORITIES)}):", initialvalue=current)
+            if text is None:
+                return
+            try:
+                priority = parse_priority(text)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            self.store.update(index, priority=priority)
+            self.save_tasks()
+            self.update_status(f"Priority set to {PRIORITIES[priority]}")
+    
+    def edit_tags(self, index):
+        """Replace a task's tags"""
+        if index < len(self.tasks):
+            current = " ".join(self.tasks[index].get("tags", ()))
+            text = simpledialog.askstring("Tags", "Tags, separated by spaces or commas:", initialvalue=current)
+            if text is None:
+                return
+            tags = parse_tags(text)
+            self.store.update(index, tags=tags)
+            self.save_tasks()
+            self.update_status(f"Tags: {' '.join(tags)}" if tags else "Tags cleared")
+    
+    def watch_reminders(self):
+        """Fire reminders of the open list from a single Tk timer"""
+        return ReminderScheduler(self.store, self.on_reminders, self.root.after, self.root.after_cancel)
+    
+    def on_reminders(self, tasks):
+        """Show reminders that came due in the status bar, saving that they fired"""
+        self.root.bell()
+        self.save_tasks()
+        self.update_status(reminder_text(tasks))
+    
     def delete_task(self, index):
         """Delete a task"""
         if index < len(self.tasks):
             task_text = self.tasks[index]["task"]
-            if messagebox.askyesno("Confirm", f"Delete task: '{task_text}'?"):
-                self.tasks.pop(index)
+            # Subtasks go with their task
+            doomed = self.store.subtree(index)
+            extra = f" and {len(doomed) - 1} subtask(s)" if len(doomed) > 1 else ""
+            if messagebox.askyesno("Confirm", f"Delete task: '{task_text}'{extra}?"):
+                self.store.remove_many(doomed)
                 self.save_tasks()
-                self.refresh_task_list()
                 self.update_status(f"Deleted task: '{task_text}'")
     
+    def refresh_lists(self):
+        """Show list names and counts in the switcher"""
+        names = self.catalog.names()
+        self.list_box.delete(0, tk.END)
+        for name in names:
+            count = self.catalog.count(name)
+            self.list_box.insert(tk.END, name if count is None else f"{name} ({count})")
+        self.list_box.selection_set(names.index(self.list_name))
+    
+    def on_list_selected(self):
+        """Switch to the list picked in the switcher"""
+        selection = self.list_box.curselection()
+        if selection:
+            self.switch_list(self.catalog.names()[selection[0]])
+    
+    def new_list(self):
+        """Create a list and switch to it"""
+        name = simpledialog.askstring("New List", "Enter list name:")
+        if not name or not name.strip():
+            return
+        try:
+            self.catalog.create(name)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Error", f"Failed to create list: {e}")
+            return
+        self.switch_list(name.strip())
+    
+    def switch_list(self, name):
+        """Open another list, loading its file the first time"""
+        if name == self.list_name:
+            return
+        # Changes of the old list must not reach the new one's rows
+        self.unsubscribe()
+        self.batcher.discard()
+        self.list_name = name
+        self.storage_file = self.catalog.path_of(name)
+        self.store = self.catalog.open(name)
+        self.store.archive_completed()
+        self.view.store = self.store
+        self.unsubscribe = self.store.changes.subscribe(self.batcher)
+        self.reminders.close()
+        self.reminders = self.watch_reminders()
+        self.selected_ids.clear()
+        self.refresh_task_list()
+        self.redraw.mark("lists")
+        self.update_status(f"Switched to list: '{name}'")
+    
+    def toggle_selected(self, task_id, selected):
+        """Tick or untick a task for bulk actions"""
+        if selected:
+            self.selected_ids.add(task_id)
+        else:
+            self.selected_ids.discard(task_id)
+        self.redraw.mark("selection")
+    
+    def toggle_select_all(self):
+        """Tick every visible task, or untick all if they already are"""
+        visible = set(self.view.ids())
+        if visible and visible <= self.selected_ids:
+            self.selected_ids -= visible
+        else:
+            self.selected_ids |= visible
+        self.refresh_task_list()
+    
+    def update_selection_label(self):
+        """Show how many tasks are ticked"""
+        count = len(self.selected_ids)
+        self.selection_label.config(text=f"{count} selected" if count else "")
+    
+    def selected_indexes(self):
+        """Indexes of ticked tasks, dropping ids that no longer exist"""
+        indexes = [i for i, task in enumerate(self.tasks) if task['id'] in self.selected_ids]
+        self.selected_ids = {self.tasks[i]['id'] for i in indexes}
+        if not indexes:
+            messagebox.showwarning("Warning", "Please tick at least one task!")
+        return indexes
+    
+    def complete_selected(self):
+        """Mark every ticked task as completed in one step"""
+        indexes = self.selected_indexes()
+        if indexes:
+            self.store.complete_many(indexes)
+            self.save_tasks()
+            self.selected_ids.clear()
+            self.redraw.mark("selection")
+            self.update_status(f"Completed {len(indexes)} tasks")
+    
+    def edit_selected(self):
+        """Give every ticked task the same new text in one step"""
+        indexes = self.selected_indexes()
+        if indexes:
+            new_text = simpledialog.askstring("Edit Tasks", f"Enter new text for {len(indexes)} tasks:",
+                                              initialvalue=self.tasks[indexes[0]]["task"])
+            if new_text and new_text.strip():
+                self.store.update_many(indexes, task=new_text.strip())
+                self.save_tasks()
+                self.update_status(f"Updated {len(indexes)} tasks")
+    
+    def delete_selected(self):
+        """Delete every ticked task in one step"""
+        indexes = self.selected_indexes()
+        doomed = set()
+        for index in indexes:
+            doomed.update(self.store.subtree(index))
+        if indexes and messagebox.askyesno("Confirm", f"Delete {len(indexes)} tasks and their subtasks?"
+                                           if len(doomed) > len(indexes) else f"Delete {len(indexes)} tasks?"):
+            self.store.remove_many(doomed)
+            self.save_tasks()
+            self.selected_ids.clear()
+            self.redraw.mark("selection")
+            self.update_status(f"Deleted {len(indexes)} tasks")
+    
+    def set_date_filter(self, name):
+        """Limit the list to tasks added or completed in a date range"""
+        if name.endswith("between..."):
+            first_day = simpledialog.askstring("Date Range", "From (YYYY-MM-DD):")
+            last_day = first_day and simpledialog.askstring("Date Range", "To (YYYY-MM-DD):", initialvalue=first_day)
+            if not last_day:
+                self.date_choice.set(DATE_RANGES[0])
+                self.view.date_filter = None
+            else:
+                try:
+                    self.view.date_filter = custom_range(name, first_day.strip(), last_day.strip())
+                except ValueError:
+                    messagebox.showwarning("Warning", "Please enter dates as YYYY-MM-DD!")
+                    return
+        else:
+            self.view.date_filter = date_range(name)
+        self.refresh_task_list()
+        self.update_status(f"Showing: {self.date_choice.get().lower()}")
+    
+    def set_sort(self, label):
+        """Sort the list by one of SORT_CHOICES"""
+        self.view.sort, self.view.reverse = next((name, reverse) for choice, name, reverse in SORT_CHOICES if choice == label)
+        self.refresh_task_list()
+    
     def set_filter(self, filter_type):
         """Set the current filter"""
         self.current_filter = filter_type
+        if filter_type != "archived":
+            self.view.status = filter_type
         self.refresh_task_list()
         self.update_status(f"Showing: {filter_type} tasks")
     
+    def set_tag_filter(self, text):
+        """Limit the list to tasks passing a tag filter, empty for any tags"""
+        self.view.tags = TagFilter(text) or None
+        self.refresh_task_list()
+        self.update_status(f"Tags: {self.view.tags}" if self.view.tags else "Showing: any tags")
+    
+    def add_tag_to_filter(self, tag):
+        """Narrow the tag filter to tasks that also have tag"""
+        words = self.tag_filter_var.get().split()
+        if tag not in words:
+            words.append(tag)
+        self.tag_filter_var.set(" ".join(words))
+        self.set_tag_filter(self.tag_filter_var.get())
+    
+    def update_tag_cloud(self):
+        """Show the most used tags of the list, sized by use"""
+        cloud = self.store.tag_cloud()
+        if cloud == self.shown_cloud:
+            return
+        self.shown_cloud = cloud
+        for widget in self.tag_cloud_frame.winfo_children():
+            widget.destroy()
+        most = cloud[0][1] if cloud else 1
+        for number, (tag, count) in enumerate(cloud):
+            label = tk.Label(self.tag_cloud_frame,
+                            text=f"#{tag} {count}",
+                            font=('Segoe UI', 8 + round(4 * count / most)),
+                            fg=self.colors['white'],
+                            bg=self.colors['sidebar'],
+                            cursor='hand2')
+            label.grid(row=number // 2, column=number % 2, sticky=tk.W, padx=(0, 6))
+            label.bind("<Button-1>", lambda e, t=tag: self.add_tag_to_filter(t))
+    
     def refresh_task_list(self):
-        """Refresh the task list with current filter"""
+        """Refresh the task list with current filter on the next idle cycle"""
+        self.redraw.mark("rows", "stats", "tags", "selection")
+    
+    def redraw_rows(self):
+        """Rebuild every row, a frame's worth of rows at a time"""
         # Clear existing widgets
         for widget in self.scrollable_frame.winfo_children():
             widget.destroy()
+        self.task_widgets = {}
         
-        # Filter tasks
-        filtered_tasks = []
-        if self.current_filter == "all":
-            filtered_tasks = [(task, i) for i, task in enumerate(self.tasks)]
-        elif self.current_filter == "pending":
-            filtered_tasks = [(task, i) for i, task in enumerate(self.tasks) if not task['completed']]
-        elif self.current_filter == "completed":
-            filtered_tasks = [(task, i) for i, task in enumerate(self.tasks) if task['completed']]
-        
-        # Create task widgets
-        if filtered_tasks:
-            for task, original_index in filtered_tasks:
-                self.create_task_widget(task, original_index)
+        # Archived tasks are only read from disk when this view is opened
+        if self.current_filter == "archived":
+            self.redraw.cancel("rows")
+            self.show_archived()
+            return
+        
+        # Rows come from the view model, widgets are made a frame's worth at a time
+        rows = self.view.rows()
+        if rows:
+            self.redraw.in_slices("rows", rows, self.create_task_widget)
         else:
+            self.redraw.cancel("rows")
             # Show empty state
             empty_label = tk.Label(self.scrollable_frame,
                                   text=f"No {self.current_filter} tasks found",
@@ -519,40 +985,303 @@ class ModernPyToDoGUI:
                                   fg=self.colors['dark_gray'],
                                   bg=self.colors['white'])
             empty_label.pack(pady=50)
+    
+    def on_changes(self, changes):
+        """Apply a batch of store changes to just the affected rows"""
+        # The archived view and a list still being built are redrawn
+        if self.current_filter == "archived" or self.redraw.is_dirty("rows") or self.redraw.busy("rows"):
+            self.refresh_task_list()
+            return
+        
+        for diff in self.view.diff(changes):
+            if diff.kind == RESET:
+                self.refresh_task_list()
+                return
+            if diff.kind == REMOVED:
+                self.drop_task_widget(diff.id)
+            elif diff.kind == UPDATED:
+                # Same place, new content
+                old = self.task_widgets[diff.id]
+                self.create_task_widget(diff.row, before=old)
+                old.destroy()
+            else:
+                self.create_task_widget(diff.row, before=self.task_widgets.get(diff.before))
+        
+        # The last row went away, or the first one arrived next to the
+        # empty-state message: let a redraw swap them
+        if not self.task_widgets or len(self.scrollable_frame.winfo_children()) > len(self.task_widgets):
+            self.refresh_task_list()
+            return
+        self.redraw.mark("stats", "tags", "selection")
+    
+    def drop_task_widget(self, task_id):
+        """Remove a task's row if it is on screen"""
+        widget = self.task_widgets.pop(task_id, None)
+        if widget is not None:
+            widget.destroy()
+    
+    def memory_report(self):
+        """Memory report for the open list and this window"""
+        return memory.report(self.tasks, self.root)
+    
+    def show_memory_panel(self):
+        """Debug panel with a memory report and sampling to a file"""
+        window = tk.Toplevel(self.root)
+        window.title("Memory")
+        window.geometry("720x480")
+        window.configure(bg=self.colors['bg'])
+        
+        text = tk.Text(window, font=('Consolas', 10), wrap=tk.NONE, bg=self.colors['white'], border=0)
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 0))
+        
+        def refresh():
+            text.config(state=tk.NORMAL)
+            text.delete("1.0", tk.END)
+            text.insert(tk.END, memory.format_report(self.memory_report()))
+            text.config(state=tk.DISABLED)
+        
+        def start_tracing():
+            memory.start()
+            refresh()
+        
+        def toggle_sampling():
+            if self.memory_sampler is not None:
+                self.memory_sampler.stop()
+                self.memory_sampler = None
+                sample_btn.config(text="Sample to File...")
+                self.update_status("Memory sampling stopped")
+                return
+            from tkinter import filedialog
+            filename = filedialog.asksaveasfilename(
+                parent=window,
+                title="Append Memory Samples To",
+                defaultextension=".ndjson",
+                filetypes=[("JSON lines", "*.ndjson"), ("All files", "*.*")]
+            )
+            if not filename:
+                return
+            self.memory_sampler = memory.MemorySampler(filename, self.memory_report,
+                                                       after=self.root.after, after_cancel=self.root.after_cancel)
+            self.memory_sampler.start()
+            sample_btn.config(text="Stop Sampling")
+            self.update_status(f"Sampling memory every {memory.SAMPLE_INTERVAL}s to: {filename}")
+        
+        buttons = tk.Frame(window, bg=self.colors['bg'])
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        for label, command in (("Refresh", refresh), ("Start Tracing", start_tracing)):
+            tk.Button(buttons, text=label, font=('Segoe UI', 10), bg=self.colors['primary'],
+                      fg=self.colors['white'], border=0, padx=12, pady=4, cursor='hand2',
+                      command=command).pack(side=tk.LEFT, padx=(0, 5))
+        sample_btn = tk.Button(buttons,
+                               text="Stop Sampling" if self.memory_sampler else "Sample to File...",
+                               font=('Segoe UI', 10), bg=self.colors['dark_gray'], fg=self.colors['white'],
+                               border=0, padx=12, pady=4, cursor='hand2', command=toggle_sampling)
+        sample_btn.pack(side=tk.LEFT)
+        refresh()
+    
+    def show_duplicates(self):
+        """Groups of tasks that say the same thing, with the extra copies removable"""
+        window = tk.Toplevel(self.root)
+        window.title("Duplicates")
+        window.geometry("720x480")
+        window.configure(bg=self.colors['bg'])
+        
+        tree = ttk.Treeview(window, columns=("Task",), show="tree headings")
+        tree.heading("#0", text="Group")
+        tree.heading("Task", text="Task")
+        tree.column("#0", width=120, stretch=False)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 0))
+        near = tk.BooleanVar(value=False)
+        groups = []
+        
+        def refresh():
+            tree.delete(*tree.get_children())
+            groups[:] = self.store.duplicate_groups(near.get())
+            for number, group in enumerate(groups, 1):
+                parent = tree.insert("", tk.END, text=f"{number} ({len(group)})",
+                                     values=(self.tasks[group[0]]["task"],), open=True)
+                for position in group:
+                    tree.insert(parent, tk.END, text=f"#{position + 1}", values=(self.tasks[position]["task"],))
+            count_label.config(text=f"{len(groups)} groups, {sum(len(group) - 1 for group in groups)} extra copies")
+        
+        def remove_extra():
+            refresh()  # positions may have moved since the groups were shown
+            extra = [position for group in groups for position in group[1:]]
+            if extra and messagebox.askyesno("Confirm", f"Delete {len(extra)} extra copies, keeping the first of each group?",
+                                             parent=window):
+                self.store.remove_many(extra)
+                self.save_tasks()
+                self.update_status(f"Deleted {len(extra)} duplicates")
+                refresh()
+        
+        buttons = tk.Frame(window, bg=self.colors['bg'])
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        for label, command in (("Refresh", refresh), ("Remove Extra Copies", remove_extra)):
+            tk.Button(buttons, text=label, font=('Segoe UI', 10), bg=self.colors['primary'],
+                      fg=self.colors['white'], border=0, padx=12, pady=4, cursor='hand2',
+                      command=command).pack(side=tk.LEFT, padx=(0, 5))
+        tk.Checkbutton(buttons, text="Include near duplicates", variable=near, bg=self.colors['bg'],
+                       command=refresh).pack(side=tk.LEFT, padx=(5, 0))
+        count_label = tk.Label(buttons, font=('Segoe UI', 10), fg=self.colors['text'], bg=self.colors['bg'])
+        count_label.pack(side=tk.RIGHT)
+        refresh()
+    
+    def show_analytics(self):
+        """Throughput, lead time and backlog trend, with a chart of daily completions"""
+        window = tk.Toplevel(self.root)
+        window.title("Analytics")
+        window.geometry("760x640")
+        window.configure(bg=self.colors['bg'])
+        
+        chart = tk.Canvas(window, height=180, bg=self.colors['white'], highlightthickness=0)
+        chart.pack(fill=tk.X, padx=10, pady=(10, 0))
+        text = tk.Text(window, font=('Consolas', 10), wrap=tk.NONE, bg=self.colors['white'], border=0)
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 0))
+        shown = []
+        
+        def draw_chart():
+            """Bars of tasks completed per day, with the backlog as a line over them"""
+            chart.delete("all")
+            if not shown:
+                return
+            days = shown[0].days
+            width, height = max(chart.winfo_width(), 200), int(chart.cget("height"))
+            top, bottom, step = 20, height - 20, width / len(days)
+            most_done = max(day.completed for day in days) or 1
+            most_open = max(day.backlog for day in days) or 1
+            points = []
+            for number, day in enumerate(days):
+                x = number * step
+                bar = (bottom - top) * day.completed / most_done
+                chart.create_rectangle(x + 2, bottom - bar, x + step - 2, bottom,
+                                       fill=self.colors['success'], outline="")
+                points += [x + step / 2, bottom - (bottom - top) * day.backlog / most_open]
+                if number % 7 == len(days) % 7:
+                    chart.create_text(x + step / 2, height - 8, text=f"{date_of(day.start):%m-%d}",
+                                      font=('Segoe UI', 8), fill=self.colors['dark_gray'])
+            if len(points) >= 4:
+                chart.create_line(*points, fill=self.colors['warning'], width=2)
+            chart.create_text(8, 10, anchor=tk.W, font=('Segoe UI', 9), fill=self.colors['text'],
+                              text=f"Done per day (peak {most_done})  •  backlog line (peak {most_open})")
+        
+        def refresh():
+            shown[:] = [self.store.report(days=CHART_DAYS)]
+            report = shown[0]
+            text.config(state=tk.NORMAL)
+            text.delete("1.0", tk.END)
+            text.insert(tk.END, format_report(report))
+            text.config(state=tk.DISABLED)
+            draw_chart()
+            week = report.windows[0]
+            self.update_status(f"Last 7 days: {week.completed} done, "
+                               f"lead time avg {format_duration(week.lead_mean)}, backlog {report.backlog}")
+        
+        chart.bind("<Configure>", lambda e: draw_chart())
+        buttons = tk.Frame(window, bg=self.colors['bg'])
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        tk.Button(buttons, text="Refresh", font=('Segoe UI', 10), bg=self.colors['primary'],
+                  fg=self.colors['white'], border=0, padx=12, pady=4, cursor='hand2',
+                  command=refresh).pack(side=tk.LEFT)
+        refresh()
+    
+    def show_archived(self):
+        """Show the most recently archived tasks with restore buttons"""
+        archived = self.store.archive.page(0, ARCHIVE_PAGE)
+        if not archived:
+            empty_label = tk.Label(self.scrollable_frame,
+                                  text="No archived tasks found",
+                                  font=('Segoe UI', 14),
+                                  fg=self.colors['dark_gray'],
+                                  bg=self.colors['white'])
+            empty_label.pack(pady=50)
+            return
         
-        # Update statistics
-        self.update_statistics()
+        for task in archived:
+            task_frame = tk.Frame(self.scrollable_frame,
+                                 bg=self.colors['white'],
+                                 relief=tk.RAISED,
+                                 bd=1)
+            task_frame.pack(fill=tk.X, pady=5)
+            
+            content_frame = tk.Frame(task_frame, bg=self.colors['white'])
+            content_frame.pack(fill=tk.X, padx=15, pady=12)
+            
+            completed = format_epoch(task.get('completed_at'), "%Y-%m-%d")
+            task_label = tk.Label(content_frame,
+                                 text=f"{task['task']}  •  Completed: {completed}",
+                                 font=('Segoe UI', 11),
+                                 fg=self.colors['dark_gray'],
+                                 bg=self.colors['white'],
+                                 anchor=tk.W)
+            task_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+            
+            restore_btn = tk.Button(content_frame,
+                                   text="↩ Restore",
+                                   font=('Segoe UI', 9),
+                                   bg=self.colors['primary'],
+                                   fg=self.colors['white'],
+                                   border=0,
+                                   padx=10,
+                                   cursor='hand2',
+                                   command=lambda task_id=task['id']: self.restore_task(task_id))
+            restore_btn.pack(side=tk.RIGHT)
+    
+    def restore_task(self, task_id):
+        """Move an archived task back to the task list"""
+        try:
+            restored = self.store.restore([task_id])
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to restore task: {e}")
+            return
+        if restored:
+            self.update_status(f"Restored task: '{restored[0]['task']}'")
     
     def update_statistics(self):
         """Update the statistics in header"""
-        total = len(self.tasks)
-        completed = sum(1 for task in self.tasks if task['completed'])
-        pending = total - completed
+        total, completed, pending = self.view.stats()
         
         self.total_label.config(text=f"{total} Total")
         self.completed_label.config(text=f"{completed} Done")
         self.pending_label.config(text=f"{pending} Pending")
+        # Read from the store's per-day counters, not the tasks
+        self.week_label.config(text=f"📈 {self.store.completed_in(7)} done in 7 days")
     
     def update_status(self, message):
-        """Update status message"""
-        self.status_var.set(message)
-        # Auto-clear status after 3 seconds
-        self.root.after(3000, lambda: self.status_var.set("Ready"))
+        """Update status message on the next idle cycle"""
+        self.status_message = message
+        self.redraw.mark("status")
+    
+    def show_status(self):
+        """Show the latest status message"""
+        self.status_var.set(self.status_message)
+        # Auto-clear status after 3 seconds, restarting the wait each time
+        self.redraw.later("status", 3000, lambda: self.status_var.set("Ready"))
     
     def export_tasks(self):
-        """Export tasks to file"""
+        """Export the tasks shown to JSON, CSV, NDJSON or a Markdown checklist"""
         from tkinter import filedialog
         filename = filedialog.asksaveasfilename(
             title="Export Tasks",
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            filetypes=FILETYPES
         )
         if filename:
             try:
-                import shutil
-                shutil.copy2(self.storage_file, filename)
-                self.update_status(f"Tasks exported to: {filename}")
-                messagebox.showinfo("Success", "Tasks exported successfully!")
+                query = query_for(self.view.status, self.view.date_filter)
+                if self.view.status == "next" or self.view.tags:
+                    # Rankings and tag filters come from the store's indexes, export as shown
+                    count = export_tasks((self.tasks[position] for position in self.view.positions()), filename)
+                elif format_for(filename) == "json" and not query:
+                    # The whole list as JSON is a backup, keep deletions with it
+                    import shutil
+                    shutil.copy2(self.storage_file, filename)
+                    if os.path.exists(tombstones_path(self.storage_file)):
+                        shutil.copy2(tombstones_path(self.storage_file), tombstones_path(filename))
+                    count = len(self.store)
+                else:
+                    count = export_tasks(self.store.tasks, filename, query=query)
+                self.update_status(f"Exported {count} tasks to: {filename}")
+                messagebox.showinfo("Success", f"{count} tasks exported successfully!")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to export tasks: {e}")
     
@@ -568,21 +1297,49 @@ class ModernPyToDoGUI:
                 with open(filename, 'r') as f:
                     imported_tasks = json.load(f)
                 
-                if messagebox.askyesno("Confirm", f"Import {len(imported_tasks)} tasks? This will replace current tasks."):
-                    self.tasks = imported_tasks
+                mode = messagebox.askyesnocancel(
+                    "Import Mode",
+                    f"Import {len(imported_tasks)} tasks.\n\n"
+                    "Yes: merge them with your current tasks, skipping duplicates\n"
+                    "No: replace your current tasks")
+                if mode is None:
+                    return
+                if mode:
+                    new, skipped = split_duplicates(self.tasks, imported_tasks)
+                    self.store.merge(new, load_tombstones(filename))
+                    self.save_tasks()
+                    self.update_status(f"Merged tasks: {len(self.tasks)} total, {len(skipped)} duplicates skipped")
+                elif messagebox.askyesno("Confirm", f"Import {len(imported_tasks)} tasks? This will replace current tasks."):
+                    self.store.replace(imported_tasks)
                     self.save_tasks()
-                    self.refresh_task_list()
                     self.update_status("Tasks imported successfully!")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to import tasks: {e}")
     
     def clear_all_tasks(self):
         """Clear all tasks"""
-        if self.tasks and messagebox.askyesno("Confirm", "Delete all tasks? This cannot be undone."):
-            self.tasks = []
+        if self.tasks and messagebox.askyesno("Confirm", "Delete all tasks? Press Ctrl+Z to undo."):
+            self.store.clear()
             self.save_tasks()
-            self.refresh_task_list()
             self.update_status("All tasks cleared")
+    
+    def undo(self):
+        """Undo the last change"""
+        label = self.store.undo()
+        if label is None:
+            self.update_status("Nothing to undo")
+            return
+        self.save_tasks()
+        self.update_status(f"Undone: {label}")
+    
+    def redo(self):
+        """Redo the last undone change"""
+        label = self.store.redo()
+        if label is None:
+            self.update_status("Nothing to redo")
+            return
+        self.save_tasks()
+        self.update_status(f"Redone: {label}")
 
 def main():
     """Main function to run the modern GUI"""
@@ -603,10 +1360,16 @@ def main():
     y = (root.winfo_screenheight() - root.winfo_height()) // 2
     root.geometry(f"+{x}+{y}")
     
+    # Startup benchmarks time the launch up to the first idle frame
+    if os.environ.get("PYTODO_EXIT_AFTER_START"):
+        root.after_idle(root.quit)
+    
     try:
         root.mainloop()
     except KeyboardInterrupt:
         print("\nGUI closed by user")
 
 if __name__ == "__main__":
+    # Frozen builds start pool workers by running the program again
+    multiprocessing.freeze_support()
     main()
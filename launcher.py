@@ -5,6 +5,7 @@ Originally created by CosmicLM | Enhanced by mdnoyon9758
 
 import sys
 import os
+import multiprocessing
 import subprocess
 
 def show_menu():
@@ -18,6 +19,7 @@ def show_menu():
     print("3. ☁️  Cloud Sync Interface")
     print("4. 💻 CLI Interface")
     print("5. 🔨 Build Executable")
+    print("6. 📟 Terminal UI")
     print("0. ❌ Exit")
     print("=" * 50)
 
@@ -43,6 +45,11 @@ def launch_interface(choice):
         elif choice == "5":
             print("🔨 Running build script...")
             subprocess.run([sys.executable, "build.py"])
+        elif choice == "6":
+            print("📟 Launching Terminal UI...")
+            import main
+            sys.argv = [sys.argv[0], "tui"]
+            main.main()
         elif choice == "0":
             print("👋 Goodbye!")
             sys.exit(0)
@@ -61,7 +68,7 @@ def main():
     """Main launcher function"""
     while True:
         show_menu()
-        choice = input("Enter your choice (0-5): ").strip()
+        choice = input("Enter your choice (0-6): ").strip()
         
         if choice == "0":
             break
@@ -75,4 +82,6 @@ def main():
         print()  # Add spacing
 
 if __name__ == "__main__":
+    # Frozen builds start pool workers by running the program again
+    multiprocessing.freeze_support()
     main()
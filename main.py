@@ -6,6 +6,7 @@ Main entry point for the application
 
 import sys
 import os
+import multiprocessing
 from pathlib import Path
 
 # Determine the base path for resources
@@ -37,9 +38,12 @@ def main():
         spec = importlib.util.spec_from_file_location("main_cli", main_cli_path)
         main_cli = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(main_cli)
+        main_cli.main()
         
     finally:
         os.chdir(original_cwd)
 
 if __name__ == "__main__":
+    # Frozen builds start pool workers by running the program again
+    multiprocessing.freeze_support()
     main()
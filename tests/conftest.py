@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The pytodo package lives in backend/, as main-cli.py and the GUIs see it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from pytodo.store import TaskStore  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    """An empty task store saving into a temporary directory"""
+    return TaskStore(str(tmp_path / "storage.json"))
@@ -0,0 +1,111 @@
+"""Daily buckets and completion reports, checked against a scan of the tasks"""
+
+import random
+import time
+
+import pytest
+
+from pytodo.analytics import (DailyBuckets, CompletionStats, LEAD_BINS, completion_report, day_of,
+                              format_duration, format_report, lead_bin)
+
+NOW = int(time.time())
+TODAY = day_of(NOW)
+
+
+def _task(rng, n):
+    created = NOW - rng.randrange(120 * 86400) + rng.random()
+    task = {"id": f"t{n}", "completed": False, "created_at": rng.choice((created, int(created), None))}
+    if rng.random() < 0.6:
+        task["completed"] = True
+        task["completed_at"] = min(NOW, int(created) + rng.randrange(20 * 86400))
+    return task
+
+
+def _brute(tasks, days):
+    """(added, completed, backlog) of each day, and completions and lead times of the last 30 days"""
+    def added_on(task):
+        when = task.get("created_at")
+        if when is None and task["completed"]:
+            when = task["completed_at"]
+        return None if when is None else day_of(when)
+
+    def done_on(task):
+        return day_of(task["completed_at"]) if task["completed"] else None
+
+    rows = {}
+    for day in range(TODAY - days + 1, TODAY + 1):
+        added = sum(1 for task in tasks if added_on(task) == day)
+        done = sum(1 for task in tasks if done_on(task) == day)
+        backlog = sum(1 for task in tasks if added_on(task) is not None and added_on(task) <= day) - \
+            sum(1 for task in tasks if done_on(task) is not None and done_on(task) <= day)
+        rows[day] = (added, done, backlog)
+    recent = [task for task in tasks if task["completed"] and done_on(task) > TODAY - 30]
+    leads = [max(0, int(task["completed_at"] - task["created_at"])) for task in recent
+             if task.get("created_at") is not None]
+    return rows, len(recent), (sum(leads) / len(leads) if leads else None)
+
+
+@pytest.mark.parametrize("seed", range(15))
+def test_report_matches_a_scan(seed):
+    rng = random.Random(seed)
+    tasks = [_task(rng, n) for n in range(300)]
+    stats = CompletionStats(tasks[:100])
+    archived = DailyBuckets()
+    for task in tasks[100:200]:
+        stats.add(task)
+    for task in tasks[200:]:
+        archived.count(task)
+    for task in rng.sample(tasks[:200], 40):
+        stats.discard(task)
+        task.update(_task(rng, 0), id=task["id"])
+        stats.add(task)
+    report = completion_report([stats, DailyBuckets.from_json(archived.to_json())], TODAY, days=20, weeks=3)
+    rows, done, lead_mean = _brute(tasks, 20)
+    for period in report.days:
+        assert rows[period.start] == (period.added, period.completed, period.backlog)
+    # Pending tasks with no creation time are in no day's counts
+    assert report.backlog == rows[TODAY][2] == sum(1 for task in tasks if not task["completed"]
+                                                   and task["created_at"] is not None)
+    assert report.weeks[-1].backlog == report.backlog
+    month = report.windows[1]
+    assert month.days == 30 and month.completed == done
+    assert (month.lead_mean is None) == (lead_mean is None)
+    if lead_mean is not None:
+        assert month.lead_mean == pytest.approx(lead_mean)
+    assert "Backlog now" in format_report(report)
+
+
+def test_completed_without_creation_time_keeps_backlog_at_zero():
+    buckets = DailyBuckets()
+    buckets.count({"completed": True, "completed_at": NOW})
+    report = completion_report([buckets], TODAY, days=1, weeks=1)
+    assert (report.days[0].added, report.days[0].completed, report.backlog) == (1, 1, 0)
+    assert report.windows[0].lead_mean is None
+
+
+def test_float_epochs():
+    buckets = DailyBuckets()
+    buckets.count({"created_at": NOW - 90.5, "completed": True, "completed_at": NOW + 0.25})
+    assert buckets.total("completed") == 1
+    assert buckets.total("lead_total") == 90
+
+
+def test_lead_bins_and_durations():
+    assert [lead_bin(seconds) for seconds in (-5, 0, 59, 60, 119, 120)] == [0, 0, 0, 1, 1, 2]
+    assert lead_bin(10 ** 12) == LEAD_BINS - 1
+    assert [format_duration(seconds) for seconds in (None, 59, 3700, 90000)] == ["-", "0m", "1h 1m", "1d 1h"]
+
+
+def test_store_counts_archived_completions(store):
+    for text in ("old", "recent", "open"):
+        store.add(text)
+    store.complete(0)
+    store.complete(1)
+    store.tasks[0]["completed_at"] = NOW - 40 * 86400
+    store.completion_stats = None
+    assert store.completed_in(7) == 1
+    assert store.completed_in(60) == 2
+    store.archive_completed(30)
+    assert len(store) == 2
+    assert store.completed_in(60) == 2
+    assert store.report(today=TODAY).backlog == 1
@@ -0,0 +1,49 @@
+"""Archiving old completed tasks, restoring them, and merging afterwards"""
+
+import time
+
+from pytodo.store import TaskStore
+from pytodo.storage_processor import load_tombstones, read_tasks
+
+DAY = 86400
+
+
+def _old_and_new(store):
+    store.add("old")
+    store.add("new")
+    store.add("open")
+    store.complete(0)
+    store.complete(1)
+    store.update(0, completed_at=int(time.time()) - 40 * DAY)
+    store.save()
+
+
+def test_loading_does_not_archive(store):
+    _old_and_new(store)
+    reopened = TaskStore(store.path)
+    assert [task["task"] for task in reopened] == ["old", "new", "open"]
+
+
+def test_archived_tasks_stay_archived_after_a_merge(store):
+    _old_and_new(store)
+    # Another machine's copy, from before archiving
+    other = read_tasks(store.path)
+    assert store.archive_completed(30) == 1
+    assert [task["task"] for task in store] == ["new", "open"]
+    store.merge(other, {})
+    assert [task["task"] for task in store] == ["new", "open"]
+    assert store.archive_completed(30) == 0
+    assert store.report().windows[-1].completed == 2
+    # The tombstone was saved with the list
+    assert set(load_tombstones(store.path)) == {task["id"] for task in store.archive}
+
+
+def test_restore_lifts_the_tombstone(store):
+    _old_and_new(store)
+    store.archive_completed(30)
+    old_id = next(iter(store.archive))["id"]
+    store.restore([old_id])
+    assert old_id not in store.tombstones
+    assert [task["task"] for task in store] == ["new", "open", "old"]
+    assert list(store.archive) == []
+    assert store.archive_completed(30) == 0
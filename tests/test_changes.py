@@ -0,0 +1,84 @@
+"""Change feed and coalescing of change batches"""
+
+import random
+
+import pytest
+
+from pytodo.changes import INSERTED, UPDATED, REMOVED, RESET, Change, ChangeFeed, IdleBatcher, coalesce
+
+
+def _random_changes(rng, present):
+    """A valid sequence of changes starting from the ids in present"""
+    present, changes = set(present), []
+    for _ in range(rng.randint(0, 12)):
+        task_id = rng.choice("abcde")
+        if task_id in present:
+            if rng.random() < 0.6:
+                fields = rng.choice((None, {"task"}, {"completed", "completed_at"}))
+                changes.append(Change(UPDATED, task_id, fields and frozenset(fields)))
+            else:
+                present.discard(task_id)
+                changes.append(Change(REMOVED, task_id, None))
+        else:
+            present.add(task_id)
+            changes.append(Change(INSERTED, task_id, None))
+    return changes, present
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_one_change_per_task_with_the_same_outcome(seed):
+    rng = random.Random(seed)
+    before = set(rng.sample("abcde", rng.randint(0, 5)))
+    changes, after = _random_changes(rng, before)
+    coalesced = coalesce(changes)
+    assert len({change.id for change in coalesced}) == len(coalesced)
+    touched = {change.id for change in changes}
+    for change in coalesced:
+        assert change.id in touched
+        if change.kind == INSERTED:
+            assert change.id not in before and change.id in after
+        elif change.kind == REMOVED:
+            assert change.id not in after
+        else:
+            assert change.id in after
+    # Every task whose presence changed is reported
+    reported = {change.id for change in coalesced}
+    assert before ^ after <= reported
+
+
+def test_coalesce_examples():
+    assert coalesce([Change(INSERTED, "a", None), Change(REMOVED, "a", None)]) == []
+    assert coalesce([Change(UPDATED, "a", frozenset({"task"})), Change(UPDATED, "a", frozenset({"tags"}))]) == \
+        [Change(UPDATED, "a", frozenset({"task", "tags"}))]
+    assert coalesce([Change(UPDATED, "a", frozenset({"task"})), Change(UPDATED, "a", None)]) == \
+        [Change(UPDATED, "a", None)]
+    assert coalesce([Change(REMOVED, "a", None), Change(INSERTED, "a", None)]) == [Change(UPDATED, "a", None)]
+    assert coalesce([Change(UPDATED, "a", None), Change(RESET, None, None), Change(INSERTED, "b", None)]) == \
+        [Change(RESET, None, None), Change(INSERTED, "b", None)]
+
+
+def test_idle_batcher_delivers_once_per_cycle():
+    scheduled, delivered = [], []
+    batcher = IdleBatcher(scheduled.append, delivered.append)
+    feed = ChangeFeed()
+    unsubscribe = feed.subscribe(batcher)
+    feed.publish([Change(INSERTED, "a", None)])
+    feed.publish([Change(UPDATED, "a", frozenset({"task"}))])
+    assert len(scheduled) == 1 and delivered == []
+    scheduled.pop()()
+    assert delivered == [[Change(INSERTED, "a", None)]]
+    unsubscribe()
+    feed.publish([Change(REMOVED, "a", None)])
+    assert scheduled == []
+
+
+def test_store_publishes_after_transactions(store):
+    batches = []
+    store.changes.subscribe(batches.append)
+    store.add("one")
+    store.add("two")
+    store.complete_many([0, 1])
+    assert [len(batch) for batch in batches] == [1, 1, 2]
+    assert {change.kind for change in batches[-1]} == {UPDATED}
+    store.undo()
+    assert {change.kind for change in batches[-1]} == {UPDATED}
@@ -0,0 +1,129 @@
+"""The command-line interface, run as a script in a scratch directory"""
+
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "main-cli.py")
+
+
+def _epoch(day):
+    return int(datetime.strptime(day, "%Y-%m-%d").timestamp()) + 12 * 3600
+
+
+@pytest.fixture
+def cli(tmp_path):
+    tasks = []
+    for n, (added, completed) in enumerate((("2024-01-05", "2024-01-06"), ("2024-01-05", "2024-02-10"),
+                                            ("2024-02-01", "2024-02-02"), ("2024-02-01", None))):
+        task = {"id": f"t{n}", "task": f"task {n}", "completed": completed is not None, "created_at": _epoch(added)}
+        if completed:
+            task["completed_at"] = _epoch(completed)
+        tasks.append(task)
+    (tmp_path / "storage.json").write_text(json.dumps(tasks), encoding="utf-8")
+
+    def run(*argv):
+        result = subprocess.run([sys.executable, CLI, "--no-daemon", "--no-banner"] + list(argv), cwd=tmp_path,
+                                capture_output=True, text=True, timeout=60)
+        return result.returncode, result.stdout + result.stderr
+    return run
+
+
+def _shown(output):
+    return [line.split(". ", 1)[1].split(" - ")[0] for line in output.splitlines() if ". task " in line]
+
+
+def test_invalid_date_is_reported(cli):
+    status, output = cli("list", "--added-since", "2024-13-01")
+    assert status == 0
+    assert "Invalid date, use YYYY-MM-DD" in output
+    assert "Traceback" not in output
+
+
+def test_added_and_completed_ranges_both_apply(cli):
+    _, output = cli("list", "--added-until", "2024-01-31")
+    assert _shown(output) == ["task 0", "task 1"]
+    _, output = cli("list", "--added-until", "2024-01-31", "--completed-since", "2024-02-01")
+    assert _shown(output) == ["task 1"]
+    _, output = cli("list", "--completed-since", "2024-02-01", "--completed-until", "2024-02-05")
+    assert _shown(output) == ["task 2"]
+
+
+@pytest.mark.parametrize("argv", (("--offset", "-1"), ("--limit", "0"), ("--page", "0"), ("--limit", "two")))
+def test_paging_options_are_checked(cli, argv):
+    status, output = cli("list", *argv)
+    assert status == 2
+    assert "Traceback" not in output
+
+
+def test_paging(cli):
+    _, output = cli("list", "--offset", "3")
+    assert _shown(output) == ["task 3"]
+    _, output = cli("list", "--page", "2", "--limit", "3")
+    assert _shown(output) == ["task 3"]
+    assert "Page 2/2" in output
+
+
+@pytest.mark.parametrize("command", ("undo", "redo"))
+def test_history_commands_need_the_daemon(cli, command):
+    cli("delete", "1")
+    status, output = cli(command)
+    assert status == 1
+    assert "needs a running daemon" in output
+
+
+@pytest.mark.skipif(not hasattr(__import__("socket"), "AF_UNIX"), reason="needs Unix sockets")
+def test_memory_report_traces_loading_even_with_a_daemon(tmp_path, cli):
+    def run(*argv):
+        return subprocess.run([sys.executable, CLI, "--no-banner"] + list(argv), cwd=tmp_path,
+                              capture_output=True, text=True, timeout=60).stdout
+    assert "started" in run("daemon", "start")
+    try:
+        run("list")  # the daemon has the list loaded from now on
+        output = run("stats", "--memory")
+    finally:
+        run("daemon", "stop")
+    # Run here rather than in the daemon, the list's loading shows up among the sites
+    sites = output.split("Top allocation sites:", 1)[1]
+    assert "store.py" in sites
+
+
+def test_export_to_standard_output(cli, tmp_path):
+    status, output = cli("export", "-", "--format", "ndjson", "--completed")
+    assert status == 0
+    assert [json.loads(line)["id"] for line in output.splitlines() if line.startswith("{")] == ["t0", "t1", "t2"]
+    assert "Exported 3 task(s)" in output
+    assert not (tmp_path / "-").exists()
+
+
+def test_list_option_picks_the_list(cli, tmp_path):
+    status, output = cli("--list", "Groceries & Stuff", "add", "milk")
+    assert status == 0
+    assert "Created list: 'Groceries & Stuff'" in output
+    assert (tmp_path / "storage.lists" / "groceries-stuff.json").exists()
+    _, output = cli("--list", "Groceries & Stuff", "list")
+    assert "milk" in output and "task 0" not in output
+    _, output = cli("list")
+    assert "milk" not in output and "task 0" in output
+    # The default list was written without the catalog, so it was never counted
+    _, output = cli("lists")
+    assert output.splitlines() == ["Tasks (?)", "Groceries & Stuff (1)"]
+
+
+def test_lists_are_renamed_and_deleted(cli, tmp_path):
+    cli("--list", "Work", "add", "report")
+    status, output = cli("lists", "--rename", "Work", "Office")
+    assert status == 0
+    assert "Renamed list: 'Work' to 'Office'" in output
+    _, output = cli("--list", "Office", "list")
+    assert "report" in output
+    assert "Error" in cli("lists", "--rename", "Tasks", "Inbox")[1]
+    assert "Error" in cli("lists", "--delete", "Tasks")[1]
+    _, output = cli("lists", "--delete", "Office")
+    assert "Deleted list: 'Office'" in output
+    assert cli("lists")[1].splitlines() == ["Tasks (?)"]
+    assert os.listdir(tmp_path / "storage.lists") == []
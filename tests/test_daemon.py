@@ -0,0 +1,88 @@
+"""Group commits of the daemon, without a client"""
+
+import os
+import stat
+
+import pytest
+
+from pytodo import daemon
+from pytodo.lists import Catalog, DEFAULT_LIST
+from pytodo.storage_processor import read_tasks
+from pytodo.store import TaskStore
+
+pytestmark = pytest.mark.skipif(not daemon.supported(), reason="needs Unix sockets")
+
+
+@pytest.fixture
+def server(tmp_path):
+    catalog = Catalog(str(tmp_path / "storage.json"))
+    server = daemon.TaskDaemon(str(tmp_path / "storage.sock"), catalog, lambda argv: None)
+    yield server
+    server.server_close()
+
+
+def test_socket_is_private(server):
+    assert stat.S_IMODE(os.stat(server.server_address).st_mode) == 0o600
+
+
+@pytest.mark.parametrize("wait", (True, False))
+def test_commit_keeps_writes_made_since_the_last_command(server, wait):
+    store = server.catalog.open(DEFAULT_LIST)
+    store.save()
+    server.answer({"argv": []})  # the list as loaded counts as seen
+    store.add("from the daemon")
+    server.defer(store)
+    # A GUI saves the same list before the commit
+    other = TaskStore(store.path)
+    other.add("from the GUI")
+    other.save()
+    later = os.stat(store.path).st_mtime_ns + 10 ** 9
+    os.utime(store.path, ns=(later, later))
+    server.commit(wait)
+    server.reap(wait=True)
+    assert sorted(task["task"] for task in read_tasks(store.path)) == ["from the GUI", "from the daemon"]
+
+
+def test_undo_after_an_external_write_keeps_it(server):
+    store = server.catalog.open(DEFAULT_LIST)
+    store.save()
+    server.answer({"argv": []})
+    store.add("mine")
+    server.defer(store)
+    other = TaskStore(store.path)
+    other.add("from the GUI")
+    other.save()
+    later = os.stat(store.path).st_mtime_ns + 10 ** 9
+    os.utime(store.path, ns=(later, later))
+    server.answer({"argv": []})  # the next command catches up first
+    assert store.undo() is None  # the GUI's write is not ours to undo
+    server.commit(wait=True)
+    assert sorted(task["task"] for task in read_tasks(store.path)) == ["from the GUI", "mine"]
+
+
+def test_a_change_saved_straight_away_is_not_merged_back(server):
+    store = server.catalog.open(DEFAULT_LIST)
+    store.add("old")
+    store.complete(0)
+    store.update(0, completed_at=1)
+    store.archive_completed(30)
+    server.answer({"argv": []})
+    store.add("mine")
+    server.defer(store)
+    restored = server.save_now(store, lambda: store.restore([task["id"] for task in store.archive]))
+    assert [task["task"] for task in restored] == ["old"]
+    assert not server.dirty
+    assert sorted(task["task"] for task in read_tasks(store.path)) == ["mine", "old"]
+    server.answer({"argv": []})  # nothing to catch up on, so the history is kept
+    assert store.undo() == "Add 'mine'"
+
+
+def test_a_deleted_list_is_not_saved_again(server):
+    server.catalog.create("Work")
+    store = server.catalog.open("Work")
+    store.add("report")
+    server.defer(store)
+    server.save_now(None, lambda: server.catalog.delete("Work"))
+    server.commit(wait=True)
+    assert not os.path.exists(store.path)
+    assert server.catalog.names() == [DEFAULT_LIST]
@@ -0,0 +1,65 @@
+"""Exact and near duplicate detection"""
+
+import random
+
+import pytest
+
+from pytodo.duplicates import (FingerprintIndex, fingerprint, near_duplicate_groups, normalize, shingles,
+                               similarity, split_duplicates)
+
+TEXTS = ("Buy milk", "buy  MILK!", "Renew passport", "renew pasport", "Call Bob", "Water the plants")
+
+
+def test_normalize():
+    assert normalize("  Buy, MILK!! ") == "buy milk"
+    assert normalize("ｂｕｙ milk") == "buy milk"
+    assert fingerprint("Buy milk") == fingerprint("buy milk.")
+    assert similarity(shingles("Renew passport"), shingles("renew pasport")) >= 0.7
+    assert similarity(set(), shingles("x")) == 0.0
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fingerprint_index_follows_edits(seed):
+    rng = random.Random(seed)
+    tasks = [{"id": f"t{n}", "task": rng.choice(TEXTS)} for n in range(20)]
+    index = FingerprintIndex(tasks)
+    for _ in range(30):
+        task = rng.choice(tasks)
+        index.discard(task)
+        task["task"] = rng.choice(TEXTS)
+        index.add(task)
+    for task in rng.sample(tasks, 5):
+        index.discard(task)
+        tasks.remove(task)
+    for text in TEXTS:
+        expected = {task["id"] for task in tasks if normalize(task["task"]) == normalize(text)}
+        assert set(index.find(text)) == expected
+    expected = {frozenset(task["id"] for task in tasks if fingerprint(task["task"]) == fingerprint(text))
+                for text in TEXTS}
+    assert {frozenset(group) for group in index.groups()} == {group for group in expected if len(group) > 1}
+
+
+def test_near_duplicate_groups():
+    tasks = [{"task": text} for text in TEXTS]
+    assert near_duplicate_groups(tasks) == [[0, 1], [2, 3]]
+    assert near_duplicate_groups(tasks, threshold=1.0) == [[0, 1]]
+
+
+def test_split_duplicates():
+    tasks = [{"id": "a", "task": "Buy milk"}]
+    incoming = [{"id": "a", "task": "Buy milk"}, {"task": "buy milk"}, {"task": "Call Bob"},
+                {"task": "call bob!"}, {"task": "Buy milc"}]
+    new, duplicates = split_duplicates(tasks, incoming)
+    assert [record["task"] for record in new] == ["Buy milk", "Call Bob", "Buy milc"]
+    assert [record["task"] for record in duplicates] == ["buy milk", "call bob!"]
+    new, duplicates = split_duplicates(tasks, incoming[4:], near=True, threshold=0.5)
+    assert (new, duplicates) == ([], incoming[4:])
+
+
+def test_duplicates_in_store(store):
+    for text in ("Buy milk", "Call Bob", "buy milk"):
+        store.add(text)
+    assert store.duplicates_of("BUY MILK") == [0, 2]
+    assert store.duplicate_groups() == [[0, 2]]
+    store.update(2, task="Call bob.")
+    assert store.duplicate_groups() == [[1, 2]]
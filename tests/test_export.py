@@ -0,0 +1,107 @@
+"""CSV, NDJSON and Markdown exports read back, filtered and streamed"""
+
+import csv
+import io
+import json
+
+import pytest
+
+from pytodo.export import export_file, export_tasks, format_for, query_for, write_csv, write_markdown, write_ndjson
+from pytodo.storage_processor import write_tasks
+
+DAY = 86400
+TEXTS = ('Buy milk, eggs', 'Say "hi"', "Two\nlines", "  spaced   out ", "naïve café")
+
+
+def _tasks():
+    tasks = []
+    for n, text in enumerate(TEXTS):
+        task = {"id": f"t{n}", "clock": {"created": f"{n:04d}"}, "task": text, "completed": n % 2 == 1,
+                "created_at": 1700000000 + n * DAY}
+        if n % 2:
+            task["completed_at"] = task["created_at"] + DAY
+        if n == 2:
+            task.update(tags=["work", "home"], due_at=1700000000, priority=0)
+        tasks.append(task)
+    return tasks
+
+
+def _export(tmp_path, name, **options):
+    path = str(tmp_path / name)
+    count = export_tasks(_tasks(), path, **options)
+    with open(path, encoding="utf-8", newline="") as file:
+        return count, file.read()
+
+
+def test_csv_round_trip(tmp_path):
+    count, text = _export(tmp_path, "tasks.csv")
+    rows = list(csv.DictReader(io.StringIO(text, newline="")))
+    assert count == len(rows) == len(TEXTS)
+    assert [row["task"] for row in rows] == list(TEXTS)
+    assert [row["completed"] for row in rows] == ["no", "yes", "no", "yes", "no"]
+    assert (rows[2]["priority"], rows[2]["tags"], rows[0]["priority"]) == ("high", "work home", "normal")
+    assert rows[0]["completed_at"] == "" and rows[1]["completed_at"]
+
+
+def test_ndjson_round_trip(tmp_path):
+    count, text = _export(tmp_path, "tasks.jsonl")
+    records = [json.loads(line) for line in text.splitlines()]
+    assert count == len(records) == len(TEXTS)
+    assert records == [{key: value for key, value in task.items() if key != "clock"} for task in _tasks()]
+
+
+def test_markdown_checklist(tmp_path):
+    count, text = _export(tmp_path, "tasks.md")
+    lines = text.splitlines()
+    assert lines[0] == "# Tasks"
+    items = lines[2:]
+    assert count == len(items) == len(TEXTS)
+    assert items[0] == "- [ ] Buy milk, eggs"
+    assert items[1] == '- [x] Say "hi"'
+    # A task's own line breaks and spacing cannot split its item
+    assert items[2].startswith("- [ ] Two lines (due ") and items[2].endswith(" #work #home")
+    assert items[3] == "- [x] spaced out"
+
+
+@pytest.mark.parametrize("name", ("tasks.csv", "tasks.ndjson", "tasks.md", "tasks.json"))
+def test_filters(tmp_path, name):
+    source = str(tmp_path / "storage.json")
+    write_tasks(_tasks(), source)
+    dest = str(tmp_path / name)
+    assert export_file(source, dest, query=query_for("completed")) == 2
+    assert export_file(source, dest, query=query_for("pending", text="MILK")) == 1
+    week = ("created_at", 1700000000 + DAY, 1700000000 + 3 * DAY)
+    assert export_file(source, dest, query=query_for(date_filter=week)) == 2
+    assert export_file(source, dest, query={"completed": True, "created_at": (None, 1700000000 + 2 * DAY)}) == 1
+    assert format_for(dest) == {"tasks.csv": "csv", "tasks.ndjson": "ndjson", "tasks.md": "markdown"}.get(name, "json")
+
+
+@pytest.mark.parametrize("writer", (write_csv, write_ndjson, write_markdown))
+def test_writers_stream_one_task_at_a_time(writer):
+    out = io.StringIO()
+    sizes = []
+
+    def tasks():
+        # Each task is written out before the next one is asked for
+        for task in _tasks():
+            sizes.append(len(out.getvalue()))
+            yield task
+    assert writer(tasks(), out) == len(TEXTS)
+    sizes.append(len(out.getvalue()))
+    assert all(before < after for before, after in zip(sizes[1:], sizes[2:]))
+
+
+def test_a_failed_export_leaves_no_file(tmp_path):
+    def broken():
+        yield _tasks()[0]
+        raise RuntimeError
+    path = tmp_path / "tasks.csv"
+    with pytest.raises(RuntimeError):
+        export_tasks(broken(), str(path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_dash_writes_to_standard_output(capsys):
+    assert export_tasks(_tasks(), "-", "ndjson", query_for("pending")) == 3
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["t0", "t2", "t4"]
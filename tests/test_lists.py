@@ -0,0 +1,118 @@
+"""Named task lists: the catalog, each list's own file, renames and deletes"""
+
+import os
+
+import pytest
+
+from pytodo.archive import archive_dir
+from pytodo.lists import DEFAULT_LIST, Catalog, catalog_path
+from pytodo.storage_processor import shards_dir, tombstones_path, write_shards
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "storage.json")
+
+
+def test_the_default_list_is_the_data_file(path):
+    catalog = Catalog(path)
+    assert catalog.names() == [DEFAULT_LIST]
+    assert catalog.path_of(DEFAULT_LIST) == path
+    assert catalog.count(DEFAULT_LIST) is None
+    catalog.open(DEFAULT_LIST).add("milk")
+    assert catalog.count(DEFAULT_LIST) == 1
+
+
+def test_create_names_files_after_the_list(path, tmp_path):
+    catalog = Catalog(path)
+    catalog.create("  Groceries & Stuff!  ")
+    catalog.create("groceries stuff")
+    catalog.create("!!!")
+    assert catalog.names() == [DEFAULT_LIST, "Groceries & Stuff!", "groceries stuff", "!!!"]
+    lists = tmp_path / "storage.lists"
+    assert catalog.path_of("Groceries & Stuff!") == str(lists / "groceries-stuff.json")
+    assert catalog.path_of("groceries stuff") == str(lists / "groceries-stuff-2.json")
+    assert catalog.path_of("!!!") == str(lists / "list.json")
+    for name in ("", "   ", "Groceries & Stuff!", DEFAULT_LIST):
+        with pytest.raises(ValueError):
+            catalog.create(name)
+
+
+def test_lists_keep_their_own_tasks_and_counts(path):
+    catalog = Catalog(path)
+    catalog.create("Work")
+    work = catalog.open("Work")
+    work.add("report")
+    work.add("email")
+    catalog.open(DEFAULT_LIST).add("milk")
+    for store in catalog.stores.values():
+        store.save()
+    catalog.save()
+    reopened = Catalog(path)
+    assert (reopened.count(DEFAULT_LIST), reopened.count("Work")) == (1, 2)
+    assert reopened.stores == {}
+    assert [task["task"] for task in reopened.open("Work")] == ["report", "email"]
+    assert os.path.exists(catalog_path(path))
+
+
+def test_rename_keeps_the_tasks_and_the_file(path):
+    catalog = Catalog(path)
+    catalog.create("Work")
+    work = catalog.open("Work")
+    work.add("report")
+    work.save()
+    file = catalog.path_of("Work")
+    catalog.rename("Work", " Office ")
+    assert catalog.names() == [DEFAULT_LIST, "Office"]
+    assert catalog.path_of("Office") == file
+    assert catalog.open("Office") is work
+    # Counted under the new name
+    work.add("email")
+    assert catalog.count("Office") == 2
+    catalog.save()
+    reopened = Catalog(path)
+    assert reopened.names() == [DEFAULT_LIST, "Office"]
+    assert [task["task"] for task in reopened.open("Office")] == ["report"]
+
+
+def test_rename_is_refused(path):
+    catalog = Catalog(path)
+    catalog.create("Work")
+    catalog.create("Home")
+    for name, new_name in ((DEFAULT_LIST, "Inbox"), ("Missing", "Inbox"), ("Work", "Home"), ("Work", "  ")):
+        with pytest.raises(ValueError):
+            catalog.rename(name, new_name)
+    assert catalog.names() == [DEFAULT_LIST, "Work", "Home"]
+
+
+def test_delete_removes_every_file_of_the_list(path, tmp_path):
+    catalog = Catalog(path)
+    catalog.create("Work")
+    work = catalog.open("Work")
+    for n in range(3):
+        work.add(f"task {n}")
+    work.remove(0)
+    work.save()
+    file = catalog.path_of("Work")
+    write_shards(work.tasks, file, 2)
+    os.makedirs(archive_dir(file))
+    assert os.path.exists(tombstones_path(file))
+    catalog.delete("Work")
+    assert catalog.names() == [DEFAULT_LIST]
+    assert "Work" not in catalog.stores
+    assert os.listdir(tmp_path / "storage.lists") == []
+    assert not os.path.exists(shards_dir(file))
+    assert Catalog(path).names() == [DEFAULT_LIST]
+    # The name is free again, and the new list starts empty
+    catalog.create("Work")
+    assert len(catalog.open("Work")) == 0
+
+
+def test_the_default_list_cannot_be_deleted(path):
+    catalog = Catalog(path)
+    catalog.open(DEFAULT_LIST).add("milk")
+    with pytest.raises(ValueError):
+        catalog.delete(DEFAULT_LIST)
+    with pytest.raises(ValueError):
+        catalog.delete("Missing")
+    assert catalog.names() == [DEFAULT_LIST]
@@ -0,0 +1,161 @@
+"""Convergence of merge_tasks over random replicas merged in random orders"""
+
+import copy
+import random
+import time
+
+import pytest
+
+from pytodo import merge
+from pytodo.merge import format_stamp, merge_tasks
+from pytodo.store import TaskStore
+
+SEEDS = range(40)
+NODES = ("a", "b", "c")
+TEXTS = ("Buy milk", "Call Bob", "Pay rent", "Water plants")
+
+
+def _stamp(rng):
+    return format_stamp(rng.randint(1, 50), rng.randint(0, 3), rng.choice(NODES))
+
+
+def _replica(rng, ids):
+    """A random copy of a shared history: some tasks, some edits, some tombstones"""
+    tasks = []
+    for task_id in rng.sample(ids, rng.randint(0, len(ids))):
+        task = {"id": task_id, "clock": {"created": _stamp(rng)}}
+        if rng.random() < 0.3:
+            task["clock"]["readded"] = _stamp(rng)  # put back after a removal
+        for field in ("task", "completed", "due_at"):
+            if rng.random() < 0.7:
+                task[field] = rng.choice(TEXTS) if field == "task" else rng.choice((True, False, None, 5))
+                if rng.random() < 0.9:
+                    task["clock"][field] = _stamp(rng)
+        tasks.append(task)
+    # Legacy tasks from before ids existed, some shared between replicas
+    for text in rng.sample(TEXTS, rng.randint(0, 2)):
+        tasks.append({"task": text, "completed": False, "added": "2024-01-01 10:00:00"})
+    rng.shuffle(tasks)
+    tombstones = {task_id: _stamp(rng) for task_id in rng.sample(ids, rng.randint(0, 2))}
+    return tasks, tombstones
+
+
+def _merge(left, right):
+    # merge_tasks adds metadata to its inputs in place, keep the replicas intact
+    left, right = copy.deepcopy(left), copy.deepcopy(right)
+    return merge_tasks(left[0], right[0], left[1], right[1])
+
+
+def _replicas(seed, count):
+    rng = random.Random(seed)
+    ids = [f"task{n}" for n in range(6)]
+    return rng, [_replica(rng, ids) for _ in range(count)]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_clock(monkeypatch):
+    monkeypatch.setattr(merge, "clock", merge.HybridLogicalClock("test"))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_commutative(seed):
+    _, (a, b) = _replicas(seed, 2)
+    assert _merge(a, b) == _merge(b, a)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_associative(seed):
+    _, (a, b, c) = _replicas(seed, 3)
+    assert _merge(_merge(a, b), c) == _merge(a, _merge(b, c))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_idempotent(seed):
+    _, (a, b) = _replicas(seed, 2)
+    merged = _merge(a, b)
+    assert _merge(merged, merged) == merged
+    assert _merge(merged, a) == merged
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_any_merge_order_converges(seed):
+    rng, replicas = _replicas(seed, 5)
+    results = []
+    for _ in range(6):
+        pending = replicas[:]
+        rng.shuffle(pending)
+        # Merge pairs picked at random until one copy is left
+        while len(pending) > 1:
+            left = pending.pop(rng.randrange(len(pending)))
+            right = pending.pop(rng.randrange(len(pending)))
+            pending.append(_merge(left, right))
+        results.append(pending[0])
+    assert all(result == results[0] for result in results)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_tombstones_cover_earlier_adds_only(seed):
+    _, (a, b) = _replicas(seed, 2)
+    tasks, tombstones = _merge(a, b)
+    assert set(tombstones) == set(a[1]) | set(b[1])
+    # Each id is there when its latest re-add is later than every tombstone of it
+    latest = {}
+    for task in copy.deepcopy(a[0]) + copy.deepcopy(b[0]):
+        if "id" in task:
+            readded = task["clock"].get("readded", "")
+            latest[task["id"]] = max(latest.get(task["id"], ""), readded)
+    present = {task_id for task_id, readded in latest.items()
+               if task_id not in tombstones or readded > tombstones[task_id]}
+    assert {task["id"] for task in tasks} & set(latest) == present
+
+
+def test_legacy_copies_merge_into_one():
+    legacy = [{"task": "Buy milk", "completed": False, "added": "2024-01-01 10:00:00"},
+              {"task": "Buy milk", "completed": False, "added": "2024-01-01 10:00:00"}]
+    tasks, _ = merge_tasks(copy.deepcopy(legacy), copy.deepcopy(legacy))
+    assert len(tasks) == 2
+    assert len({task["id"] for task in tasks}) == 2
+
+
+def _sync(left, right):
+    left.merge(copy.deepcopy(right.tasks), dict(right.tombstones))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("put_back", ("undo", "restore"))
+def test_a_task_put_back_survives_merges_with_copies_that_saw_it_go(tmp_path, seed, put_back):
+    rng = random.Random(seed)
+    a = TaskStore(str(tmp_path / "a.json"))
+    for text in rng.sample(TEXTS, 3):
+        a.add(text)
+    b = TaskStore(str(tmp_path / "b.json"))
+    _sync(b, a)
+    c = TaskStore(str(tmp_path / "c.json"))
+    _sync(c, a)
+    position = rng.randrange(len(a))
+    text = a[position]["task"]
+    if put_back == "undo":
+        a.remove(position)
+    else:
+        a.complete(position)
+        a.update(position, completed_at=int(time.time()) - 40 * 86400)
+        a.archive_completed(30)
+    _sync(b, a)
+    assert text not in [task["task"] for task in b]
+    if put_back == "undo":
+        a.undo()
+    else:
+        a.restore([task["id"] for task in a.archive])
+    # Either side may merge first, and both end up with the task back
+    if rng.random() < 0.5:
+        _sync(a, b)
+        _sync(b, a)
+    else:
+        _sync(b, a)
+        _sync(a, b)
+    assert text in [task["task"] for task in a]
+    assert a.tasks == b.tasks
+    # A copy still holding the task from before it went agrees too
+    _sync(c, b)
+    _sync(b, c)
+    assert c.tasks == b.tasks == a.tasks
@@ -0,0 +1,52 @@
+"""Next Up queue: pending tasks by priority, then due date"""
+
+import random
+
+import pytest
+
+from pytodo.nextup import NextUpQueue, parse_priority, priority_of, rank
+
+
+def _task(rng, n):
+    return {"id": f"t{n}", "clock": {"created": f"{n:04d}"}, "completed": rng.random() < 0.3,
+            "priority": rng.choice((0, 1, 2, None, 7)), "due_at": rng.choice((None, rng.randint(0, 20)))}
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_top_matches_a_full_sort(seed):
+    rng = random.Random(seed)
+    tasks = [_task(rng, n) for n in range(40)]
+    queue = NextUpQueue(tasks[:20])
+    for task in tasks[20:]:
+        queue.add(task)
+    for _ in range(60):
+        task = rng.choice(tasks)
+        queue.discard(task)
+        task.update({key: value for key, value in _task(rng, 0).items() if key not in ("id", "clock")})
+        queue.add(task)
+    for task in rng.sample(tasks, 10):
+        queue.discard(task)
+        tasks.remove(task)
+    expected = [task["id"] for task in sorted((task for task in tasks if not task["completed"]), key=rank)]
+    assert len(queue) == len(expected)
+    for count in (0, 1, 5, len(expected), len(expected) + 5):
+        assert queue.top(count) == expected[:count]
+
+
+def test_priorities():
+    assert [parse_priority(text) for text in ("high", "H", " low ", "n")] == [0, 0, 2, 1]
+    with pytest.raises(ValueError):
+        parse_priority("urgent")
+    with pytest.raises(ValueError):
+        parse_priority("")
+    assert priority_of({"priority": 5}) == priority_of({}) == 1
+
+
+def test_next_up_in_store(store):
+    store.add("later", priority=2)
+    store.add("soon", due_at=5)
+    store.add("now", priority=0)
+    store.add("whenever")
+    assert store.next_up(3) == [2, 1, 3]
+    store.complete(2)
+    assert store.next_up(3) == [1, 3, 0]
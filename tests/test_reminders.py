@@ -0,0 +1,65 @@
+"""Reminder heap and scheduler, and that each reminder fires once"""
+
+from pytodo.reminders import ReminderHeap, ReminderScheduler, reminder_time
+from pytodo.storage_processor import read_tasks, load_tombstones
+from pytodo.store import TaskStore
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_heap_pops_in_order_and_skips_cancelled():
+    heap = ReminderHeap()
+    for task_id, when in (("a", 30), ("b", 10), ("c", 20), ("d", 5)):
+        heap.push(task_id, when)
+    heap.cancel("d")
+    heap.push("c", 40)
+    assert heap.peek() == 10
+    assert heap.pop_due(30) == ["b", "a"]
+    assert heap.pop_due(100) == ["c"]
+    assert heap.peek() is None
+
+
+def test_reminder_time():
+    assert reminder_time({"due_at": 100}) == 100
+    assert reminder_time({"due_at": 100, "remind_at": 50}) == 50
+    assert reminder_time({"due_at": 100, "completed": True}) is None
+    assert reminder_time({"due_at": 100, "reminded_at": 100}) is None
+    assert reminder_time({"due_at": 200, "reminded_at": 100}) == 200
+
+
+def test_fires_once_across_reloads_and_restarts(store):
+    store.add("Pay rent", due_at=100)
+    store.add("Call Bob", due_at=500)
+    fired = []
+    clock = Clock(200)
+    scheduler = ReminderScheduler(store, fired.append, clock=clock)
+    assert [task["task"] for task in scheduler.fire()] == ["Pay rent"]
+    assert scheduler.fire() == []
+    store.save()
+
+    # Another instance saved the list: reloading neither refires nor adds history
+    store.reload(read_tasks(store.path), load_tombstones(store.path))
+    assert scheduler.fire() == []
+    assert not store.undo_stack
+
+    # A fresh start on the saved file
+    restarted = TaskStore(store.path)
+    assert ReminderScheduler(restarted, fired.append, clock=clock).fire() == []
+    assert len(fired) == 1
+
+
+def test_moving_due_date_arms_it_again(store):
+    store.add("Pay rent", due_at=100)
+    clock = Clock(200)
+    scheduler = ReminderScheduler(store, lambda tasks: None, clock=clock)
+    assert len(scheduler.fire()) == 1
+    store.update(0, due_at=300)
+    assert scheduler.fire() == []
+    clock.now = 300
+    assert len(scheduler.fire()) == 1
@@ -0,0 +1,55 @@
+"""Sort orders kept sorted as tasks change"""
+
+import random
+
+import pytest
+
+from pytodo.sortindex import SORT_KEYS, SortOrder, _tiebreak
+
+
+def _task(rng, n):
+    return {"id": f"t{n}", "clock": {"created": f"{n:04d}"}, "task": rng.choice(("b", "A", "a", "c")),
+            "completed": rng.random() < 0.5, "created_at": rng.randint(0, 9),
+            "due_at": rng.choice((None, rng.randint(0, 9))), "priority": rng.randint(0, 2)}
+
+
+def _expected(name, tasks, reverse=False):
+    key = SORT_KEYS[name][1]
+    ordered = [task["id"] for task in sorted(tasks, key=lambda task: (key(task), _tiebreak(task), task["id"]))]
+    return ordered[::-1] if reverse else ordered
+
+
+@pytest.mark.parametrize("name", sorted(SORT_KEYS))
+@pytest.mark.parametrize("seed", range(10))
+def test_order_follows_edits(name, seed):
+    rng = random.Random(seed)
+    tasks = [_task(rng, n) for n in range(30)]
+    order = SortOrder(name, tasks[:15])
+    for task in tasks[15:]:
+        order.add(task)
+    for _ in range(20):
+        task = rng.choice(tasks)
+        # The store discards a task before changing it and adds it back after
+        order.discard(task)
+        task.update({key: value for key, value in _task(rng, 0).items() if key not in ("id", "clock")})
+        order.add(task)
+    for task in rng.sample(tasks, 5):
+        order.discard(task)
+        tasks.remove(task)
+    assert order.ids() == _expected(name, tasks)
+    assert order.ids(reverse=True) == _expected(name, tasks, reverse=True)
+    assert len(order) == len(tasks)
+
+
+def test_undated_tasks_sort_last():
+    tasks = [{"id": "a", "due_at": None}, {"id": "b", "due_at": 5}, {"id": "c", "due_at": 1}]
+    assert SortOrder("due", tasks).ids() == ["c", "b", "a"]
+
+
+def test_sorted_positions_in_store(store):
+    for text in ("pear", "Apple", "fig"):
+        store.add(text)
+    assert store.sorted_positions("task") == [1, 2, 0]
+    store.update(0, task="banana")
+    assert store.sorted_positions("task") == [1, 0, 2]
+    assert store.sorted_positions("task", reverse=True, positions=[0, 2]) == [2, 0]
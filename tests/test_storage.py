@@ -0,0 +1,116 @@
+"""Storage files: streaming reads, the snapshot cache and shards"""
+
+import json
+import os
+
+import pytest
+
+from pytodo.storage_processor import (count_shards, iter_tasks, load_shards, load_snapshot, read_tasks_cached,
+                                      search_shards, shard_files, shard_layout, write_shards, write_tasks,
+                                      write_tasks_cached)
+from pytodo.store import TaskStore
+
+
+def _tasks(count):
+    return [{"id": f"t{n:03d}", "clock": {"created": f"{n:04d}"}, "task": f"task {n}",
+             "completed": n % 3 == 0, "created_at": 1700000000 + n * 86400} for n in range(count)]
+
+
+def test_iter_tasks_streams_in_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr("pytodo.storage_processor.READ_BLOCK", 7)
+    path = str(tmp_path / "storage.json")
+    write_tasks(_tasks(20), path)
+    assert list(iter_tasks(path)) == _tasks(20)
+    write_tasks([], path)
+    assert list(iter_tasks(path)) == []
+
+
+def test_snapshot_follows_the_file(tmp_path):
+    path = str(tmp_path / "storage.json")
+    write_tasks_cached(_tasks(5), path)
+    assert load_snapshot(path) == _tasks(5)
+    # Edited by hand since: the snapshot no longer applies
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(_tasks(3), file)
+    assert load_snapshot(path) is None
+    assert read_tasks_cached(path) == _tasks(3)
+    assert load_snapshot(path) == _tasks(3)
+
+
+@pytest.mark.parametrize("partition", ("hash", "date"))
+def test_shards_hold_the_list(tmp_path, partition):
+    path = str(tmp_path / "storage.json")
+    write_tasks(_tasks(40), path)
+    write_shards(_tasks(40), path, 4, partition)
+    layout = shard_layout(path)
+    assert (layout["shards"], layout["partition"]) == (4, partition)
+    assert sorted(layout["digests"]) == sorted(os.path.basename(shard) for shard in shard_files(path))
+    assert all(os.path.basename(shard).startswith("shard-") for shard in shard_files(path))
+    assert load_shards(path, workers=1) == _tasks(40)
+    assert count_shards({"completed": True}, path, workers=1) == 14
+    assert [task["id"] for task in search_shards("task 1", path, workers=1)][:2] == ["t001", "t010"]
+    with pytest.raises(ValueError):
+        write_shards(_tasks(1), path, partition="size")
+
+
+def test_saving_a_sharded_list_keeps_its_shards_current(tmp_path):
+    path = str(tmp_path / "storage.json")
+    store = TaskStore(path)
+    for n in range(10):
+        store.add(f"task {n}")
+    store.save()
+    write_shards(store.tasks, path, 3)
+    store.add("milk")
+    store.remove(0)
+    store.save()
+    assert shard_files(path) != [path]
+    assert count_shards(None, path, workers=1) == 10
+    assert [task["task"] for task in search_shards("milk", path, workers=1)] == ["milk"]
+    reopened = TaskStore(path)
+    assert reopened.tasks == store.tasks
+
+
+def test_a_sharded_list_keeps_its_order(tmp_path):
+    path = str(tmp_path / "storage.json")
+    store = TaskStore(path)
+    for text in ("old", "new", "open"):
+        store.add(text)
+    store.complete(0)
+    store.update(0, completed_at=1)
+    store.archive_completed(30)
+    store.restore([task["id"] for task in store.archive])
+    assert [task["task"] for task in store] == ["new", "open", "old"]
+    write_shards(store.tasks, path, 3)
+    store.save()
+    assert [task["task"] for task in TaskStore(path)] == ["new", "open", "old"]
+
+
+def test_only_changed_shards_are_written(tmp_path):
+    path = str(tmp_path / "storage.json")
+    tasks = _tasks(40)
+    write_tasks(tasks, path)
+    write_shards(tasks, path, 4)
+    before = {shard: os.stat(shard).st_ino for shard in shard_files(path)}
+    tasks[7]["task"] = "changed"
+    write_tasks(tasks, path)
+    write_shards(tasks, path, 4)
+    after = {shard: os.stat(shard).st_ino for shard in shard_files(path)}
+    assert sorted(after) == sorted(before)
+    assert sum(before[shard] != after[shard] for shard in after) == 1
+    assert [task["id"] for task in search_shards("changed", path, workers=1)] == ["t007"]
+
+
+def test_saves_replace_files_whole(tmp_path):
+    path = str(tmp_path / "storage.json")
+    write_tasks_cached(_tasks(5), path)
+    write_shards(_tasks(5), path, 2)
+    shard = shard_files(path)[0]
+    # A reader that opened the files before a save goes on reading them as they were
+    with open(path, encoding="utf-8") as before, open(shard, encoding="utf-8") as shard_before:
+        write_tasks_cached(_tasks(8), path)
+        write_shards(_tasks(8), path, 2)
+        assert json.load(before) == _tasks(5)
+        assert len(json.load(shard_before)) < 5
+    assert read_tasks_cached(path) == _tasks(8)
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".tmp")) == []
+    assert not [name for name in os.listdir(tmp_path / "storage.shards") if name.endswith(".tmp")]
@@ -0,0 +1,100 @@
+"""Undo and redo of the task store, tasks and indexes alike"""
+
+import copy
+
+import pytest
+
+from pytodo.sortindex import SORT_KEYS
+from pytodo.tags import TagFilter
+
+
+def _state(store):
+    """Everything undo and redo must put back: the tasks, their positions and every index
+
+    Clocks are left out, as undoing is itself an edit to be merged.
+    """
+    tasks = [{field: value for field, value in task.items() if field != "clock"} for task in store.tasks]
+    return (
+        copy.deepcopy(tasks),
+        {task["id"]: store.index_of(task["id"]) for task in store.tasks},
+        [position for position, _ in store.between("created_at")],
+        [position for position, _ in store.between("completed_at")],
+        {name: store.sorted_positions(name) for name in SORT_KEYS},
+        store.next_up(),
+        store.tagged(TagFilter("work")),
+        store.tag_cloud(),
+        store.duplicate_groups(),
+        {task["id"]: (store.subtasks(task["id"]), store.rollup(task["id"])) for task in store.tasks},
+    )
+
+
+@pytest.fixture
+def filled(store):
+    for n, text in enumerate(("milk", "rent", "bob", "milk", "plants")):
+        store.add(text, created_at=1000 + n, tags=["work"] if n % 2 else ["home"], priority=n % 3)
+    store.set_parent(2, store.tasks[1]["id"])
+    store.complete(3)
+    # Build every lazily made index, so each is kept up to date from here on
+    _state(store)
+    store.undo_stack.clear()
+    return store
+
+
+def _nested(store):
+    with store.transaction("Tidy"):
+        store.update(0, task="oat milk")
+        with store.transaction("inner"):
+            store.remove(4)
+            store.add("call bob", tags=["work"])
+        store.complete_many([0, 1])
+
+
+EDITS = {
+    "add": lambda store: store.add("new", tags=["work"], created_at=999),
+    "remove_many": lambda store: store.remove_many([0, 2, 4]),
+    "update_many": lambda store: store.update_many([1, 3], tags=["work", "urgent"], priority=0),
+    "complete_many": lambda store: store.complete_many([0, 1, 2]),
+    "transaction": _nested,
+}
+
+
+@pytest.mark.parametrize("edit", sorted(EDITS))
+def test_undo_then_redo_restores_everything(filled, edit):
+    before = _state(filled)
+    EDITS[edit](filled)
+    after = _state(filled)
+    assert after != before
+    assert filled.undo() is not None
+    assert _state(filled) == before
+    assert filled.redo() is not None
+    assert _state(filled) == after
+    assert filled.undo() is not None
+    assert _state(filled) == before
+
+
+def test_a_transaction_is_one_step(filled):
+    before = _state(filled)
+    _nested(filled)
+    assert [label for label, _ in filled.undo_stack] == ["Tidy"]
+    filled.undo()
+    assert _state(filled) == before
+    assert filled.undo() is None
+
+
+def test_a_failed_transaction_is_rolled_back(filled):
+    before = _state(filled)
+    with pytest.raises(RuntimeError):
+        with filled.transaction("Broken"):
+            filled.remove(0)
+            raise RuntimeError
+    assert _state(filled) == before
+    assert not filled.undo_stack
+
+
+def test_a_new_edit_clears_redo(filled):
+    filled.add("one")
+    filled.undo()
+    assert filled.redo_stack
+    filled.update(0, task="other")
+    assert not filled.redo_stack
+    assert filled.redo() is None
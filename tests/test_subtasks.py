@@ -0,0 +1,95 @@
+"""Child index and rolled-up subtask counts"""
+
+import random
+
+import pytest
+
+from pytodo.subtasks import ChildIndex
+
+
+def _brute_rollup(tasks, task_id):
+    """(done, total) over every task below task_id, by walking the list"""
+    children = {}
+    for task in tasks:
+        children.setdefault(task.get("parent"), []).append(task)
+    done = total = 0
+    pending, seen = list(children.get(task_id, ())), {task_id}
+    while pending:
+        task = pending.pop()
+        if task["id"] in seen:
+            continue
+        seen.add(task["id"])
+        done += bool(task.get("completed"))
+        total += 1
+        pending.extend(children.get(task["id"], ()))
+    return done, total
+
+
+def _acyclic_parent(rng, tasks, task):
+    """A random parent for task that does not put it under itself"""
+    below, pending = {task["id"]}, [task["id"]]
+    while pending:
+        parent = pending.pop()
+        for other in tasks:
+            if other.get("parent") == parent and other["id"] not in below:
+                below.add(other["id"])
+                pending.append(other["id"])
+    choices = [other["id"] for other in tasks if other["id"] not in below] + ["gone", None]
+    return rng.choice(choices)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_counts_follow_edits(seed):
+    rng = random.Random(seed)
+    tasks = []
+    for n in range(25):
+        task = {"id": f"t{n}", "completed": rng.random() < 0.4}
+        task["parent"] = _acyclic_parent(rng, tasks, task)
+        tasks.append(task)
+    index = ChildIndex(tasks[:10])
+    for task in tasks[10:]:
+        index.add(task)
+    for _ in range(40):
+        task = rng.choice(tasks)
+        index.discard(task)
+        if rng.random() < 0.3:
+            tasks.remove(task)
+            continue
+        if rng.random() < 0.5:
+            task["completed"] = not task["completed"]
+        else:
+            task["parent"] = _acyclic_parent(rng, [other for other in tasks if other is not task], task)
+        index.add(task)
+    for task in tasks + [{"id": "gone"}]:
+        assert index.rollup(task["id"]) == _brute_rollup(tasks, task["id"])
+        assert sorted(index.children_of(task["id"])) == sorted(other["id"] for other in tasks
+                                                              if other.get("parent") == task["id"])
+    rebuilt = ChildIndex(tasks)
+    assert rebuilt.counts == index.counts
+
+
+def test_cycles_do_not_hang():
+    tasks = [{"id": "a", "parent": "b"}, {"id": "b", "parent": "a"}]
+    index = ChildIndex(tasks)
+    assert sorted(index.descendants("a")) == ["b"]
+    assert index.root_of("a") in ("a", "b")
+
+
+def test_subtasks_in_store(store):
+    top = store.add("Move house")
+    store.add("Pack")
+    store.add("Book van")
+    store.set_parent(1, top["id"])
+    store.set_parent(2, store.tasks[1]["id"])
+    assert store.rollup(top["id"]) == (0, 2)
+    assert store.subtree(0) == [0, 1, 2]
+    assert store.top_level(range(3)) == [0]
+    with pytest.raises(ValueError):
+        store.set_parent(0, store.tasks[2]["id"])
+    store.complete(2)
+    assert store.rollup(top["id"]) == (1, 2)
+    store.remove(1)
+    assert store.rollup(top["id"]) == (0, 0)
+    assert store.top_level(range(2)) == [0, 1]
+    store.undo()
+    assert store.rollup(top["id"]) == (1, 2)
@@ -0,0 +1,75 @@
+"""Tag parsing, filters and the bitmap tag index"""
+
+import random
+
+import pytest
+
+from pytodo.tags import TagFilter, TagIndex, format_tags, normalize_tag, parse_tags, positions_of
+
+TAGS = ("work", "home", "urgent", "someday")
+FILTERS = ("work", "work,home", "work,home urgent -someday", "!urgent", "-work -home", "nothing")
+
+
+def test_parsing():
+    assert normalize_tag(" #Work ") == "work"
+    assert parse_tags("#Work, home  work,#Big  Deal") == ["work", "home", "big", "deal"]
+    assert format_tags(["work", "home"]) == "#work #home"
+    assert str(TagFilter("Work,home  -someday")) == "home,work -someday"
+    assert not TagFilter("  ")
+
+
+def test_filter_matches():
+    tag_filter = TagFilter("work,home urgent -someday")
+    assert tag_filter.matches(["home", "urgent"])
+    assert not tag_filter.matches(["home"])
+    assert not tag_filter.matches(["work", "urgent", "someday"])
+
+
+@pytest.mark.parametrize("bits", (0, 1, 0b1010, 1 << 100 | 1 << 7, (1 << 300) - 1))
+def test_positions_of(bits):
+    assert positions_of(bits) == [bit for bit in range(bits.bit_length()) if bits >> bit & 1]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_index_follows_inserts_removes_and_retags(seed):
+    rng = random.Random(seed)
+    tasks = [{"tags": rng.sample(TAGS, rng.randint(0, 2))} for _ in range(rng.randint(0, 20))]
+    index = TagIndex(tasks)
+    for _ in range(40):
+        action = rng.random()
+        if action < 0.4 or not tasks:
+            task, position = {"tags": rng.sample(TAGS, rng.randint(0, 3))}, rng.randint(0, len(tasks))
+            tasks.insert(position, task)
+            index.insert(position, task)
+        elif action < 0.7:
+            position = rng.randrange(len(tasks))
+            index.remove(position, tasks.pop(position))
+        else:
+            position = rng.randrange(len(tasks))
+            old, new = tasks[position]["tags"], rng.sample(TAGS, rng.randint(0, 2))
+            tasks[position] = {"tags": new}
+            index.retag(position, old, new)
+    for text in FILTERS:
+        tag_filter = TagFilter(text)
+        expected = [position for position, task in enumerate(tasks) if tag_filter.matches(task["tags"])]
+        assert positions_of(index.select(tag_filter)) == expected
+        assert index.count(tag_filter) == len(expected)
+    counts = {}
+    for task in tasks:
+        for tag in task["tags"]:
+            counts[tag] = counts.get(tag, 0) + 1
+    assert index.cloud() == sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+def test_tags_in_store(store):
+    store.add("a", tags=["work"])
+    store.add("b", tags=["home", "work"])
+    store.add("c")
+    assert store.tagged(TagFilter("work -home")) == [0]
+    store.remove(0)
+    store.update(1, tags=["home"])
+    assert store.tagged(TagFilter("home")) == [0, 1]
+    store.undo()
+    store.undo()
+    assert store.tagged(TagFilter("work")) == [0, 1]
+    assert store.tag_cloud() == [("work", 2), ("home", 1)]
@@ -0,0 +1,60 @@
+"""Timestamp indexes and the date ranges built on them"""
+
+import random
+from datetime import datetime
+
+import pytest
+
+from pytodo.timeindex import TimestampIndex, custom_range, date_range, format_epoch, parse_added, parse_date
+
+
+def _tasks(rng, count):
+    return [{"id": f"t{n}", "created_at": rng.choice((None, rng.randint(0, 50)))} for n in range(count)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_range_matches_a_scan(seed):
+    rng = random.Random(seed)
+    tasks = _tasks(rng, 40)
+    index = TimestampIndex("created_at", tasks[:20])
+    for task in tasks[20:]:
+        index.add(task)
+    for task in rng.sample(tasks, 10):
+        index.discard(task)
+        tasks.remove(task)
+    for _ in range(20):
+        start, end = rng.choice((None, rng.randint(0, 50))), rng.choice((None, rng.randint(0, 50)))
+        expected = sorted((task["created_at"], task["id"]) for task in tasks if task["created_at"] is not None
+                          and (start is None or task["created_at"] >= start)
+                          and (end is None or task["created_at"] < end))
+        assert index.range(start, end) == [task_id for _, task_id in expected]
+        assert index.count(start, end) == len(expected)
+
+
+def test_discard_of_unindexed_task_is_ignored():
+    index = TimestampIndex("completed_at", [{"id": "a", "completed_at": 5}])
+    index.discard({"id": "b", "completed_at": 5})
+    index.discard({"id": "a"})
+    assert index.range() == ["a"]
+
+
+def test_parsing_and_formatting():
+    epoch = parse_added("2024-03-05 14:30")
+    assert format_epoch(epoch) == "2024-03-05 14:30"
+    assert format_epoch(None) == "Unknown"
+    assert parse_added("yesterday") is None
+    assert parse_added(None) is None
+    assert parse_date("2024-03-05") == int(datetime(2024, 3, 5).timestamp())
+    with pytest.raises(ValueError):
+        parse_date("2024-13-01")
+
+
+def test_date_ranges():
+    now = datetime(2024, 3, 6, 15, 0).timestamp()  # a Wednesday
+    assert date_range("Any time", now) is None
+    assert date_range("Added between...", now) is None
+    assert date_range("Added today", now) == ("created_at", int(datetime(2024, 3, 6).timestamp()), None)
+    assert date_range("Completed this week", now) == ("completed_at", int(datetime(2024, 3, 4).timestamp()), None)
+    assert date_range("Added this month", now) == ("created_at", int(datetime(2024, 3, 1).timestamp()), None)
+    field, start, end = custom_range("Completed between...", "2024-03-01", "2024-03-01")
+    assert (field, end - start) == ("completed_at", 86400)
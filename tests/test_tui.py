@@ -0,0 +1,68 @@
+"""The terminal interface's visible tasks and counts, kept up by diffs"""
+
+import random
+
+import pytest
+
+from pytodo import tui
+from pytodo.tui import TaskTUI
+
+pytestmark = pytest.mark.skipif(not tui.supported(), reason="needs curses")
+
+WORDS = ("milk", "rent", "bob")
+
+
+@pytest.fixture
+def screen(store, monkeypatch):
+    """A TaskTUI with a ten-line list window and no terminal"""
+    monkeypatch.setattr(TaskTUI, "layout", lambda self: setattr(self, "lines", [None] * 10))
+    return lambda: TaskTUI(None, store, lambda: None, clock=lambda: 10)
+
+
+def _edit(rng, store):
+    size = len(store)
+    action = rng.choice(("add", "add", "remove", "update", "complete", "undo", "redo", "parent"))
+    if action == "add" or not size:
+        store.add(f"{rng.choice(WORDS)} {rng.randint(0, 9)}")
+    elif action == "remove":
+        store.remove_many(store.subtree(rng.randrange(size)))
+    elif action == "update":
+        store.update(rng.randrange(size), task=f"{rng.choice(WORDS)} {rng.randint(0, 9)}")
+    elif action == "complete":
+        store.complete_many(rng.sample(range(size), min(size, 2)))
+    elif action == "undo":
+        store.undo()
+    elif action == "redo":
+        store.redo()
+    else:
+        try:
+            store.set_parent(rng.randrange(size), rng.choice(store.tasks)["id"])
+        except ValueError:
+            pass
+
+
+@pytest.mark.parametrize("status", ("all", "pending", "completed", "next"))
+@pytest.mark.parametrize("seed", range(10))
+def test_edits_keep_the_visible_tasks_and_counts(store, screen, seed, status):
+    rng = random.Random(seed)
+    ui = screen()
+    ui.view.status = status
+    ui.view.text = "milk" if seed % 2 else ""
+    ui.refilter()
+    for _ in range(60):
+        _edit(rng, store)
+        assert ui.ids == [store.tasks[position]["id"] for position in ui.view.positions()]
+        assert ui.counts == ui.view.stats()
+        assert 0 <= ui.cursor < max(1, len(ui.ids))
+
+
+def test_delete_takes_the_subtasks(store, screen):
+    parent = store.add("parent")
+    store.add("child", parent=parent["id"])
+    store.add("other")
+    ui = screen()
+    ui.prompt = lambda label, text="", on_change=None: "y"
+    ui.handle("d")
+    assert [task["task"] for task in store] == ["other"]
+    assert ui.message == "Deleted with 1 subtask(s)"
+    assert ui.counts == (1, 0, 1)
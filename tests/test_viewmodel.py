@@ -0,0 +1,96 @@
+"""Rows and row diffs of the view model, checked against a fresh render"""
+
+import random
+
+import pytest
+
+from pytodo.changes import INSERTED, UPDATED, REMOVED, RESET
+from pytodo.tags import TagFilter
+from pytodo.viewmodel import TaskListView
+
+WORDS = ("milk", "rent", "bob", "plants")
+
+
+class Screen:
+    """Rows as a frontend would show them, kept up to date only by diffs"""
+
+    def __init__(self, view):
+        self.view = view
+        self.rows = view.rows()
+
+    def apply(self, changes):
+        for diff in self.view.diff(changes):
+            ids = [row.id for row in self.rows]
+            if diff.kind == RESET:
+                self.rows = self.view.rows()
+            elif diff.kind == REMOVED:
+                del self.rows[ids.index(diff.id)]
+            elif diff.kind == UPDATED:
+                self.rows[ids.index(diff.id)] = diff.row
+            else:
+                assert diff.id not in ids
+                position = len(self.rows) if diff.before is None else ids.index(diff.before)
+                self.rows.insert(position, diff.row)
+
+
+def _edit(rng, store):
+    """One random edit, undo or redo"""
+    size = len(store.tasks)
+    action = rng.choice(("add", "add", "remove", "update", "complete", "bulk", "undo", "redo", "parent"))
+    if action == "add" or not size:
+        store.add(f"{rng.choice(WORDS)} {rng.randint(0, 9)}", tags=rng.sample(("work", "home"), rng.randint(0, 2)))
+    elif action == "remove":
+        store.remove(rng.randrange(size))
+    elif action == "update":
+        store.update(rng.randrange(size), task=f"{rng.choice(WORDS)} {rng.randint(0, 9)}")
+    elif action == "complete":
+        store.complete(rng.randrange(size))
+    elif action == "bulk":
+        store.update_many(rng.sample(range(size), min(size, 3)), due_at=rng.choice((None, 5)))
+    elif action == "undo":
+        store.undo()
+    elif action == "redo":
+        store.redo()
+    else:
+        index, parent = rng.randrange(size), rng.choice(store.tasks)["id"]
+        try:
+            store.set_parent(index, rng.choice((None, parent)))
+        except ValueError:
+            pass
+
+
+@pytest.mark.parametrize("tree", (False, True))
+@pytest.mark.parametrize("status", ("all", "pending", "completed"))
+@pytest.mark.parametrize("seed", range(15))
+def test_diffs_keep_rows_equal_to_a_fresh_render(store, seed, status, tree):
+    rng = random.Random(seed)
+    view = TaskListView(store, clock=lambda: 10)
+    view.status, view.tree = status, tree
+    if seed % 3 == 0:
+        view.text = "milk"
+    screen = Screen(view)
+    store.changes.subscribe(screen.apply)
+    for _ in range(60):
+        _edit(rng, store)
+        fresh = TaskListView(store, clock=lambda: 10)
+        fresh.status, fresh.tree, fresh.text = view.status, view.tree, view.text
+        assert screen.rows == fresh.rows()
+
+
+def test_row_display(store):
+    store.add("Pay rent", due_at=5, priority=0, tags=["home"])
+    child = store.add("Find cheque")
+    store.set_parent(1, store.tasks[0]["id"])
+    store.complete(store.index_of(child["id"]))
+    row = TaskListView(store, clock=lambda: 10).rows()[0]
+    assert (row.text, row.overdue, row.priority, row.tags, row.subtasks) == ("Pay rent", True, "high", "#home", "1/1")
+
+
+def test_positions_combine_filters(store):
+    for text, tags in (("a milk", ["work"]), ("b milk", ["home"]), ("c rent", ["work"])):
+        store.add(text, tags=tags)
+    view = TaskListView(store)
+    view.tags, view.text = TagFilter("work"), "milk"
+    assert view.positions() == [0]
+    view.text, view.sort, view.reverse = "", "task", True
+    assert view.positions() == [2, 0]